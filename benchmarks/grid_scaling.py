@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+
+""" Benchmark for the per-timestep cost of the environment on blank levels of growing size. """
+
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)))
+
+from observation_modes import measure_steps_per_second, measure_bytes_per_step
+from snakeai.gameplay.environment import Environment
+from snakeai.utils.cli import HelpOnFailArgumentParser
+
+
+def parse_command_line_args(args):
+    """ Parse command-line arguments and organize them into a single structured object. """
+
+    parser = HelpOnFailArgumentParser(
+        description='Benchmark the environment on blank levels of different sizes.',
+        epilog='Example: grid_scaling.py --sizes 10x10 100x100 1000x1000 --num-steps 20000'
+    )
+    parser.add_argument(
+        '--sizes',
+        type=str,
+        nargs='+',
+        default=['10x10', '100x100', '300x300', '1000x100', '1000x1000'],
+        help='Level sizes to measure, as WIDTHxHEIGHT.',
+    )
+    parser.add_argument(
+        '--modes',
+        type=str,
+        nargs='+',
+        default=['view', 'copy'],
+        help='Observation modes to measure.',
+    )
+    parser.add_argument(
+        '--num-steps',
+        type=int,
+        default=20000,
+        help='The number of timesteps to run for each level size.',
+    )
+    return parser.parse_args(args)
+
+
+def make_blank_level_config(width, height):
+    """ Create the config of a walled level with no obstacles and the snake in the middle. """
+    field = ['#' * width] + ['#' + '.' * (width - 2) + '#' for _ in range(height - 2)] + ['#' * width]
+    head_row = field[height // 2]
+    field[height // 2] = head_row[:width // 2] + 'S' + head_row[width // 2 + 1:]
+    return {
+        'field': field,
+        'initial_snake_length': 3,
+        'max_step_limit': 1000,
+        'rewards': {'timestep': 0, 'ate_fruit': 1, 'died': -1},
+    }
+
+
+def main():
+    parsed_args = parse_command_line_args(sys.argv[1:])
+
+    print(f'{"Size":>10s} | {"Mode":>6s} | {"Steps/sec":>10s} | {"Bytes/step":>10s}')
+    for size in parsed_args.sizes:
+        width, height = (int(dimension) for dimension in size.lower().split('x'))
+        env_config = make_blank_level_config(width, height)
+        for mode in parsed_args.modes:
+            env = Environment(config=env_config, verbose=0, observation_mode=mode)
+            steps_per_second = measure_steps_per_second(env, parsed_args.num_steps)
+            bytes_per_step = measure_bytes_per_step(env, max(parsed_args.num_steps // 10, 1))
+            print(f'{size:>10s} | {mode:>6s} | {steps_per_second:10.0f} | {bytes_per_step:10.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+
+""" Benchmark for the NumPy inference backend on the DQN architecture used by `train.py`. """
+
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)))
+
+from snakeai.agent.numpy_model import NumpyDQNModel
+from snakeai.utils.cli import HelpOnFailArgumentParser
+
+
+def parse_command_line_args(args):
+    """ Parse command-line arguments and organize them into a single structured object. """
+
+    parser = HelpOnFailArgumentParser(
+        description='Benchmark the NumPy forward pass of the DQN model for different batch sizes.',
+        epilog='Example: inference.py --batch-sizes 1 32 --grid-size 10'
+    )
+    parser.add_argument(
+        '--batch-sizes',
+        type=int,
+        nargs='+',
+        default=[1, 8, 64],
+        help='The numbers of states per forward pass.',
+    )
+    parser.add_argument(
+        '--grid-size',
+        type=int,
+        default=10,
+        help='The size of the observed frames.',
+    )
+    parser.add_argument(
+        '--num-passes',
+        type=int,
+        default=2000,
+        help='The number of forward passes for each batch size.',
+    )
+    return parser.parse_args(args)
+
+
+def create_random_model(grid_size, rng, num_last_frames=4, num_actions=3):
+    """ Build a model with the `create_dqn_model` architecture and random weights. """
+    conv_output_size = 32 * (grid_size - 4) ** 2
+    layers = [
+        {'type': 'conv2d', 'strides': [1, 1], 'activation': 'linear'},
+        {'type': 'activation', 'activation': 'relu'},
+        {'type': 'conv2d', 'strides': [1, 1], 'activation': 'linear'},
+        {'type': 'activation', 'activation': 'relu'},
+        {'type': 'flatten'},
+        {'type': 'dense', 'activation': 'linear'},
+        {'type': 'activation', 'activation': 'relu'},
+        {'type': 'dense', 'activation': 'linear'},
+    ]
+    weight_shapes = {
+        0: (3, 3, num_last_frames, 16),
+        2: (3, 3, 16, 32),
+        5: (conv_output_size, 256),
+        7: (256, num_actions),
+    }
+    weights = {
+        layer_idx: (rng.normal(size=shape).astype(np.float32), rng.normal(size=shape[-1]).astype(np.float32))
+        for layer_idx, shape in weight_shapes.items()
+    }
+    return NumpyDQNModel((num_last_frames, grid_size, grid_size), layers, weights)
+
+
+def main():
+    parsed_args = parse_command_line_args(sys.argv[1:])
+    rng = np.random.default_rng(0)
+    model = create_random_model(parsed_args.grid_size, rng)
+
+    print(f'{"Batch size":>10s} | {"usec/pass":>10s} | {"usec/state":>10s}')
+    for batch_size in parsed_args.batch_sizes:
+        states = rng.integers(0, 5, size=(batch_size, ) + model.input_shape[1:]).astype(np.uint8)
+        model.predict(states)
+
+        start_time = time.perf_counter()
+        for _ in range(parsed_args.num_passes):
+            model.predict(states)
+        pass_time = (time.perf_counter() - start_time) / parsed_args.num_passes
+        print(f'{batch_size:10d} | {pass_time * 1e6:10.1f} | {pass_time / batch_size * 1e6:10.1f}')
+
+
+if __name__ == '__main__':
+    main()
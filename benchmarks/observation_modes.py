@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+
+""" Benchmark for the cost of observing the environment at each timestep in different observation modes. """
+
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)))
+
+from snakeai.gameplay.entities import SnakeAction
+from snakeai.gameplay.environment import Environment
+from snakeai.utils.cli import HelpOnFailArgumentParser
+
+
+def parse_command_line_args(args):
+    """ Parse command-line arguments and organize them into a single structured object. """
+
+    parser = HelpOnFailArgumentParser(
+        description='Benchmark Environment.get_observation in every observation mode.',
+        epilog='Example: observation_modes.py --level snakeai/levels/10x10-blank.json --num-steps 100000'
+    )
+    parser.add_argument(
+        '--level',
+        type=str,
+        default='snakeai/levels/10x10-blank.json',
+        help='JSON file containing a level definition.',
+    )
+    parser.add_argument(
+        '--num-steps',
+        type=int,
+        default=100000,
+        help='The number of timesteps to run in each mode.',
+    )
+    return parser.parse_args(args)
+
+
+def choose_action(step):
+    """ A cheap deterministic policy that keeps the snake alive for a while. """
+    return SnakeAction.TURN_RIGHT if step % 4 == 0 else SnakeAction.MAINTAIN_DIRECTION
+
+
+def measure_steps_per_second(env, num_steps):
+    """ Run the environment for the given number of timesteps and return the throughput. """
+    env.new_episode()
+    start_time = time.perf_counter()
+    for step in range(num_steps):
+        env.choose_action(choose_action(step))
+        if env.timestep().is_episode_end:
+            env.new_episode()
+    return num_steps / (time.perf_counter() - start_time)
+
+
+def measure_bytes_per_step(env, num_steps):
+    """ Measure the peak memory allocated during a timestep (including the observation), on average. """
+    env.new_episode()
+    tracemalloc.start()
+    total_allocated = 0
+    for step in range(num_steps):
+        tracemalloc.reset_peak()
+        allocated_before, _ = tracemalloc.get_traced_memory()
+        env.choose_action(choose_action(step))
+        timestep = env.timestep()
+        _, peak_allocated = tracemalloc.get_traced_memory()
+        total_allocated += peak_allocated - allocated_before
+        if timestep.is_episode_end:
+            env.new_episode()
+    tracemalloc.stop()
+    return total_allocated / num_steps
+
+
+def main():
+    parsed_args = parse_command_line_args(sys.argv[1:])
+
+    with open(parsed_args.level) as cfg:
+        env_config = json.load(cfg)
+
+    print(f'{"Mode":>6s} | {"Steps/sec":>10s} | {"Bytes/step":>10s}')
+    for mode in ['copy', 'view', 'ring']:
+        env = Environment(config=env_config, verbose=0, observation_mode=mode)
+        steps_per_second = measure_steps_per_second(env, parsed_args.num_steps)
+        bytes_per_step = measure_bytes_per_step(env, max(parsed_args.num_steps // 10, 1))
+        print(f'{mode:>6s} | {steps_per_second:10.0f} | {bytes_per_step:10.1f}')
+
+
+if __name__ == '__main__':
+    main()
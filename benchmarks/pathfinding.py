@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+
+""" Benchmark for the decision cost and the performance of the built-in pathfinding agents. """
+
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)))
+
+from snakeai.agent import AStarAgent, BreadthFirstSearchAgent, HamiltonianCycleAgent
+from snakeai.gameplay.environment import Environment
+from snakeai.utils.cli import HelpOnFailArgumentParser
+
+
+AGENTS = {
+    'bfs': BreadthFirstSearchAgent,
+    'astar': AStarAgent,
+    'hamiltonian': HamiltonianCycleAgent,
+}
+
+
+def parse_command_line_args(args):
+    """ Parse command-line arguments and organize them into a single structured object. """
+
+    parser = HelpOnFailArgumentParser(
+        description='Benchmark the built-in pathfinding agents.',
+        epilog='Example: pathfinding.py --level snakeai/levels/10x10-blank.json --num-episodes 2000'
+    )
+    parser.add_argument(
+        '--level',
+        type=str,
+        default='snakeai/levels/10x10-blank.json',
+        help='JSON file containing a level definition.',
+    )
+    parser.add_argument(
+        '--num-episodes',
+        type=int,
+        default=2000,
+        help='The number of episodes to play with each agent.',
+    )
+    return parser.parse_args(args)
+
+
+def measure_agent(env, agent, num_episodes):
+    """ Play the episodes and return the decision time per timestep, the fruits per episode and the timesteps. """
+    decision_time = 0
+    num_timesteps = 0
+    fruits_eaten = []
+
+    for _ in range(num_episodes):
+        timestep = env.new_episode()
+        agent.begin_episode()
+        while not timestep.is_episode_end:
+            start_time = time.perf_counter()
+            action = agent.act(timestep.observation, timestep.reward)
+            decision_time += time.perf_counter() - start_time
+            env.choose_action(action)
+            timestep = env.timestep()
+            num_timesteps += 1
+        agent.end_episode()
+        fruits_eaten.append(env.stats.fruits_eaten)
+
+    return decision_time / num_timesteps, np.mean(fruits_eaten), num_timesteps / num_episodes
+
+
+def main():
+    parsed_args = parse_command_line_args(sys.argv[1:])
+
+    with open(parsed_args.level) as cfg:
+        env_config = json.load(cfg)
+
+    print(f'{"Agent":>12s} | {"Usec/step":>9s} | {"Fruits":>7s} | {"Timesteps":>9s}')
+    for name, agent_class in AGENTS.items():
+        env = Environment(config=env_config, verbose=0, observation_mode='view')
+        env.seed(0)
+        usec_per_step, mean_fruits, mean_timesteps = measure_agent(env, agent_class(), parsed_args.num_episodes)
+        print(f'{name:>12s} | {usec_per_step * 1e6:9.2f} | {mean_fruits:7.2f} | {mean_timesteps:9.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+
+""" Benchmark for the cost of sampling from the experience replay memories as they grow. """
+
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)))
+
+from snakeai.utils.cli import HelpOnFailArgumentParser
+from snakeai.utils.memory import ExperienceReplay, PrioritizedExperienceReplay
+
+
+def parse_command_line_args(args):
+    """ Parse command-line arguments and organize them into a single structured object. """
+
+    parser = HelpOnFailArgumentParser(
+        description='Benchmark uniform and prioritized experience replay sampling for different memory sizes.',
+        epilog='Example: replay_sampling.py --memory-sizes 1000 100000 --batch-size 64'
+    )
+    parser.add_argument(
+        '--memory-sizes',
+        type=int,
+        nargs='+',
+        default=[1000, 10000, 100000],
+        help='The numbers of transitions in the memory.',
+    )
+    parser.add_argument(
+        '--batch-size',
+        type=int,
+        default=64,
+        help='The number of transitions per batch.',
+    )
+    parser.add_argument(
+        '--grid-size',
+        type=int,
+        default=10,
+        help='The size of the observed frames.',
+    )
+    parser.add_argument(
+        '--num-batches',
+        type=int,
+        default=2000,
+        help='The number of batches to sample for each memory size.',
+    )
+    return parser.parse_args(args)
+
+
+def fill_memory(memory, num_transitions, rng):
+    """ Remember random transitions with episodes of 50 timesteps on average. """
+    frame_shape = memory.input_shape[1:]
+    state = np.zeros((1, ) + memory.input_shape, dtype=np.uint8)
+    for _ in range(num_transitions):
+        state[0, -1] = rng.integers(0, 5, size=frame_shape)
+        memory.remember(state, rng.integers(3), rng.normal(), None, rng.random() < 0.02)
+
+
+def measure_uniform_sampling(memory, batch_size, num_batches):
+    """ Return the average time of sampling a batch uniformly and rebuilding its states. """
+    start_time = time.perf_counter()
+    for _ in range(num_batches):
+        memory.get_experience(memory.sample_positions(batch_size))
+    return (time.perf_counter() - start_time) / num_batches
+
+
+def measure_prioritized_sampling(memory, batch_size, num_batches, rng):
+    """ Return the average time of sampling a prioritized batch, rebuilding its states and updating the priorities. """
+    start_time = time.perf_counter()
+    for _ in range(num_batches):
+        positions, _ = memory.sample_prioritized(batch_size)
+        memory.get_experience(positions)
+        memory.update_priorities(positions, rng.normal(size=batch_size))
+    return (time.perf_counter() - start_time) / num_batches
+
+
+def main():
+    parsed_args = parse_command_line_args(sys.argv[1:])
+    input_shape = (4, parsed_args.grid_size, parsed_args.grid_size)
+    batch_size, num_batches = parsed_args.batch_size, parsed_args.num_batches
+
+    print(f'{"Memory size":>11s} | {"Uniform usec/batch":>18s} | {"Prioritized usec/batch":>22s}')
+    for memory_size in parsed_args.memory_sizes:
+        rng = np.random.default_rng(0)
+        uniform_memory = ExperienceReplay(input_shape, 3, memory_size, rng=np.random.default_rng(0))
+        prioritized_memory = PrioritizedExperienceReplay(input_shape, 3, memory_size, rng=np.random.default_rng(0))
+        fill_memory(uniform_memory, memory_size, rng)
+        fill_memory(prioritized_memory, memory_size, rng)
+
+        uniform_time = measure_uniform_sampling(uniform_memory, batch_size, num_batches)
+        prioritized_time = measure_prioritized_sampling(prioritized_memory, batch_size, num_batches, rng)
+        print(f'{memory_size:11d} | {uniform_time * 1e6:18.1f} | {prioritized_time * 1e6:22.1f}')
+
+
+if __name__ == '__main__':
+    main()
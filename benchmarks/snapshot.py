@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+
+""" Benchmark for cloning the environment state with snapshot/restore, as done by lookahead planners. """
+
+import copy
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)))
+
+from snakeai.gameplay.environment import Environment
+from snakeai.utils.cli import HelpOnFailArgumentParser
+
+
+def parse_command_line_args(args):
+    """ Parse command-line arguments and organize them into a single structured object. """
+
+    parser = HelpOnFailArgumentParser(
+        description='Benchmark Environment.snapshot/restore against copy.deepcopy.',
+        epilog='Example: snapshot.py --level snakeai/levels/10x10-blank.json --num-clones 100000'
+    )
+    parser.add_argument(
+        '--level',
+        type=str,
+        default='snakeai/levels/10x10-blank.json',
+        help='JSON file containing a level definition.',
+    )
+    parser.add_argument(
+        '--num-clones',
+        type=int,
+        default=100000,
+        help='The number of snapshot/restore pairs to run.',
+    )
+    return parser.parse_args(args)
+
+
+def main():
+    parsed_args = parse_command_line_args(sys.argv[1:])
+
+    with open(parsed_args.level) as cfg:
+        env_config = json.load(cfg)
+
+    env = Environment(config=env_config, verbose=0)
+    env.seed(1)
+    env.new_episode()
+    snapshot = env.snapshot()
+
+    start_time = time.perf_counter()
+    for _ in range(parsed_args.num_clones):
+        env.snapshot(out=snapshot)
+        env.restore(snapshot)
+    snapshot_rate = parsed_args.num_clones / (time.perf_counter() - start_time)
+
+    num_deep_copies = max(parsed_args.num_clones // 100, 1)
+    start_time = time.perf_counter()
+    for _ in range(num_deep_copies):
+        copy.deepcopy(env)
+    deepcopy_rate = num_deep_copies / (time.perf_counter() - start_time)
+
+    print(f'snapshot + restore: {snapshot_rate:10.0f} clones/sec')
+    print(f'copy.deepcopy:      {deepcopy_rate:10.0f} clones/sec')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+
+""" Report of the DQN training speed and the time to reach a target score for different training schedules. """
+
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)))
+
+from snakeai.agent import DeepQNetworkAgent
+from snakeai.utils.cli import HelpOnFailArgumentParser
+from train import create_dqn_model, create_snake_environment
+
+
+def parse_schedule(value):
+    """ Parse a training schedule given as TRAIN_FREQ:GRADIENT_STEPS:BATCH_SIZE. """
+    train_freq, gradient_steps, batch_size = (int(part) for part in value.split(':'))
+    return train_freq, gradient_steps, batch_size
+
+
+def parse_command_line_args(args):
+    """ Parse command-line arguments and organize them into a single structured object. """
+
+    parser = HelpOnFailArgumentParser(
+        description='Compare the DQN training speed and the time to reach a target score for different schedules.',
+        epilog='Example: train_schedule.py --level snakeai/levels/10x10-blank.json --schedules 1:1:64 4:1:256 4:4:64'
+    )
+    parser.add_argument(
+        '--level',
+        type=str,
+        default='snakeai/levels/10x10-blank.json',
+        help='JSON file containing a level definition.',
+    )
+    parser.add_argument(
+        '--schedules',
+        type=parse_schedule,
+        nargs='+',
+        default=[(1, 1, 64), (4, 1, 64), (4, 1, 256), (4, 4, 64)],
+        help='Training schedules to compare, each given as TRAIN_FREQ:GRADIENT_STEPS:BATCH_SIZE.',
+    )
+    parser.add_argument(
+        '--learning-starts',
+        type=int,
+        default=1000,
+        help='The number of environment timesteps to only collect experience for before the first update.',
+    )
+    parser.add_argument(
+        '--num-episodes',
+        type=int,
+        default=3000,
+        help='The maximum number of episodes to train for with each schedule.',
+    )
+    parser.add_argument(
+        '--target-fruits',
+        type=float,
+        default=5.0,
+        help='The target score: the number of fruits eaten per episode, on average over the last 100 episodes.',
+    )
+    return parser.parse_args(args)
+
+
+def measure_schedule(level_filename, schedule, learning_starts, num_episodes, target_fruits):
+    """
+    Train a new agent with the given schedule until it reaches the target score.
+
+    Returns:
+        A tuple (environment timesteps per second, the number of episodes and the seconds it took to
+        reach the target score, or None if it has not been reached).
+    """
+    train_freq, gradient_steps, batch_size = schedule
+    env = create_snake_environment(level_filename)
+    env.seed(0)
+    np.random.seed(0)
+    with contextlib.redirect_stdout(io.StringIO()):
+        model = create_dqn_model(env, num_last_frames=4)
+    agent = DeepQNetworkAgent(model=model, memory_size=-1, num_last_frames=4)
+
+    fruits_eaten = []
+    num_timesteps = 0
+    time_to_score = None
+
+    def on_episode_end(episode, stats):
+        nonlocal num_timesteps, time_to_score
+        num_timesteps += stats.timesteps_survived
+        fruits_eaten.append(stats.fruits_eaten)
+        if len(fruits_eaten) >= 100 and np.mean(fruits_eaten[-100:]) >= target_fruits:
+            time_to_score = time.perf_counter() - start_time
+            return True
+        return False
+
+    # The training saves the final model into the current directory, which should stay untouched.
+    working_dir = os.getcwd()
+    start_time = time.perf_counter()
+    with tempfile.TemporaryDirectory() as temp_dir, contextlib.redirect_stdout(io.StringIO()):
+        os.chdir(temp_dir)
+        try:
+            agent.train(
+                env,
+                num_episodes=num_episodes,
+                batch_size=batch_size,
+                discount_factor=0.95,
+                train_freq=train_freq,
+                gradient_steps=gradient_steps,
+                learning_starts=learning_starts,
+                episode_callback=on_episode_end,
+            )
+        finally:
+            os.chdir(working_dir)
+    elapsed_time = time.perf_counter() - start_time
+
+    episodes_to_score = len(fruits_eaten) if time_to_score is not None else None
+    return num_timesteps / elapsed_time, episodes_to_score, time_to_score
+
+
+def main():
+    parsed_args = parse_command_line_args(sys.argv[1:])
+
+    print(f'{"Schedule":>12s} | {"Steps/sec":>9s} | {"Episodes to score":>17s} | {"Seconds to score":>16s}')
+    for schedule in parsed_args.schedules:
+        steps_per_second, episodes_to_score, time_to_score = measure_schedule(
+            parsed_args.level,
+            schedule,
+            parsed_args.learning_starts,
+            parsed_args.num_episodes,
+            parsed_args.target_fruits,
+        )
+        episodes_column = f'{episodes_to_score:17d}' if episodes_to_score is not None else f'{"-":>17s}'
+        time_column = f'{time_to_score:16.1f}' if time_to_score is not None else f'{"-":>16s}'
+        print(f'{":".join(map(str, schedule)):>12s} | {steps_per_second:9.0f} | {episodes_column} | {time_column}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+
+""" Benchmark for the throughput of the Gym vector environment as the number of sub-environments grows. """
+
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)))
+
+from snakeai.gameplay.batch_kernels import HAS_NUMBA
+from snakeai.gameplay.entities import ALL_SNAKE_ACTIONS
+from snakeai.gameplay.wrappers import make_openai_gym_vector_environment
+from snakeai.utils.cli import HelpOnFailArgumentParser
+
+
+def parse_command_line_args(args):
+    """ Parse command-line arguments and organize them into a single structured object. """
+
+    parser = HelpOnFailArgumentParser(
+        description='Benchmark the Gym vector environment for different numbers of sub-environments and backends.',
+        epilog='Example: vector_env.py --level snakeai/levels/10x10-blank.json --num-envs 1 16 256'
+    )
+    parser.add_argument(
+        '--level',
+        type=str,
+        default='snakeai/levels/10x10-blank.json',
+        help='JSON file containing a level definition.',
+    )
+    parser.add_argument(
+        '--num-envs',
+        type=int,
+        nargs='+',
+        default=[1, 4, 16, 64, 256, 1024],
+        help='The numbers of sub-environments to measure.',
+    )
+    parser.add_argument(
+        '--backends',
+        type=str,
+        nargs='+',
+        default=['numpy', 'numba'] if HAS_NUMBA else ['numpy'],
+        help='The batch environment backends to measure.',
+    )
+    parser.add_argument(
+        '--num-steps',
+        type=int,
+        default=2000,
+        help='The number of vector steps to run for each number of sub-environments.',
+    )
+    return parser.parse_args(args)
+
+
+def main():
+    parsed_args = parse_command_line_args(sys.argv[1:])
+
+    print(f'{"Backend":>7s} | {"Envs":>6s} | {"Steps/sec":>10s} | {"Env-steps/sec":>13s} | {"Usec/step":>9s}')
+    for backend in parsed_args.backends:
+        for num_envs in parsed_args.num_envs:
+            env = make_openai_gym_vector_environment(parsed_args.level, num_envs, seed=0, backend=backend)
+            env.reset()
+
+            # Pre-draw the actions so that the policy does not count towards the measured time.
+            rng = np.random.default_rng(0)
+            actions = rng.choice(ALL_SNAKE_ACTIONS, size=(parsed_args.num_steps, num_envs), p=[0.8, 0.1, 0.1])
+
+            # Warm up, so that the JIT compilation is not measured either.
+            env.step(actions[0])
+
+            start_time = time.perf_counter()
+            for step_actions in actions:
+                env.step(step_actions)
+            elapsed_time = time.perf_counter() - start_time
+
+            steps_per_second = parsed_args.num_steps / elapsed_time
+            print(
+                f'{backend:>7s} | {num_envs:6d} | {steps_per_second:10.0f} | {steps_per_second * num_envs:13.0f} | '
+                f'{1e6 / steps_per_second:9.1f}'
+            )
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+
+""" Front-end script for exporting a trained DQN model for the NumPy inference backend. """
+
+import sys
+
+from snakeai.agent.dqn import load_model
+from snakeai.agent.numpy_model import export_keras_model
+from snakeai.utils.cli import HelpOnFailArgumentParser
+
+
+def parse_command_line_args(args):
+    """ Parse command-line arguments and organize them into a single structured object. """
+
+    parser = HelpOnFailArgumentParser(
+        description='Snake AI model exporter.',
+        epilog='Example: export_model.py --model dqn-final.model --output dqn-final.npz'
+    )
+
+    parser.add_argument(
+        '--model',
+        required=True,
+        type=str,
+        help='File containing a pre-trained Keras agent model.',
+    )
+    parser.add_argument(
+        '--output',
+        required=True,
+        type=str,
+        help='The .npz file to write, which play.py loads without Keras.',
+    )
+
+    return parser.parse_args(args)
+
+
+def main():
+    parsed_args = parse_command_line_args(sys.argv[1:])
+
+    export_keras_model(load_model(parsed_args.model), parsed_args.output)
+    print(f'Exported {parsed_args.model} to {parsed_args.output}')
+
+
+if __name__ == '__main__':
+    main()
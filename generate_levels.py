@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+
+""" Front-end script for generating a pack of random Snake levels. """
+
+import sys
+
+import numpy as np
+
+from snakeai.gameplay.levels import generate_level, write_level_pack
+from snakeai.utils.cli import HelpOnFailArgumentParser
+
+
+def parse_command_line_args(args):
+    """ Parse command-line arguments and organize them into a single structured object. """
+
+    parser = HelpOnFailArgumentParser(
+        description='Snake AI level pack generator.',
+        epilog='Example: generate_levels.py --output 20x20-random.pack --width 20 --height 20 --num-levels 5000'
+    )
+
+    parser.add_argument(
+        '--output',
+        required=True,
+        type=str,
+        help='The level pack file to write.',
+    )
+    parser.add_argument(
+        '--width',
+        type=int,
+        default=10,
+        help='The width of every level, including the outer walls.',
+    )
+    parser.add_argument(
+        '--height',
+        type=int,
+        default=10,
+        help='The height of every level, including the outer walls.',
+    )
+    parser.add_argument(
+        '--num-levels',
+        type=int,
+        default=1000,
+        help='The number of levels to generate.',
+    )
+    parser.add_argument(
+        '--obstacle-density',
+        type=float,
+        default=0.15,
+        help='The probability of every inner cell to become a wall.',
+    )
+    parser.add_argument(
+        '--snake-length',
+        type=int,
+        default=3,
+        help='The initial length of the snake, which must fit into every level.',
+    )
+    parser.add_argument(
+        '--seed',
+        type=int,
+        default=None,
+        help='Random seed for reproducible level packs.',
+    )
+
+    return parser.parse_args(args)
+
+
+def main():
+    parsed_args = parse_command_line_args(sys.argv[1:])
+
+    rng = np.random.default_rng(parsed_args.seed)
+    levels = [
+        generate_level(
+            parsed_args.height,
+            parsed_args.width,
+            rng,
+            obstacle_density=parsed_args.obstacle_density,
+            snake_length=parsed_args.snake_length,
+        )
+        for _ in range(parsed_args.num_levels)
+    ]
+    write_level_pack(parsed_args.output, levels)
+    print(f'Wrote {len(levels)} levels of size {parsed_args.width}x{parsed_args.height} to {parsed_args.output}')
+
+
+if __name__ == '__main__':
+    main()
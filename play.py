@@ -2,13 +2,18 @@
 
 """ Front-end script for replaying the Snake agent's behavior on a batch of episodes. """
 
-import json
+import copy
+import multiprocessing
+import random
 import sys
+import time
 import numpy as np
 
-from snakeai.gameplay.environment import Environment
-from snakeai.gui import PyGameGUI
+from snakeai.gameplay.environment import Environment, EpisodeStatistics
+from snakeai.gameplay.levels import load_level_config
 from snakeai.utils.cli import HelpOnFailArgumentParser
+from snakeai.utils.seeding import spawn_seeds
+from snakeai.utils.stats import EpisodeStatisticsWriter
 
 
 def parse_command_line_args(args):
@@ -30,13 +35,13 @@ def parse_command_line_args(args):
         '--agent',
         required=True,
         type=str,
-        choices=['human', 'dqn', 'random'],
+        choices=['human', 'dqn', 'random', 'bfs', 'astar', 'hamiltonian'],
         help='Player agent to use.',
     )
     parser.add_argument(
         '--model',
         type=str,
-        help='File containing a pre-trained agent model.',
+        help='File containing a pre-trained agent model (Keras, or .npz exported by export_model.py).',
     )
     parser.add_argument(
         '--level',
@@ -50,21 +55,38 @@ def parse_command_line_args(args):
         default=10,
         help='The number of episodes to run consecutively.',
     )
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=1,
+        help='The number of worker processes for playing episodes in parallel (CLI interface only).',
+    )
+    parser.add_argument(
+        '--seed',
+        type=int,
+        default=None,
+        help='Random seed for reproducible results (for a given number of workers).',
+    )
 
-    return parser.parse_args(args)
+    parsed_args = parser.parse_args(args)
+    if parsed_args.interface == 'gui' and parsed_args.workers > 1:
+        parser.error('--workers is only supported with the CLI interface')
+    return parsed_args
 
 
-def create_snake_environment(level_filename):
+def create_snake_environment(level_filename, verbose=1):
     """ Create a new Snake environment from the config file. """
 
-    with open(level_filename) as cfg:
-        env_config = json.load(cfg)
-
-    return Environment(config=env_config, verbose=1)
+    env_config = load_level_config(level_filename)
+    return Environment(config=env_config, verbose=verbose)
 
 
 def load_model(filename):
-    """ Load a pre-trained agent model. """
+    """ Load a pre-trained agent model, using the NumPy inference backend for exported `.npz` models. """
+
+    if filename.endswith('.npz'):
+        from snakeai.agent.numpy_model import NumpyDQNModel
+        return NumpyDQNModel.load(filename)
 
     from keras.models import load_model
     return load_model(filename)
@@ -82,7 +104,9 @@ def create_agent(name, model):
         An instance of Snake agent.
     """
 
-    from snakeai.agent import DeepQNetworkAgent, HumanAgent, RandomActionAgent
+    from snakeai.agent import (
+        AStarAgent, BreadthFirstSearchAgent, DeepQNetworkAgent, HamiltonianCycleAgent, HumanAgent, RandomActionAgent
+    )
 
     if name == 'human':
         return HumanAgent()
@@ -92,10 +116,62 @@ def create_agent(name, model):
         return DeepQNetworkAgent(model=model, memory_size=-1, num_last_frames=4)
     elif name == 'random':
         return RandomActionAgent()
+    elif name == 'bfs':
+        return BreadthFirstSearchAgent()
+    elif name == 'astar':
+        return AStarAgent()
+    elif name == 'hamiltonian':
+        return HamiltonianCycleAgent()
 
     raise KeyError(f'Unknown agent type: "{name}"')
 
 
+def play_episode(env, agent):
+    """
+    Play a single episode until the game is over.
+
+    Returns:
+        The statistics of the episode.
+    """
+
+    timestep = env.new_episode()
+    agent.begin_episode()
+    game_over = False
+
+    while not game_over:
+        action = agent.act(timestep.observation, timestep.reward)
+        env.choose_action(action)
+        timestep = env.timestep()
+        game_over = timestep.is_episode_end
+
+    agent.end_episode()
+    return env.stats
+
+
+def print_episode_summary(episode, num_episodes, stats):
+    """ Print the one-line summary of a finished episode. """
+
+    summary = 'Episode {:3d} / {:3d} | Timesteps {:4d} | Fruits {:2d}'
+    print(summary.format(episode + 1, num_episodes, stats.timesteps_survived, stats.fruits_eaten))
+
+
+def print_summary(all_stats):
+    """ Print the aggregate statistics over all played episodes. """
+
+    fruit_stats = [stats.fruits_eaten for stats in all_stats]
+    timestep_stats = [stats.timesteps_survived for stats in all_stats]
+    percentiles = [10, 50, 90, 99]
+
+    print()
+    print('Fruits eaten {:.1f} +/- stddev {:.1f}'.format(np.mean(fruit_stats), np.std(fruit_stats)))
+    print('Timesteps survived {:.1f} +/- stddev {:.1f}'.format(np.mean(timestep_stats), np.std(timestep_stats)))
+    for name, values in [('Fruits eaten', fruit_stats), ('Timesteps survived', timestep_stats)]:
+        print('{} percentiles: {}'.format(name, ' | '.join(
+            'p{} {:.1f}'.format(q, value)
+            for q, value in zip(percentiles, np.percentile(values, percentiles))
+        )))
+
+
 def play_cli(env, agent, num_episodes=10):
     """
     Play a set of episodes using the specified Snake agent.
@@ -107,29 +183,93 @@ def play_cli(env, agent, num_episodes=10):
         num_episodes (int): the number of episodes to run.
     """
 
-    fruit_stats = []
+    all_stats = []
 
     print()
     print('Playing:')
 
     for episode in range(num_episodes):
-        timestep = env.new_episode()
-        agent.begin_episode()
-        game_over = False
+        stats = play_episode(env, agent)
+        all_stats.append(copy.copy(stats))
+        print_episode_summary(episode, num_episodes, stats)
 
-        while not game_over:
-            action = agent.act(timestep.observation, timestep.reward)
-            env.choose_action(action)
-            timestep = env.timestep()
-            game_over = timestep.is_episode_end
+    print_summary(all_stats)
 
-        fruit_stats.append(env.stats.fruits_eaten)
 
-        summary = 'Episode {:3d} / {:3d} | Timesteps {:4d} | Fruits {:2d}'
-        print(summary.format(episode + 1, num_episodes, env.stats.timesteps_survived, env.stats.fruits_eaten))
+# Per-process state of the parallel player workers.
+_worker_env = None
+_worker_agent = None
+
+
+def init_player_worker(level_filename, agent_name, model_filename):
+    """ Create the environment and the agent for a worker process. """
+
+    global _worker_env, _worker_agent
+    model = load_model(model_filename) if model_filename is not None else None
+    _worker_env = create_snake_environment(level_filename, verbose=0)
+    _worker_agent = create_agent(agent_name, model)
+
+
+def play_worker_shard(shard):
+    """
+    Play a shard of episodes in a worker process.
+
+    Args:
+        shard: a list of episode seeds (`numpy.random.SeedSequence`).
+
+    Returns:
+        A list of episode statistics, one per seed.
+    """
+
+    all_stats = []
+    for episode_seed in shard:
+        # Seed the environment, and the global generators for the agents that use them.
+        env_seed, agent_seed = episode_seed.spawn(2)
+        _worker_env.seed(env_seed)
+        random.seed(int(agent_seed.generate_state(1)[0]))
+        np.random.seed(agent_seed.generate_state(1))
+        all_stats.append(copy.copy(play_episode(_worker_env, _worker_agent)))
+    return all_stats
+
+
+def play_cli_parallel(level_filename, agent_name, model_filename, num_episodes, num_workers, seed=None):
+    """
+    Play a set of episodes in parallel worker processes, streaming the statistics back as episodes finish.
+    The results are deterministic for a given seed and number of workers.
+
+    Args:
+        level_filename: JSON file containing a level definition.
+        agent_name (str): key identifying the agent type.
+        model_filename: (optional) file containing a pre-trained agent model.
+        num_episodes (int): the number of episodes to run.
+        num_workers (int): the number of worker processes.
+        seed: (optional) root random seed.
+    """
+
+    # Each episode gets its own seed, and each worker plays a contiguous shard of episodes.
+    episode_seeds = spawn_seeds(seed, num_episodes)
+    shard_size = max(1, min(16, num_episodes // (4 * num_workers)))
+    shards = [episode_seeds[i:i + shard_size] for i in range(0, num_episodes, shard_size)]
+
+    all_stats = []
+    stats_writer = EpisodeStatisticsWriter(f'snake-env-{time.strftime("%Y%m%d-%H%M%S")}.csv', EpisodeStatistics.FIELDS)
 
     print()
-    print('Fruits eaten {:.1f} +/- stddev {:.1f}'.format(np.mean(fruit_stats), np.std(fruit_stats)))
+    print(f'Playing ({num_workers} workers):')
+
+    pool = multiprocessing.Pool(
+        num_workers,
+        initializer=init_player_worker,
+        initargs=(level_filename, agent_name, model_filename),
+    )
+    with pool, stats_writer:
+        for shard_stats in pool.imap(play_worker_shard, shards):
+            for stats in shard_stats:
+                print_episode_summary(len(all_stats), num_episodes, stats)
+                stats_writer.write(stats.flatten())
+                all_stats.append(stats)
+
+    print_summary(all_stats)
 
 
 def play_gui(env, agent, num_episodes):
@@ -143,6 +283,8 @@ def play_gui(env, agent, num_episodes):
         num_episodes (int): the number of episodes to run.
     """
 
+    from snakeai.gui import PyGameGUI
+
     gui = PyGameGUI()
     gui.load_environment(env)
     gui.load_agent(agent)
@@ -152,12 +294,29 @@ def play_gui(env, agent, num_episodes):
 def main():
     parsed_args = parse_command_line_args(sys.argv[1:])
 
+    if parsed_args.interface == 'cli' and parsed_args.workers > 1:
+        play_cli_parallel(
+            parsed_args.level,
+            parsed_args.agent,
+            parsed_args.model,
+            num_episodes=parsed_args.num_episodes,
+            num_workers=parsed_args.workers,
+            seed=parsed_args.seed,
+        )
+        return
+
     env = create_snake_environment(parsed_args.level)
+    if parsed_args.seed is not None:
+        env.seed(parsed_args.seed)
     model = load_model(parsed_args.model) if parsed_args.model is not None else None
     agent = create_agent(parsed_args.agent, model)
 
     run_player = play_cli if parsed_args.interface == 'cli' else play_gui
-    run_player(env, agent, num_episodes=parsed_args.num_episodes)
+    try:
+        run_player(env, agent, num_episodes=parsed_args.num_episodes)
+    finally:
+        # Flush the episode statistics without relying on the exit hooks.
+        env.close()
 
 
 if __name__ == '__main__':
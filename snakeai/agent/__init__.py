@@ -25,4 +25,5 @@ class AgentBase(object):
 
 from .dqn import DeepQNetworkAgent
 from .human import HumanAgent
+from .pathfinding import AStarAgent, BreadthFirstSearchAgent, HamiltonianCycleAgent
 from .random_action import RandomActionAgent
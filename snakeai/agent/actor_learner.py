@@ -0,0 +1,321 @@
+""" Provides an actor-learner training architecture for the DQN agent, with the actors in separate processes. """
+
+import copy
+import ctypes
+import multiprocessing
+import queue
+import traceback
+
+import numpy as np
+
+from snakeai.gameplay.environment import Environment
+from snakeai.utils.memory import ExperienceReplay, ShardedExperienceReplay
+from snakeai.utils.seeding import spawn_seeds
+
+
+def get_actor_exploration_rates(num_actors, base_rate=0.4, alpha=7.0):
+    """
+    Get a fixed exploration rate for every actor, from `base_rate` down to `base_rate ** (1 + alpha)`,
+    so that some actors keep exploring while others mostly exploit (Horgan et al., 2018).
+    """
+    if num_actors == 1:
+        return [base_rate]
+    return [base_rate ** (1 + alpha * actor_idx / (num_actors - 1)) for actor_idx in range(num_actors)]
+
+
+def transition_buffer_size(num_slots, frame_shape):
+    """ Get the size (in bytes) of the shared memory block that an actor passes its transitions through. """
+    return num_slots * (4 + 1 + 1 + int(np.prod(frame_shape)))
+
+
+def map_transition_buffer(shared_buffer, num_slots, frame_shape):
+    """
+    Lay out the transition slots of an actor over its shared memory block.
+
+    Returns:
+        A tuple of (frames, actions, rewards, episode_ends) arrays, one item per slot.
+    """
+    buffer = np.frombuffer(shared_buffer, dtype=np.uint8)
+    offset = 0
+
+    def take(dtype, shape):
+        nonlocal offset
+        array = np.ndarray(shape, dtype=dtype, buffer=buffer, offset=offset)
+        offset += array.nbytes
+        return array
+
+    # The rewards come first so that they are 4-byte aligned.
+    rewards = take(np.float32, (num_slots, ))
+    actions = take(np.int8, (num_slots, ))
+    episode_ends = take(np.bool_, (num_slots, ))
+    frames = take(np.uint8, (num_slots, ) + tuple(frame_shape))
+    assert offset == transition_buffer_size(num_slots, frame_shape)
+    return frames, actions, rewards, episode_ends
+
+
+def actor_worker(actor_idx, config, model_factory, num_last_frames, exploration_rate, seed, transition_buffer,
+                 num_slots, free_slots, messages, weights_buffer, weights_version, weights_lock, stop_event):
+    """
+    The main loop of an actor process.
+
+    The actor plays episodes with its own copy of the model, picking up the newest weights broadcast by the
+    learner before every move. Every transition goes into the next free slot of the actor's shared memory block
+    (only the newest frame of the state, see `ExperienceReplay.remember_frame`), and the slot index is sent
+    to the learner, which frees the slot once it has stored the transition.
+    """
+    try:
+        env_seed, exploration_seed = seed.spawn(2)
+        env = Environment(config=config, verbose=0)
+        env.seed(env_seed)
+        rng = np.random.default_rng(exploration_seed)
+
+        model = model_factory(env, num_last_frames)
+        weight_shapes = [np.shape(weights) for weights in model.get_weights()]
+        weight_sizes = [int(np.prod(shape)) for shape in weight_shapes]
+        all_weights = np.frombuffer(weights_buffer, dtype=np.float32)
+        local_weights_version = -1
+
+        frames, actions, rewards, episode_ends = \
+            map_transition_buffer(transition_buffer, num_slots, env.observation_shape)
+        num_transitions = 0
+
+        while not stop_event.is_set():
+            timestep = env.new_episode()
+            state = np.repeat(np.expand_dims(timestep.observation, 0), num_last_frames, axis=0)
+
+            while not timestep.is_episode_end:
+                if weights_version.value != local_weights_version:
+                    with weights_lock:
+                        local_weights_version = weights_version.value
+                        flat_weights = all_weights.copy()
+                    model.set_weights([
+                        weights.reshape(shape)
+                        for weights, shape in zip(np.split(flat_weights, np.cumsum(weight_sizes)[:-1]), weight_shapes)
+                    ])
+
+                if rng.random() < exploration_rate:
+                    action = int(rng.integers(env.num_actions))
+                else:
+                    action = int(np.argmax(model.predict(np.expand_dims(state, 0))[0]))
+                env.choose_action(action)
+                timestep = env.timestep()
+
+                # Wait for the learner to free a slot, checking regularly whether the training is over.
+                while not free_slots.acquire(timeout=0.1):
+                    if stop_event.is_set():
+                        return
+                slot = num_transitions % num_slots
+                frames[slot] = state[-1]
+                actions[slot] = action
+                rewards[slot] = timestep.reward
+                episode_ends[slot] = timestep.is_episode_end
+                messages.put(('transition', actor_idx, slot))
+                num_transitions += 1
+
+                state[:-1] = state[1:]
+                state[-1] = timestep.observation
+
+            messages.put(('episode', actor_idx, copy.copy(env.stats)))
+    except Exception:
+        messages.put(('error', actor_idx, traceback.format_exc()))
+
+
+class ActorLearnerTrainer(object):
+    """
+    Trains a DQN agent with several actor processes playing the game and the current process learning.
+
+    Every actor runs its own `Environment` with a fixed exploration rate (see `get_actor_exploration_rates`)
+    and passes its transitions through shared memory into a central replay memory, with one shard per actor
+    (see `ShardedExperienceReplay`). The learner trains the agent's model on batches from the replay memory
+    and periodically broadcasts the model weights back to the actors through shared memory as well.
+    """
+
+    def __init__(self, agent, config, model_factory, num_actors, seed=None, slots_per_actor=256, start_method='spawn'):
+        """
+        Create a new actor-learner trainer.
+
+        Args:
+            agent: the `DeepQNetworkAgent` to train, with an in-memory uniform experience replay.
+            config (dict): level configuration, typically found in JSON configs.
+            model_factory: a picklable function that builds the model for an actor, called with
+                the actor's environment and the number of last frames the agent considers.
+            num_actors (int): the number of actor processes.
+            seed: (optional) root seed, from which an independent seed for every actor is derived.
+            slots_per_actor (int): the number of transitions an actor may get ahead of the learner.
+            start_method (str): multiprocessing start method ('fork', 'spawn', 'forkserver').
+        """
+        if type(agent.memory) is not ExperienceReplay:
+            raise ValueError('The actor-learner training only supports the in-memory uniform experience replay')
+
+        self.agent = agent
+        self.config = config
+        self.model_factory = model_factory
+        self.num_actors = num_actors
+        self.seed = seed
+        self.slots_per_actor = slots_per_actor
+        self.context = multiprocessing.get_context(start_method)
+        self.exploration_rates = get_actor_exploration_rates(num_actors)
+
+        memory = agent.memory
+        shard_size = max(1, memory.memory_size // num_actors) if memory.memory_size > 0 else -1
+        self.memory = ShardedExperienceReplay(
+            [ExperienceReplay(memory.input_shape, memory.num_actions, shard_size) for _ in range(num_actors)],
+            rng=memory.rng,
+        )
+        agent.memory = self.memory
+
+        num_weights = sum(int(np.size(weights)) for weights in agent.model.get_weights())
+        self._weights_buffer = self.context.RawArray(ctypes.c_float, max(1, num_weights))
+        self._weights_version = self.context.RawValue(ctypes.c_int64, -1)
+        self._weights_lock = self.context.Lock()
+
+        self._processes = []
+        self._transition_buffers = []
+        self._free_slots = []
+        self._messages = None
+        self._stop_event = None
+
+    def broadcast_weights(self):
+        """ Publish the current weights of the learner's model to the actors. """
+        flat_weights = np.concatenate([np.ravel(weights) for weights in self.agent.model.get_weights()])
+        with self._weights_lock:
+            np.frombuffer(self._weights_buffer, dtype=np.float32)[:len(flat_weights)] = flat_weights
+            self._weights_version.value += 1
+
+    def start_actors(self):
+        """ Start the actor processes, with the current weights of the learner's model. """
+        self.broadcast_weights()
+        self._messages = self.context.Queue()
+        self._stop_event = self.context.Event()
+        frame_shape = self.agent.memory.shards[0].input_shape[1:]
+        actor_seeds = spawn_seeds(self.seed, self.num_actors)
+
+        for actor_idx in range(self.num_actors):
+            transition_buffer = self.context.RawArray(
+                ctypes.c_uint8,
+                transition_buffer_size(self.slots_per_actor, frame_shape),
+            )
+            free_slots = self.context.Semaphore(self.slots_per_actor)
+            process = self.context.Process(
+                target=actor_worker,
+                args=(actor_idx, self.config, self.model_factory, self.agent.num_last_frames,
+                      self.exploration_rates[actor_idx], actor_seeds[actor_idx], transition_buffer,
+                      self.slots_per_actor, free_slots, self._messages, self._weights_buffer,
+                      self._weights_version, self._weights_lock, self._stop_event),
+                daemon=True,
+            )
+            process.start()
+            self._processes.append(process)
+            self._transition_buffers.append(map_transition_buffer(transition_buffer, self.slots_per_actor, frame_shape))
+            self._free_slots.append(free_slots)
+
+    def stop_actors(self):
+        """ Stop the actor processes, discarding the transitions they have not delivered yet. """
+        if self._stop_event is None:
+            return
+        self._stop_event.set()
+
+        # An actor only exits once its queued messages have been read.
+        while any(process.is_alive() for process in self._processes):
+            self._drain_messages()
+            for process in self._processes:
+                process.join(timeout=0.05)
+        self._drain_messages()
+
+        self._processes = []
+        self._transition_buffers = []
+        self._free_slots = []
+        self._stop_event = None
+
+    def _check_actors_alive(self):
+        """ Raise an error if an actor process has exited without reporting it (e.g. it has been killed). """
+        for actor_idx, process in enumerate(self._processes):
+            if not process.is_alive():
+                raise RuntimeError(f'Actor {actor_idx} exited unexpectedly with exit code {process.exitcode}')
+
+    def _drain_messages(self):
+        try:
+            while True:
+                self._messages.get_nowait()
+        except queue.Empty:
+            pass
+
+    def train(self, num_episodes=1000, batch_size=50, discount_factor=0.9, train_freq=1, gradient_steps=1,
+              learning_starts=0, broadcast_freq=100, episode_callback=None):
+        """
+        Train the agent until the actors have played the given number of episodes.
+
+        Args:
+            num_episodes (int):
+                the number of episodes to play, by all actors together.
+            batch_size (int):
+                the size of the learning sample for experience replay.
+            discount_factor (float):
+                discount factor (gamma) for computing the value function.
+            train_freq (int):
+                the number of transitions received from the actors between model updates.
+            gradient_steps (int):
+                the number of batches to learn on in every model update.
+            learning_starts (int):
+                the number of transitions to only collect before the first update.
+            broadcast_freq (int):
+                the number of model updates between broadcasts of the weights to the actors.
+            episode_callback:
+                (optional) a function called with the episode index and the episode statistics
+                after every episode. The training stops early if it returns True.
+        """
+        model = self.agent.model
+        num_episodes_done = 0
+        num_transitions = 0
+        num_updates = 0
+        loss = 0.0
+
+        self.start_actors()
+        try:
+            while num_episodes_done < num_episodes:
+                try:
+                    kind, actor_idx, payload = self._messages.get(timeout=1.0)
+                except queue.Empty:
+                    # An actor that dies without a chance to report an error would leave the learner waiting.
+                    self._check_actors_alive()
+                    continue
+
+                if kind == 'error':
+                    raise RuntimeError(f'Actor {actor_idx} failed:\n{payload}')
+
+                if kind == 'episode':
+                    summary = 'Episode {:5d}/{:5d} | Actor {:2d} | Loss {:8.4f} | Exploration {:.4f} | ' + \
+                              'Fruits {:2d} | Timesteps {:4d} | Total Reward {:4d}'
+                    print(summary.format(
+                        num_episodes_done + 1, num_episodes, actor_idx, loss, self.exploration_rates[actor_idx],
+                        payload.fruits_eaten, payload.timesteps_survived, payload.sum_episode_rewards,
+                    ))
+                    loss = 0.0
+                    if episode_callback is not None and episode_callback(num_episodes_done, payload):
+                        break
+                    num_episodes_done += 1
+                    continue
+
+                # Store the transition and give the slot back to the actor.
+                frames, actions, rewards, episode_ends = self._transition_buffers[actor_idx]
+                self.memory.shards[actor_idx].remember_frame(
+                    frames[payload], actions[payload], rewards[payload], episode_ends[payload],
+                )
+                self._free_slots[actor_idx].release()
+                num_transitions += 1
+
+                if num_transitions <= learning_starts or num_transitions % train_freq != 0:
+                    continue
+                for _ in range(gradient_steps):
+                    batch = self.memory.get_batch(model=model, batch_size=batch_size, discount_factor=discount_factor)
+                    if batch:
+                        inputs, targets, weights, positions, td_errors = batch
+                        loss += float(model.train_on_batch(inputs, targets, sample_weight=weights))
+                        self.memory.update_priorities(positions, td_errors)
+                num_updates += 1
+                if num_updates % broadcast_freq == 0:
+                    self.broadcast_weights()
+        finally:
+            self.stop_actors()
+
+        model.save('dqn-final.model')
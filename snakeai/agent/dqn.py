@@ -1,14 +1,26 @@
-import collections
+import json
+import os
+import random
+import shutil
+
 import numpy as np
 
 from snakeai.agent import AgentBase
-from snakeai.utils.memory import ExperienceReplay
+from snakeai.utils.memory import DiskExperienceReplay, ExperienceReplay, PrioritizedExperienceReplay
+
+
+def load_model(filename):
+    """ Load a Keras model, including the state of its optimizer. """
+
+    from keras.models import load_model
+    return load_model(filename)
 
 
 class DeepQNetworkAgent(AgentBase):
     """ Represents a Snake agent powered by DQN with experience replay. """
 
-    def __init__(self, model, num_last_frames=4, memory_size=1000):
+    def __init__(self, model, num_last_frames=4, memory_size=1000, prioritized_replay=False,
+                 prioritized_replay_beta=0.4, replay_dir=None, replay_ram_budget=512 * 2 ** 20):
         """
         Create a new DQN-based agent.
         
@@ -16,13 +28,28 @@ class DeepQNetworkAgent(AgentBase):
             model: a compiled DQN model.
             num_last_frames (int): the number of last frames the agent will consider.
             memory_size (int): memory size limit for experience replay (-1 for unlimited). 
+            prioritized_replay (bool): whether to replay the experience with larger TD errors more often.
+            prioritized_replay_beta (float): the initial importance-sampling correction of the prioritized replay,
+                annealed to full correction (1) over the training.
+            replay_dir: (optional) directory for spilling an unlimited experience replay memory to disk.
+            replay_ram_budget (int): the number of bytes of the spilled memory kept in RAM.
         """
         assert model.input_shape[1] == num_last_frames, 'Model input shape should be (num_frames, grid_size, grid_size)'
         assert len(model.output_shape) == 2, 'Model output shape should be (num_samples, num_actions)'
 
         self.model = model
         self.num_last_frames = num_last_frames
-        self.memory = ExperienceReplay((num_last_frames,) + model.input_shape[-2:], model.output_shape[-1], memory_size)
+        input_shape = (num_last_frames,) + model.input_shape[-2:]
+        if replay_dir is not None:
+            if memory_size != -1 or prioritized_replay:
+                raise ValueError('Only an unlimited uniform experience replay memory can be spilled to disk')
+            self.memory = DiskExperienceReplay(input_shape, model.output_shape[-1], replay_dir, replay_ram_budget)
+        elif prioritized_replay:
+            self.memory = PrioritizedExperienceReplay(
+                input_shape, model.output_shape[-1], memory_size, beta=prioritized_replay_beta,
+            )
+        else:
+            self.memory = ExperienceReplay(input_shape, model.output_shape[-1], memory_size)
         self.frames = None
 
     def begin_episode(self):
@@ -32,23 +59,94 @@ class DeepQNetworkAgent(AgentBase):
     def get_last_frames(self, observation):
         """
         Get the pixels of the last `num_last_frames` observations, the current frame being the last.
+
+        The observation is copied into the agent's own frame buffer, so the environment
+        may return read-only views or reuse its observation buffers (see `Environment.get_observation`).
         
         Args:
             observation: observation at the current timestep. 
 
         Returns:
-            Observations for the last `num_last_frames` frames.
+            Observations for the last `num_last_frames` frames, as a new array owned by the caller.
         """
-        frame = observation
         if self.frames is None:
-            self.frames = collections.deque([frame] * self.num_last_frames)
+            self.frames = np.empty((self.num_last_frames, ) + np.shape(observation), dtype=np.asarray(observation).dtype)
+            self.frames[:] = observation
         else:
-            self.frames.append(frame)
-            self.frames.popleft()
-        return np.expand_dims(self.frames, 0)
+            self.frames[:-1] = self.frames[1:]
+            self.frames[-1] = observation
+        return np.expand_dims(self.frames, 0).copy()
+
+    def save_checkpoint(self, directory, env, num_episodes_done, exploration_rate, num_timesteps_done=0):
+        """
+        Save the full training state into a checkpoint bundle directory, so that the training can be resumed.
+
+        The bundle holds the model (with the optimizer state), the replay memory (see `ExperienceReplay.save`),
+        and the episode and timestep counters, the exploration rate and the random generator states
+        in `training.json`.
+        It is written next to the target first and then renamed, so an interrupted save never leaves
+        a partial bundle behind.
+
+        Args:
+            directory: the bundle directory, replaced if it exists.
+            env: the Snake environment the agent is trained in.
+            num_episodes_done (int): the number of finished training episodes.
+            exploration_rate (float): the exploration rate for the next episode.
+            num_timesteps_done (int): the number of environment timesteps played during the training.
+        """
+        temp_directory = f'{directory}.{os.getpid()}.tmp'
+        os.makedirs(temp_directory)
+        self.model.save(os.path.join(temp_directory, 'dqn.model'))
+        self.memory.save(os.path.join(temp_directory, 'replay'))
+
+        np_random_state = np.random.get_state()
+        training_state = {
+            'num_episodes_done': num_episodes_done,
+            'exploration_rate': exploration_rate,
+            'num_timesteps_done': num_timesteps_done,
+            'env_rng_state': env.rng.bit_generator.state,
+            'np_random_state': [np_random_state[0], np_random_state[1].tolist()] + list(np_random_state[2:]),
+            'random_state': random.getstate(),
+        }
+        with open(os.path.join(temp_directory, 'training.json'), 'w') as state_file:
+            json.dump(training_state, state_file)
+
+        if os.path.exists(directory):
+            shutil.rmtree(directory)
+        os.replace(temp_directory, directory)
+
+    def load_checkpoint(self, directory, env):
+        """
+        Restore the training state from a checkpoint bundle written by `save_checkpoint`.
+
+        Args:
+            directory: the bundle directory.
+            env: the Snake environment the agent is trained in.
+
+        Returns:
+            A tuple (the number of finished training episodes, the exploration rate for the next episode,
+            the number of environment timesteps played during the training).
+        """
+        with open(os.path.join(directory, 'training.json')) as state_file:
+            training_state = json.load(state_file)
+
+        self.model = load_model(os.path.join(directory, 'dqn.model'))
+        self.memory.load(os.path.join(directory, 'replay'))
+
+        env.rng.bit_generator.state = training_state['env_rng_state']
+        np_random_state = training_state['np_random_state']
+        np.random.set_state((np_random_state[0], np.array(np_random_state[1], dtype=np.uint32)) + tuple(np_random_state[2:]))
+        version, internal_state, gauss_next = training_state['random_state']
+        random.setstate((version, tuple(internal_state), gauss_next))
+        return (
+            training_state['num_episodes_done'],
+            training_state['exploration_rate'],
+            training_state.get('num_timesteps_done', 0),
+        )
 
     def train(self, env, num_episodes=1000, batch_size=50, discount_factor=0.9, checkpoint_freq=None,
-              exploration_range=(1.0, 0.1), exploration_phase_size=0.5):
+              exploration_range=(1.0, 0.1), exploration_phase_size=0.5, train_freq=1, gradient_steps=1,
+              learning_starts=0, resume_from=None, episode_callback=None):
         """
         Train the agent to perform well in the given Snake environment.
         
@@ -62,20 +160,41 @@ class DeepQNetworkAgent(AgentBase):
             discount_factor (float):
                 discount factor (gamma) for computing the value function.
             checkpoint_freq (int):
-                the number of episodes after which a new model checkpoint will be created.
+                the number of episodes after which a new checkpoint bundle will be created
+                (see `save_checkpoint`).
             exploration_range (tuple):
                 a (max, min) range specifying how the exploration rate should decay over time. 
             exploration_phase_size (float):
                 the percentage of the training process at which
                 the exploration rate should reach its minimum.
+            train_freq (int):
+                the number of environment timesteps between model updates.
+            gradient_steps (int):
+                the number of batches to learn on in every model update.
+            learning_starts (int):
+                the number of environment timesteps to only collect experience for before the first update.
+            resume_from:
+                (optional) a checkpoint bundle to continue an interrupted training from.
+                The other arguments should be the same as in the interrupted training.
+            episode_callback:
+                (optional) a function called with the episode index and the episode statistics
+                after every episode. The training stops early if it returns True.
         """
 
         # Calculate the constant exploration decay speed for each episode.
         max_exploration_rate, min_exploration_rate = exploration_range
         exploration_decay = ((max_exploration_rate - min_exploration_rate) / (num_episodes * exploration_phase_size))
         exploration_rate = max_exploration_rate
+        first_episode = 0
+        num_timesteps = 0
+        if resume_from is not None:
+            first_episode, exploration_rate, num_timesteps = self.load_checkpoint(resume_from, env)
+
+        for episode in range(first_episode, num_episodes):
+            # Correct more of the prioritized sampling bias as the training progresses.
+            if isinstance(self.memory, PrioritizedExperienceReplay):
+                self.memory.anneal_beta(episode / max(1, num_episodes - 1))
 
-        for episode in range(num_episodes):
             # Reset the environment for the new episode.
             timestep = env.new_episode()
             self.begin_episode()
@@ -106,19 +225,21 @@ class DeepQNetworkAgent(AgentBase):
                 self.memory.remember(*experience_item)
                 state = state_next
 
-                # Sample a random batch from experience.
-                batch = self.memory.get_batch(
-                    model=self.model,
-                    batch_size=batch_size,
-                    discount_factor=discount_factor
-                )
-                # Learn on the batch.
-                if batch:
-                    inputs, targets = batch
-                    loss += float(self.model.train_on_batch(inputs, targets))
+                num_timesteps += 1
 
-            if checkpoint_freq and (episode % checkpoint_freq) == 0:
-                self.model.save(f'dqn-{episode:08d}.model')
+                # Learn on random batches from experience, once in `train_freq` timesteps.
+                if num_timesteps <= learning_starts or num_timesteps % train_freq != 0:
+                    continue
+                for _ in range(gradient_steps):
+                    batch = self.memory.get_batch(
+                        model=self.model,
+                        batch_size=batch_size,
+                        discount_factor=discount_factor
+                    )
+                    if batch:
+                        inputs, targets, weights, positions, td_errors = batch
+                        loss += float(self.model.train_on_batch(inputs, targets, sample_weight=weights))
+                        self.memory.update_priorities(positions, td_errors)
 
             if exploration_rate > min_exploration_rate:
                 exploration_rate -= exploration_decay
@@ -130,6 +251,12 @@ class DeepQNetworkAgent(AgentBase):
                 env.stats.fruits_eaten, env.stats.timesteps_survived, env.stats.sum_episode_rewards,
             ))
 
+            if checkpoint_freq and (episode % checkpoint_freq) == 0:
+                self.save_checkpoint(f'dqn-{episode:08d}.checkpoint', env, episode + 1, exploration_rate, num_timesteps)
+
+            if episode_callback is not None and episode_callback(episode, env.stats):
+                break
+
         self.model.save('dqn-final.model')
 
     def act(self, observation, reward):
@@ -0,0 +1,156 @@
+""" Provides a pure-NumPy forward pass for trained DQN models, so that they can be played without Keras. """
+
+import json
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+ACTIVATIONS = {
+    'linear': lambda x: x,
+    'relu': lambda x: np.maximum(x, 0),
+}
+
+
+def export_keras_model(model, filename):
+    """
+    Export the weights and the layer structure of a Keras DQN model into a compact `.npz` file.
+
+    Supported layers are the ones `create_dqn_model` in `train.py` uses: `Conv2D` (channels first,
+    valid padding, no dilation), `Activation`, `Flatten` and `Dense`, with linear or ReLU activations.
+    Any other layer or setting raises a `ValueError` rather than exporting a model that computes different values.
+
+    Args:
+        model: a Keras `Sequential` model.
+        filename: the output file.
+    """
+    layers = []
+    arrays = {}
+    for layer in model.layers:
+        layer_type = type(layer).__name__
+        config = layer.get_config()
+        if layer_type == 'Conv2D':
+            if config.get('data_format') != 'channels_first' or config.get('padding') != 'valid':
+                raise ValueError('Only channels-first Conv2D layers with valid padding are supported')
+            if tuple(config.get('dilation_rate', (1, 1))) != (1, 1) or config.get('groups', 1) != 1:
+                raise ValueError('Dilated and grouped Conv2D layers are not supported')
+            layers.append({
+                'type': 'conv2d',
+                'strides': list(config['strides']),
+                'activation': config['activation'],
+            })
+        elif layer_type == 'Dense':
+            layers.append({'type': 'dense', 'activation': config['activation']})
+        elif layer_type == 'Activation':
+            layers.append({'type': 'activation', 'activation': config['activation']})
+        elif layer_type == 'Flatten':
+            data_format = config.get('data_format') or 'channels_last'
+            if data_format not in ('channels_first', 'channels_last'):
+                raise ValueError(f'Unsupported Flatten data format: {data_format}')
+            layers.append({'type': 'flatten', 'data_format': data_format})
+        else:
+            raise ValueError(f'Unsupported layer type: {layer_type}')
+
+        activation = layers[-1].get('activation')
+        if activation is not None and activation not in ACTIVATIONS:
+            raise ValueError(f'Unsupported activation: {activation}')
+        if layers[-1]['type'] in ('conv2d', 'dense'):
+            weights = layer.get_weights()
+            if len(weights) != (2 if config.get('use_bias', True) else 1):
+                raise ValueError(f'Unexpected number of weight arrays in a {layer_type} layer: {len(weights)}')
+            kernel = weights[0]
+            bias = weights[1] if len(weights) == 2 else np.zeros(np.shape(kernel)[-1])
+            arrays[f'layer_{len(layers) - 1}_kernel'] = np.asarray(kernel, dtype=np.float32)
+            arrays[f'layer_{len(layers) - 1}_bias'] = np.asarray(bias, dtype=np.float32)
+
+    model_spec = {'input_shape': list(model.input_shape[1:]), 'layers': layers}
+    np.savez_compressed(filename, model_spec=np.array(json.dumps(model_spec)), **arrays)
+
+
+class NumpyDQNModel(object):
+    """
+    Computes the outputs of an exported DQN model with NumPy only.
+
+    Mimics the parts of the Keras model interface that `DeepQNetworkAgent` uses for playing
+    (`input_shape`, `output_shape` and `predict`), so it can be used in place of the Keras model.
+    """
+
+    def __init__(self, input_shape, layers, weights):
+        """
+        Create a model from its layer structure and weights.
+
+        Args:
+            input_shape: the shape of a single input (num_frames, height, width).
+            layers: a list of layer dicts, as written by `export_keras_model`.
+            weights: a dict of (kernel, bias) tuples by layer index, for the Conv2D and Dense layers.
+                Conv2D kernels are shaped (kernel height, kernel width, input channels, output channels),
+                Dense kernels (inputs, outputs), as in Keras.
+        """
+        self.layers = layers
+        self.weights = weights
+        self.input_shape = (None, ) + tuple(input_shape)
+        output_size = weights[max(weights)][1].shape[0]
+        self.output_shape = (None, output_size)
+
+    @classmethod
+    def load(cls, filename):
+        """ Load a model exported by `export_keras_model`. """
+        with np.load(filename) as data:
+            model_spec = json.loads(str(data['model_spec']))
+            weights = {
+                layer_idx: (data[f'layer_{layer_idx}_kernel'], data[f'layer_{layer_idx}_bias'])
+                for layer_idx, layer in enumerate(model_spec['layers'])
+                if layer['type'] in ('conv2d', 'dense')
+            }
+        return cls(model_spec['input_shape'], model_spec['layers'], weights)
+
+    def predict(self, states):
+        """
+        Compute the model outputs for a batch of states.
+
+        Args:
+            states: an array shaped (batch size, num_frames, height, width).
+
+        Returns:
+            A float32 array shaped (batch size, number of outputs).
+        """
+        x = np.asarray(states, dtype=np.float32)
+        for layer_idx, layer in enumerate(self.layers):
+            if layer['type'] == 'conv2d':
+                kernel, bias = self.weights[layer_idx]
+                x = conv2d_channels_first(x, kernel, bias, layer['strides'])
+            elif layer['type'] == 'dense':
+                kernel, bias = self.weights[layer_idx]
+                x = x @ kernel
+                x += bias
+            elif layer['type'] == 'flatten':
+                # Like Keras, a channels-first Flatten moves the channels last before flattening.
+                if layer.get('data_format') == 'channels_first' and x.ndim > 2:
+                    x = np.moveaxis(x, 1, -1)
+                x = x.reshape(len(x), -1)
+            if 'activation' in layer:
+                x = ACTIVATIONS[layer['activation']](x)
+        return x
+
+
+def conv2d_channels_first(x, kernel, bias, strides=(1, 1)):
+    """
+    Apply a 2D convolution with valid padding to a batch of channels-first inputs.
+
+    Args:
+        x: an array shaped (batch size, input channels, height, width).
+        kernel: an array shaped (kernel height, kernel width, input channels, output channels).
+        bias: an array shaped (output channels, ).
+        strides: the vertical and horizontal strides.
+
+    Returns:
+        An array shaped (batch size, output channels, output height, output width).
+    """
+    kernel_height, kernel_width = kernel.shape[:2]
+    windows = sliding_window_view(x, (kernel_height, kernel_width), axis=(2, 3))
+    windows = windows[:, :, ::strides[0], ::strides[1]]
+
+    # (batch, channels, out height, out width, kernel height, kernel width) x (channels, kh, kw, out channels).
+    y = np.tensordot(windows, kernel.transpose(2, 0, 1, 3), axes=([1, 4, 5], [0, 1, 2]))
+    y += bias
+    return np.ascontiguousarray(y.transpose(0, 3, 1, 2))
@@ -0,0 +1,340 @@
+import collections
+import heapq
+
+import numpy as np
+
+from snakeai.agent import AgentBase
+from snakeai.gameplay.entities import CellType, SnakeAction, SnakeDirection, ALL_SNAKE_DIRECTIONS
+from snakeai.gameplay.navigation import compute_transitions
+
+
+class PathfindingAgentBase(AgentBase):
+    """
+    Base class for the Snake agents that plan a path to the fruit and follow it.
+
+    To keep the decisions cheap, the agent does not re-analyze the whole observation at every timestep.
+    Instead, it tracks the snake from its own actions: the snake always starts heading north with the body
+    stretched to the south (see `Snake`), and then moves and grows according to the chosen actions.
+    The observation is only scanned when the episode begins or the fruit moves. The planned path is reused
+    until the fruit moves or the next cell of the path turns out to be blocked.
+
+    Because of that, the agent must see every timestep of the episode, and its actions must not be overridden.
+    """
+
+    def __init__(self):
+        self.walls_key = None
+        self.width = 0
+        self.transitions = None
+        self.blocked = None
+        self.neighbors = None
+        self.direction_offsets = None
+        self.offset_directions = None
+        self.body = collections.deque()
+        self.direction_idx = 0
+        self.fruit_cell = None
+        self.path = collections.deque()
+        self.is_tracking = False
+
+    def begin_episode(self):
+        """ Reset the agent for a new episode. """
+        self.is_tracking = False
+        self.body.clear()
+        self.path.clear()
+        self.fruit_cell = None
+
+    def act(self, observation, reward):
+        """
+        Choose the next action to take.
+
+        Args:
+            observation: observable state for the current timestep.
+            reward: reward received at the beginning of the current timestep.
+
+        Returns:
+            The index of the action to take next.
+        """
+        cells = np.asarray(observation).ravel()
+        if not self.is_tracking:
+            self._start_tracking(observation, cells)
+        else:
+            self._track_last_move()
+
+        if self.fruit_cell is None or cells[self.fruit_cell] != CellType.FRUIT:
+            fruit_cells = np.flatnonzero(cells == CellType.FRUIT)
+            self.fruit_cell = int(fruit_cells[0]) if len(fruit_cells) else None
+            self.path.clear()
+
+        next_direction_idx = self.choose_direction(cells)
+        if next_direction_idx is None:
+            next_direction_idx = self._choose_safe_direction(cells)
+
+        if next_direction_idx == self.direction_idx:
+            action = SnakeAction.MAINTAIN_DIRECTION
+        elif next_direction_idx == (self.direction_idx + 1) % len(ALL_SNAKE_DIRECTIONS):
+            action = SnakeAction.TURN_RIGHT
+        else:
+            action = SnakeAction.TURN_LEFT
+        self.direction_idx = next_direction_idx
+        return action
+
+    def choose_direction(self, cells):
+        """
+        Choose the direction of the next move by following the planned path, replanning if needed.
+
+        Args:
+            cells: the flattened observation.
+
+        Returns:
+            The index of the direction in ALL_SNAKE_DIRECTIONS, or None if the fruit cannot be reached.
+        """
+        if self.path and not self._can_move_to(cells, self.path[0]):
+            self.path.clear()
+        if not self.path and self.fruit_cell is not None:
+            free_cells = ((cells == CellType.EMPTY) | (cells == CellType.FRUIT)).tolist()
+            self.path.extend(self.find_path(free_cells, self.body[0], self.fruit_cell))
+        if not self.path:
+            return None
+        return self.offset_directions[self.path.popleft() - self.body[0]]
+
+    def find_path(self, free_cells, start, goal):
+        """
+        Find a path between two cells, going around the walls and the snake.
+
+        Args:
+            free_cells: a list of booleans, True for the cells the snake can move through.
+            start: flat index of the starting cell.
+            goal: flat index of the target cell.
+
+        Returns:
+            A list of cells to move through, ending with the goal (excluding the start), or an empty list.
+        """
+        return []
+
+    def _start_tracking(self, observation, cells):
+        """ Analyze the initial observation of the episode. """
+        walls = np.asarray(observation) == CellType.WALL
+        walls_key = (walls.shape, walls.tobytes())
+        if walls_key != self.walls_key:
+            self.walls_key = walls_key
+            self.analyze_level(walls)
+
+        head = int(np.flatnonzero(cells == CellType.SNAKE_HEAD)[0])
+        length = 1 + int(np.count_nonzero(cells == CellType.SNAKE_BODY))
+        self.body.extend(head + i * self.width for i in range(length))
+        self.direction_idx = ALL_SNAKE_DIRECTIONS.index(SnakeDirection.NORTH)
+        self.is_tracking = True
+
+    def analyze_level(self, walls):
+        """ Precompute the move tables of the level. Only called when the layout of the walls changes. """
+        self.width = walls.shape[1]
+        transitions, blocked = compute_transitions(walls)
+        self.transitions = transitions.tolist()
+        self.blocked = blocked.tolist()
+        self.neighbors = [
+            [neighbor for neighbor, is_blocked in zip(cell_transitions, cell_blocked) if not is_blocked]
+            for cell_transitions, cell_blocked in zip(self.transitions, self.blocked)
+        ]
+        self.direction_offsets = [direction.y * self.width + direction.x for direction in ALL_SNAKE_DIRECTIONS]
+        self.offset_directions = {offset: idx for idx, offset in enumerate(self.direction_offsets)}
+
+    def _track_last_move(self):
+        """ Move the tracked snake according to the last chosen direction. """
+        new_head = self.body[0] + self.direction_offsets[self.direction_idx]
+        self.body.appendleft(new_head)
+        if new_head != self.fruit_cell:
+            self.body.pop()
+
+    def _is_free(self, cells, cell):
+        """ True if the snake can move into the cell without dying. """
+        return cells[cell] == CellType.EMPTY or cells[cell] == CellType.FRUIT
+
+    def _can_move_to(self, cells, cell):
+        """ True if the head can move into the cell at this timestep (including the cell the tail is leaving). """
+        return self._is_free(cells, cell) or (cell == self.body[-1] and len(self.body) > 2)
+
+    def _choose_safe_direction(self, cells):
+        """ Choose a move that does not kill the snake right away, preferring the cells with more free neighbors. """
+        head = self.body[0]
+        best_direction_idx = self.direction_idx
+        best_num_free_neighbors = -1
+        for turn in (0, 1, -1):
+            direction_idx = (self.direction_idx + turn) % len(ALL_SNAKE_DIRECTIONS)
+            if self.blocked[head][direction_idx]:
+                continue
+            next_cell = self.transitions[head][direction_idx]
+            if not self._can_move_to(cells, next_cell):
+                continue
+            num_free_neighbors = sum(
+                1 for neighbor, is_blocked in zip(self.transitions[next_cell], self.blocked[next_cell])
+                if not is_blocked and neighbor != head and self._is_free(cells, neighbor)
+            )
+            if num_free_neighbors > best_num_free_neighbors:
+                best_direction_idx = direction_idx
+                best_num_free_neighbors = num_free_neighbors
+        return best_direction_idx
+
+
+class BreadthFirstSearchAgent(PathfindingAgentBase):
+    """ Represents a Snake agent that follows the shortest path to the fruit, found with breadth-first search. """
+
+    def find_path(self, free_cells, start, goal):
+        neighbors = self.neighbors
+        parents = {start: None}
+        queue = collections.deque([start])
+        while queue:
+            cell = queue.popleft()
+            if cell == goal:
+                return _unwind_path(parents, goal)
+            for neighbor in neighbors[cell]:
+                if free_cells[neighbor] and neighbor not in parents:
+                    parents[neighbor] = cell
+                    queue.append(neighbor)
+        return []
+
+
+class AStarAgent(PathfindingAgentBase):
+    """ Represents a Snake agent that follows the shortest path to the fruit, found with A* search. """
+
+    def find_path(self, free_cells, start, goal):
+        goal_y, goal_x = divmod(goal, self.width)
+
+        def estimate(cell):
+            y, x = divmod(cell, self.width)
+            return abs(x - goal_x) + abs(y - goal_y)
+
+        parents = {start: None}
+        costs = {start: 0}
+        queue = [(estimate(start), 0, start)]
+        while queue:
+            _, cost, cell = heapq.heappop(queue)
+            if cell == goal:
+                return _unwind_path(parents, goal)
+            if cost > costs[cell]:
+                continue
+            for neighbor in self.neighbors[cell]:
+                if free_cells[neighbor] and cost + 1 < costs.get(neighbor, cost + 2):
+                    costs[neighbor] = cost + 1
+                    parents[neighbor] = cell
+                    heapq.heappush(queue, (cost + 1 + estimate(neighbor), cost + 1, neighbor))
+        return []
+
+
+class HamiltonianCycleAgent(BreadthFirstSearchAgent):
+    """
+    Represents a Snake agent that follows a Hamiltonian cycle through all free cells of the level,
+    which never lets the snake die, and takes shortcuts towards the fruit while the snake is short.
+
+    A cycle is only constructed for levels whose free space is a rectangle with an even side.
+    On other levels, the agent falls back to breadth-first search.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.level_cycle_positions = None
+        self.cycle_positions = None
+        self.num_cycle_cells = 0
+
+    def analyze_level(self, walls):
+        super().analyze_level(walls)
+        self.level_cycle_positions = build_hamiltonian_cycle(~walls)
+        if self.level_cycle_positions is not None:
+            self.num_cycle_cells = int(np.count_nonzero(self.level_cycle_positions >= 0))
+
+    def _start_tracking(self, observation, cells):
+        super()._start_tracking(observation, cells)
+        positions = self.level_cycle_positions
+        if positions is None:
+            self.cycle_positions = None
+            return
+
+        # Walk the cycle in the direction that does not require reversing into the neck.
+        if len(self.body) > 1 and (positions[self.body[1]] - positions[self.body[0]]) % self.num_cycle_cells == 1:
+            positions = np.where(positions < 0, -1, (self.num_cycle_cells - positions) % self.num_cycle_cells)
+        self.cycle_positions = positions.tolist()
+
+    def choose_direction(self, cells):
+        if self.cycle_positions is None:
+            return super().choose_direction(cells)
+
+        head = self.body[0]
+        tail = self.body[-1]
+        length = len(self.body)
+        fruit_distance = self._cycle_distance(head, self.fruit_cell) if self.fruit_cell is not None else 1
+
+        # Skip ahead along the cycle only while there is plenty of room behind the tail.
+        num_empty_cells = self.num_cycle_cells - length - 1
+        max_skip = self._cycle_distance(head, tail) - length - 3
+        if num_empty_cells < self.num_cycle_cells // 2:
+            max_skip = 0
+        elif fruit_distance < self._cycle_distance(head, tail):
+            max_skip -= 1
+            if (self._cycle_distance(head, tail) - fruit_distance) * 4 > num_empty_cells:
+                max_skip -= 10
+        max_skip = max(min(max_skip, fruit_distance), 0)
+
+        best_direction_idx = None
+        best_distance = -1
+        for direction_idx in range(len(ALL_SNAKE_DIRECTIONS)):
+            if self.blocked[head][direction_idx]:
+                continue
+            next_cell = self.transitions[head][direction_idx]
+            if not self._can_move_to(cells, next_cell):
+                continue
+            distance = self._cycle_distance(head, next_cell)
+            if distance == 1 or distance <= max_skip:
+                if distance > best_distance:
+                    best_direction_idx = direction_idx
+                    best_distance = distance
+        return best_direction_idx
+
+    def _cycle_distance(self, from_cell, to_cell):
+        """ Get the number of steps from one cell to another along the cycle. """
+        return (self.cycle_positions[to_cell] - self.cycle_positions[from_cell]) % self.num_cycle_cells
+
+
+def build_hamiltonian_cycle(open_mask):
+    """
+    Build a Hamiltonian cycle through the open cells, if they form a rectangle with at least one even side.
+
+    Args:
+        open_mask: a 2D boolean array, True for the cells the snake can move through.
+
+    Returns:
+        A 1D int array with the position of every cell (by flat index) in the cycle, -1 for cells outside
+        of the cycle, or None if such a cycle cannot be built.
+    """
+    ys, xs = np.nonzero(open_mask)
+    if not len(ys):
+        return None
+    top, bottom, left, right = ys.min(), ys.max() + 1, xs.min(), xs.max() + 1
+    rows, columns = bottom - top, right - left
+    if rows * columns != len(ys) or rows < 2 or columns < 2 or (rows % 2 and columns % 2):
+        return None
+
+    # Zigzag through the rows, leaving the first column for the way back (transposed if the row count is odd).
+    transposed = rows % 2 == 1
+    if transposed:
+        rows, columns = columns, rows
+    cycle = []
+    for row in range(rows):
+        zigzag = range(1, columns) if row % 2 == 0 else range(columns - 1, 0, -1)
+        cycle.extend((row, column) for column in zigzag)
+    cycle.extend((row, 0) for row in range(rows - 1, -1, -1))
+
+    height, width = open_mask.shape
+    positions = np.full(height * width, -1, dtype=np.int64)
+    for position, (row, column) in enumerate(cycle):
+        y, x = (column, row) if transposed else (row, column)
+        positions[(top + y) * width + left + x] = position
+    return positions
+
+
+def _unwind_path(parents, goal):
+    """ Reconstruct the path to the goal from the search tree (excluding the start). """
+    path = []
+    cell = goal
+    while parents[cell] is not None:
+        path.append(cell)
+        cell = parents[cell]
+    path.reverse()
+    return path
@@ -0,0 +1,252 @@
+import numpy as np
+
+from . import batch_kernels
+from .entities import Snake, Field, CellType, SnakeAction, ALL_SNAKE_ACTIONS, ALL_SNAKE_DIRECTIONS
+
+
+# Termination reasons in the order of their integer codes (0 means the episode is still running).
+TERMINATION_REASONS = (None, 'hit_wall', 'hit_own_body', 'timestep_limit_exceeded')
+
+BACKENDS = ('auto', 'numpy', 'numba', 'python')
+
+
+class BatchEnvironment(object):
+    """
+    Represents a batch of independent Snake games that are stepped simultaneously.
+
+    All games share the same level and rules as `Environment`, but the state of every game
+    is kept in stacked NumPy arrays, so a single `step` call advances all of them at once
+    with a handful of vectorized operations instead of a Python loop per game.
+    """
+
+    def __init__(self, config, num_games, seed=None, cells=None, backend='auto'):
+        """
+        Create a new batch of Snake games.
+
+        Args:
+            config (dict): level configuration, typically found in JSON configs.
+            num_games (int): the number of games to run simultaneously.
+            seed: (optional) seed for the random generator used for fruit placement.
+            cells: (optional) a C-contiguous uint8 array of shape (num_games, height, width) to keep the game
+                   fields in, e.g. a view of shared memory. The observations are then written straight into it.
+            backend (str): how the timestep is executed (all backends produce identical games):
+                'numpy' = a handful of vectorized NumPy operations over all games;
+                'numba' = a loop over the games compiled with Numba (requires Numba to be installed);
+                'python' = the same loop as 'numba', interpreted (very slow, for testing and debugging);
+                'auto' = 'numba' if Numba is installed, 'numpy' otherwise.
+        """
+        if backend not in BACKENDS:
+            raise ValueError(f'Unknown batch environment backend: "{backend}"')
+        if backend == 'numba' and not batch_kernels.HAS_NUMBA:
+            raise ValueError('The "numba" backend requires Numba to be installed')
+        if backend == 'auto':
+            backend = 'numba' if batch_kernels.HAS_NUMBA else 'numpy'
+        self.backend = backend
+
+        self.num_games = num_games
+        self.initial_snake_length = config['initial_snake_length']
+        self.rewards = config['rewards']
+        self.max_step_limit = config.get('max_step_limit', 1000)
+        self.rng = np.random.default_rng(seed)
+
+        # Lay out the initial state exactly like `Environment.new_episode` does (minus the fruit).
+        field = Field(level_map=config['field'])
+        field.create_level()
+        snake = Snake(field.find_snake_head(), length=self.initial_snake_length, field_shape=field.shape)
+        field.place_snake(snake)
+
+        self.height, self.width = field.shape
+        num_cells = self.height * self.width
+        self._initial_cells = np.array(field._cells, dtype=np.uint8).ravel()
+        self._initial_body = np.array(snake.cells, dtype=np.int32)
+
+        # Flat cell index offsets for every direction, in the order of ALL_SNAKE_DIRECTIONS.
+        self._direction_offsets = np.array([d.y * self.width + d.x for d in ALL_SNAKE_DIRECTIONS], dtype=np.int32)
+        self._action_turns = np.zeros(max(SnakeAction.TURN_LEFT, SnakeAction.TURN_RIGHT) + 1, dtype=np.int8)
+        self._action_turns[SnakeAction.TURN_LEFT] = -1
+        self._action_turns[SnakeAction.TURN_RIGHT] = 1
+        self._games = np.arange(num_games)
+
+        # Game state. Snake bodies are ring buffers of flat cell indices, the head being at `head_positions`.
+        if cells is not None and (cells.shape != (num_games, self.height, self.width) or not cells.flags.c_contiguous):
+            raise ValueError('The cells buffer must be a C-contiguous array of shape (num_games, height, width)')
+        self.cells = np.zeros((num_games, self.height, self.width), dtype=np.uint8) if cells is None else cells
+        self._flat_cells = self.cells.reshape(num_games, num_cells)
+        self.bodies = np.zeros((num_games, num_cells), dtype=np.int32)
+        self.head_positions = np.zeros(num_games, dtype=np.intp)
+        self.lengths = np.zeros(num_games, dtype=np.intp)
+        self.directions = np.zeros(num_games, dtype=np.int8)
+        self.fruits = np.zeros(num_games, dtype=np.intp)
+        self.timesteps = np.zeros(num_games, dtype=np.int64)
+
+        # Statistics of the episodes in progress.
+        self.fruits_eaten = np.zeros(num_games, dtype=np.int64)
+        self.sum_episode_rewards = np.zeros(num_games, dtype=np.float64)
+
+        # Final state and statistics of the most recently finished episode of every game.
+        # Only the games reported as done by the last `step` call have been updated.
+        self.terminal_observations = np.zeros_like(self.cells)
+        self.final_timesteps = np.zeros(num_games, dtype=np.int64)
+        self.final_fruits_eaten = np.zeros(num_games, dtype=np.int64)
+        self.final_sum_episode_rewards = np.zeros(num_games, dtype=np.float64)
+        self.final_termination_reasons = np.zeros(num_games, dtype=np.int8)
+
+    def seed(self, value):
+        """ Initialize the random state of the environment to make results reproducible. """
+        self.rng = np.random.default_rng(value)
+
+    @property
+    def observation_shape(self):
+        """ Get the shape of the state observed by each game at each timestep. """
+        return self.height, self.width
+
+    @property
+    def num_actions(self):
+        """ Get the number of actions the agent can take in each game. """
+        return len(ALL_SNAKE_ACTIONS)
+
+    def reset(self):
+        """
+        Begin a new episode in every game.
+
+        Returns:
+            The observations of all games, shaped (num_games, height, width).
+            The array is owned by the environment and gets overwritten by the next call.
+        """
+        self._reset_games(self._games, self.rng.random(self.num_games))
+        return self.cells
+
+    def step(self, actions):
+        """
+        Take one action in every game and execute the timestep.
+
+        Games that have ended at this timestep are reset automatically. Their final observations
+        and statistics are available in `terminal_observations` and the `final_*` attributes.
+
+        Args:
+            actions: an integer array of shape (num_games, ) with one `SnakeAction` per game.
+
+        Returns:
+            A tuple of (observations, rewards, dones) arrays, each having num_games as the first dimension.
+            The observations array is owned by the environment and gets overwritten by the next call.
+        """
+        actions = np.asarray(actions)
+        if actions.size and (actions.min() < 0 or actions.max() >= self.num_actions):
+            raise ValueError(f'Invalid snake actions, expected values between 0 and {self.num_actions - 1}')
+
+        # One uniform number per game for fruit placement after eating, and one for a possible reset.
+        uniforms = self.rng.random((self.num_games, 2))
+        if self.backend != 'numpy':
+            return self._step_kernel(actions, uniforms)
+
+        games = self._games
+        cells = self._flat_cells
+        num_cells = cells.shape[1]
+
+        self.directions = (self.directions + self._action_turns[actions]) % len(ALL_SNAKE_DIRECTIONS)
+        self.timesteps += 1
+
+        old_heads = self.bodies[games, self.head_positions]
+        old_tails = self.bodies[games, (self.head_positions + self.lengths - 1) % num_cells]
+        new_heads = old_heads + self._direction_offsets[self.directions]
+        ate_fruit = new_heads == self.fruits
+
+        # Moving the head one step back in the ring buffer drops the tail, unless the snake grows.
+        self.head_positions = (self.head_positions - 1) % num_cells
+        self.bodies[games, self.head_positions] = new_heads
+        self.lengths += ate_fruit
+
+        # Update the snake footprint. Clearing the tail first supports chasing own tail.
+        cells[games, old_heads] = CellType.SNAKE_BODY
+        moved = ~ate_fruit
+        cells[games[moved], old_tails[moved]] = CellType.EMPTY
+        targets = cells[games, new_heads]
+        has_hit_wall = targets == CellType.WALL
+        has_hit_own_body = targets == CellType.SNAKE_BODY
+        cells[games, new_heads] = CellType.SNAKE_HEAD
+
+        rewards = np.where(
+            ate_fruit,
+            self.rewards['ate_fruit'] * self.lengths,
+            self.rewards['timestep']
+        ).astype(np.float64)
+
+        # The empty cells are the same as before the move for the snakes that have grown.
+        eaters = np.flatnonzero(ate_fruit)
+        self._place_fruits(eaters, uniforms[eaters, 0])
+        self.fruits_eaten += ate_fruit
+
+        is_dead = has_hit_wall | has_hit_own_body
+        rewards[is_dead] = self.rewards['died']
+        timestep_limit_exceeded = self.timesteps >= self.max_step_limit
+        dones = is_dead | timestep_limit_exceeded
+        self.sum_episode_rewards += rewards
+
+        finished = np.flatnonzero(dones)
+        if finished.size:
+            termination_reasons = np.select(
+                [timestep_limit_exceeded, has_hit_own_body, has_hit_wall],
+                [3, 2, 1]
+            )
+            self.terminal_observations[finished] = self.cells[finished]
+            self.final_timesteps[finished] = self.timesteps[finished]
+            self.final_fruits_eaten[finished] = self.fruits_eaten[finished]
+            self.final_sum_episode_rewards[finished] = self.sum_episode_rewards[finished]
+            self.final_termination_reasons[finished] = termination_reasons[finished]
+            self._reset_games(finished, uniforms[finished, 1])
+
+        return self.cells, rewards, dones
+
+    def _step_kernel(self, actions, uniforms):
+        """ Execute the timestep with the per-game loop from `batch_kernels`. """
+        step_games = batch_kernels.step_games
+        if self.backend == 'python':
+            step_games = batch_kernels.get_python_function(step_games)
+
+        rewards = np.empty(self.num_games, dtype=np.float64)
+        dones = np.empty(self.num_games, dtype=bool)
+        step_games(
+            actions, uniforms, self._flat_cells, self.bodies, self.head_positions, self.lengths, self.directions,
+            self.fruits, self.timesteps, self.fruits_eaten, self.sum_episode_rewards,
+            self._direction_offsets, self._action_turns, self._initial_cells, self._initial_body,
+            float(self.rewards['timestep']), float(self.rewards['ate_fruit']), float(self.rewards['died']),
+            self.max_step_limit, rewards, dones,
+            self.terminal_observations.reshape(self.num_games, -1), self.final_timesteps, self.final_fruits_eaten,
+            self.final_sum_episode_rewards, self.final_termination_reasons,
+        )
+        return self.cells, rewards, dones
+
+    def _reset_games(self, games, uniforms):
+        """ Begin a new episode in the specified games. """
+        self._flat_cells[games] = self._initial_cells
+        self.bodies[games, :len(self._initial_body)] = self._initial_body
+        self.head_positions[games] = 0
+        self.lengths[games] = len(self._initial_body)
+        self.directions[games] = 0
+        self.timesteps[games] = 0
+        self.fruits_eaten[games] = 0
+        self.sum_episode_rewards[games] = 0
+        self._place_fruits(games, uniforms)
+
+    def _place_fruits(self, games, uniforms):
+        """
+        Put a new fruit into a random empty cell of each of the specified games.
+
+        Args:
+            games: indices of the games that need a new fruit.
+            uniforms: one random number in [0, 1) per game, selecting the empty cell in row-major order
+                (the same way as `batch_kernels.place_fruit`).
+        """
+        if not games.size:
+            return
+
+        is_empty = self._flat_cells[games] == CellType.EMPTY
+        num_empty = is_empty.sum(axis=1)
+        picks = (uniforms * num_empty).astype(np.intp)
+        positions = (np.cumsum(is_empty, axis=1) > picks[:, np.newaxis]).argmax(axis=1)
+
+        # A snake that has filled the whole field gets no fruit (-1), like in `Environment.generate_fruit`.
+        has_room = num_empty > 0
+        positions[~has_room] = -1
+        self._flat_cells[games[has_room], positions[has_room]] = CellType.FRUIT
+        self.fruits[games] = positions
@@ -0,0 +1,157 @@
+"""
+Provides a per-game loop implementation of the `BatchEnvironment` timestep, compiled with Numba if it is installed.
+
+On small boards, a timestep touches only a few cells per game, so the fixed cost of every vectorized NumPy
+operation dominates. A compiled loop over the games avoids that overhead. The loop follows the NumPy path
+of `BatchEnvironment.step` operation by operation and consumes the same random numbers, so both paths
+produce identical games.
+"""
+
+from .entities import CellType
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+
+HAS_NUMBA = numba is not None
+
+# Plain module-level constants, so that the compiled code can inline them.
+EMPTY = CellType.EMPTY
+FRUIT = CellType.FRUIT
+SNAKE_HEAD = CellType.SNAKE_HEAD
+SNAKE_BODY = CellType.SNAKE_BODY
+WALL = CellType.WALL
+
+
+def jit(function):
+    """ Compile the function with Numba if it is installed, otherwise leave it as is. """
+    if numba is None:
+        return function
+    return numba.njit(cache=True, nogil=True)(function)
+
+
+@jit
+def place_fruit(cells, uniform):
+    """
+    Put a fruit into a random empty cell of a single game, picking empty cells in row-major order.
+
+    Args:
+        cells: the flat cells of the game.
+        uniform: a random number in [0, 1).
+
+    Returns:
+        The cell index of the fruit, or -1 if there are no empty cells left.
+    """
+    num_empty = 0
+    for cell in range(cells.shape[0]):
+        if cells[cell] == EMPTY:
+            num_empty += 1
+    if num_empty == 0:
+        return -1
+
+    pick = int(uniform * num_empty)
+    for cell in range(cells.shape[0]):
+        if cells[cell] == EMPTY:
+            if pick == 0:
+                cells[cell] = FRUIT
+                return cell
+            pick -= 1
+    return -1
+
+
+@jit
+def reset_game(game, uniform, cells, bodies, head_positions, lengths, directions, fruits, timesteps,
+               fruits_eaten, sum_episode_rewards, initial_cells, initial_body):
+    """ Begin a new episode in a single game. """
+    cells[game, :] = initial_cells
+    bodies[game, :initial_body.shape[0]] = initial_body
+    head_positions[game] = 0
+    lengths[game] = initial_body.shape[0]
+    directions[game] = 0
+    timesteps[game] = 0
+    fruits_eaten[game] = 0
+    sum_episode_rewards[game] = 0
+    fruits[game] = place_fruit(cells[game], uniform)
+
+
+@jit
+def step_games(actions, uniforms, cells, bodies, head_positions, lengths, directions, fruits, timesteps,
+               fruits_eaten, sum_episode_rewards, direction_offsets, action_turns, initial_cells, initial_body,
+               timestep_reward, ate_fruit_reward, died_reward, max_step_limit, rewards, dones,
+               terminal_observations, final_timesteps, final_fruits_eaten, final_sum_episode_rewards,
+               final_termination_reasons):
+    """
+    Execute a timestep in every game, resetting the games that have ended.
+
+    The arguments are the state arrays of `BatchEnvironment` (with flattened cells), modified in place,
+    and the output arrays for the rewards and dones.
+    """
+    num_cells = cells.shape[1]
+    num_directions = direction_offsets.shape[0]
+
+    for game in range(cells.shape[0]):
+        # Compiled code does not check array bounds, so validate the only index that comes from outside.
+        action = actions[game]
+        if action < 0 or action >= action_turns.shape[0]:
+            raise IndexError('Invalid snake action')
+        direction = (directions[game] + action_turns[action]) % num_directions
+        directions[game] = direction
+        timesteps[game] += 1
+
+        head_position = head_positions[game]
+        old_head = bodies[game, head_position]
+        old_tail = bodies[game, (head_position + lengths[game] - 1) % num_cells]
+        new_head = old_head + direction_offsets[direction]
+        ate_fruit = new_head == fruits[game]
+
+        # Moving the head one step back in the ring buffer drops the tail, unless the snake grows.
+        head_position = (head_position - 1) % num_cells
+        head_positions[game] = head_position
+        bodies[game, head_position] = new_head
+        if ate_fruit:
+            lengths[game] += 1
+
+        # Update the snake footprint. Clearing the tail first supports chasing own tail.
+        cells[game, old_head] = SNAKE_BODY
+        if not ate_fruit:
+            cells[game, old_tail] = EMPTY
+        target = cells[game, new_head]
+        has_hit_wall = target == WALL
+        has_hit_own_body = target == SNAKE_BODY
+        cells[game, new_head] = SNAKE_HEAD
+
+        if ate_fruit:
+            reward = ate_fruit_reward * lengths[game]
+            fruits[game] = place_fruit(cells[game], uniforms[game, 0])
+            fruits_eaten[game] += 1
+        else:
+            reward = timestep_reward
+
+        if has_hit_wall or has_hit_own_body:
+            reward = died_reward
+        timestep_limit_exceeded = timesteps[game] >= max_step_limit
+        done = has_hit_wall or has_hit_own_body or timestep_limit_exceeded
+        sum_episode_rewards[game] += reward
+        rewards[game] = reward
+        dones[game] = done
+
+        if done:
+            if timestep_limit_exceeded:
+                final_termination_reasons[game] = 3
+            elif has_hit_own_body:
+                final_termination_reasons[game] = 2
+            else:
+                final_termination_reasons[game] = 1
+            terminal_observations[game, :] = cells[game]
+            final_timesteps[game] = timesteps[game]
+            final_fruits_eaten[game] = fruits_eaten[game]
+            final_sum_episode_rewards[game] = sum_episode_rewards[game]
+            reset_game(game, uniforms[game, 1], cells, bodies, head_positions, lengths, directions, fruits,
+                       timesteps, fruits_eaten, sum_episode_rewards, initial_cells, initial_body)
+
+
+def get_python_function(function):
+    """ Get the interpreted Python version of a kernel function, whether it has been compiled or not. """
+    return getattr(function, 'py_func', function)
@@ -1,4 +1,4 @@
-import itertools
+import array
 import random
 
 import numpy as np
@@ -59,84 +59,267 @@ ALL_SNAKE_ACTIONS = [
 ]
 
 
+# Direction index after turning left or right, for every direction index in ALL_SNAKE_DIRECTIONS.
+_TURN_LEFT = tuple((idx - 1) % len(ALL_SNAKE_DIRECTIONS) for idx in range(len(ALL_SNAKE_DIRECTIONS)))
+_TURN_RIGHT = tuple((idx + 1) % len(ALL_SNAKE_DIRECTIONS) for idx in range(len(ALL_SNAKE_DIRECTIONS)))
+
+# Grid used for cell indexing when the snake is created without a field.
+# Its x coordinates are centered on 0, so that the snake may move to negative coordinates too.
+_DEFAULT_GRID_WIDTH = 1 << 15
+
+
 class Snake(object):
-    """ Represents the snake that has a position, can move, and change directions. """
+    """
+    Represents the snake that has a position, can move, and change directions.
+
+    To keep the timesteps fast, the body is stored as a ring buffer of int32 flat cell
+    indices (y * width + x), and the direction as an index into ALL_SNAKE_DIRECTIONS.
+    The point-based attributes (`head`, `tail`, `body`, `direction`) are computed on access.
+    """
 
-    def __init__(self, start_coord, length=3):
+    __slots__ = ('_width', '_x_offset', '_capacity', '_cells', '_head_position', '_length', '_direction_idx',
+                 '_direction_offsets')
+
+    directions = ALL_SNAKE_DIRECTIONS
+
+    def __init__(self, start_coord, length=3, field_shape=None):
         """
         Create a new snake.
         
         Args:
             start_coord: A point representing the initial position of the snake. 
             length: An integer specifying the initial length of the snake.
+            field_shape: (optional) the (height, width) of the field, which defines the cell indexing
+                and the capacity of the body buffer. Without it, the buffer grows as needed.
         """
+        if field_shape is not None:
+            height, width = field_shape
+            self._capacity = max(height * width, length)
+            self._x_offset = 0
+        else:
+            width = _DEFAULT_GRID_WIDTH
+            self._capacity = max(2 * length, 16)
+            self._x_offset = width // 2
+            if not -self._x_offset <= start_coord.x < self._x_offset:
+                raise ValueError(f'The x coordinate of the snake must be in [{-self._x_offset}, {self._x_offset})')
+
+        self._width = width
+        self._cells = array.array('i', bytes(4 * self._capacity))
+        self._direction_offsets = tuple(direction.y * width + direction.x for direction in ALL_SNAKE_DIRECTIONS)
+
         # Place the snake vertically, heading north.
-        self.body = deque([
-            Point(start_coord.x, start_coord.y + i)
-            for i in range(length)
-        ])
-        self.direction = SnakeDirection.NORTH
-        self.directions = ALL_SNAKE_DIRECTIONS
+        self._head_position = 0
+        self._length = length
+        for i in range(length):
+            self._cells[i] = (start_coord.y + i) * width + start_coord.x
+        self._direction_idx = ALL_SNAKE_DIRECTIONS.index(SnakeDirection.NORTH)
+
+    def _to_point(self, cell):
+        """ Convert a flat cell index to a point. """
+        y, x = divmod(cell + self._x_offset, self._width)
+        return Point(x - self._x_offset, y)
 
     @property
     def head(self):
         """ Get the position of the snake's head. """
-        return self.body[0]
+        return self._to_point(self.head_cell)
 
     @property
     def tail(self):
         """ Get the position of the snake's tail. """
-        return self.body[-1]
+        return self._to_point(self.tail_cell)
+
+    @property
+    def body(self):
+        """ Get the positions of all body cells, from head to tail. """
+        return [self._to_point(cell) for cell in self.cells]
+
+    @property
+    def head_cell(self):
+        """ Get the flat cell index of the snake's head. """
+        return self._cells[self._head_position]
+
+    @property
+    def tail_cell(self):
+        """ Get the flat cell index of the snake's tail. """
+        return self._cells[(self._head_position + self._length - 1) % self._capacity]
+
+    @property
+    def cells(self):
+        """ Get the flat cell indices of all body cells, from head to tail. """
+        end_position = self._head_position + self._length
+        if end_position <= self._capacity:
+            return self._cells[self._head_position:end_position].tolist()
+        return (self._cells[self._head_position:] + self._cells[:end_position - self._capacity]).tolist()
 
     @property
     def length(self):
         """ Get the current length of the snake. """
-        return len(self.body)
+        return self._length
+
+    @property
+    def direction(self):
+        """ Get the current direction of the snake (one of SnakeDirection). """
+        return ALL_SNAKE_DIRECTIONS[self._direction_idx]
+
+    @direction.setter
+    def direction(self, value):
+        """ Change the current direction of the snake (one of SnakeDirection). """
+        self._direction_idx = ALL_SNAKE_DIRECTIONS.index(value)
 
     def peek_next_move(self):
         """ Get the point the snake will move to at its next step. """
-        return self.head + self.direction
+        return self._to_point(self.peek_next_cell())
+
+    def peek_next_cell(self):
+        """ Get the flat index of the cell the snake will move to at its next step. """
+        return self._cells[self._head_position] + self._direction_offsets[self._direction_idx]
 
     def turn_left(self):
         """ At the next step, take a left turn relative to the current direction. """
-        direction_idx = self.directions.index(self.direction)
-        self.direction = self.directions[direction_idx - 1]
+        self._direction_idx = _TURN_LEFT[self._direction_idx]
 
     def turn_right(self):
         """ At the next step, take a right turn relative to the current direction. """
-        direction_idx = self.directions.index(self.direction)
-        self.direction = self.directions[(direction_idx + 1) % len(self.directions)]
+        self._direction_idx = _TURN_RIGHT[self._direction_idx]
 
     def grow(self):
         """ Grow the snake by 1 block from the head. """
-        self.body.appendleft(self.peek_next_move())
+        if self._length == self._capacity:
+            self._extend_capacity()
+        next_cell = self.peek_next_cell()
+        self._head_position = (self._head_position - 1) % self._capacity
+        self._cells[self._head_position] = next_cell
+        self._length += 1
 
     def move(self):
         """ Move the snake 1 step forward, taking the current direction into account. """
-        self.body.appendleft(self.peek_next_move())
-        self.body.pop()
+        # The new head takes the place right before the current head, which, since the buffer
+        # is circular, is right after the tail. Keeping the length constant drops the tail.
+        next_cell = self.peek_next_cell()
+        self._head_position = (self._head_position - 1) % self._capacity
+        self._cells[self._head_position] = next_cell
+
+    def _extend_capacity(self):
+        """ Double the size of the body buffer, unrolling the ring so that the head comes first. """
+        cells = self.cells
+        self._capacity *= 2
+        self._cells = array.array('i', bytes(4 * self._capacity))
+        self._cells[:len(cells)] = array.array('i', cells)
+        self._head_position = 0
+
+
+LEVEL_MAP_SYMBOLS = {
+    'S': CellType.SNAKE_HEAD,
+    's': CellType.SNAKE_BODY,
+    '#': CellType.WALL,
+    'O': CellType.FRUIT,
+    '.': CellType.EMPTY,
+}
+
+
+class LevelTemplate(object):
+    """
+    Represents a level map compiled into arrays once, so that fields can be reset
+    with bulk array copies instead of re-parsing the map on every episode.
+    Templates are immutable and can be shared by any number of fields.
+    """
+
+    def __init__(self, cells, head=None):
+        """
+        Create a new level template.
+
+        Args:
+            cells: a 2D array of cell types.
+            head: (optional) the position of the snake's head, if already known (e.g. from a level pack).
+        """
+        self.cells = np.array(cells, dtype=np.uint8)
+        self.cells.flags.writeable = False
+        self.wall_mask = self.cells == CellType.WALL
+        self.wall_mask.flags.writeable = False
+
+        # Empty-cell index in the same layout as the one maintained by Field.
+        self.empty_cells = np.flatnonzero(self.cells.ravel() == CellType.EMPTY).astype(np.int32)
+        self.empty_cells.flags.writeable = False
+        self.empty_cell_positions = np.full(self.cells.size, -1, dtype=np.int32)
+        self.empty_cell_positions[self.empty_cells] = np.arange(len(self.empty_cells))
+        self.empty_cell_positions.flags.writeable = False
+
+        if head is None:
+            heads = np.argwhere(self.cells == CellType.SNAKE_HEAD)
+            head = Point(int(heads[0][1]), int(heads[0][0])) if len(heads) else None
+        self.head = head
+
+        # Static navigation tables, computed on first use (see `snakeai.gameplay.navigation`).
+        self.tables = None
+
+    @classmethod
+    def from_level_map(cls, level_map):
+        """ Compile a level map (a list of strings, 1 string per row) into a template. """
+        if len(set(len(line) for line in level_map)) > 1:
+            raise ValueError('All rows of the level map must have the same width')
+        try:
+            return cls([
+                [LEVEL_MAP_SYMBOLS[symbol] for symbol in line]
+                for line in level_map
+            ])
+        except KeyError as err:
+            raise ValueError(f'Unknown level map symbol: "{err.args[0]}"')
+
+    @property
+    def shape(self):
+        """ Get the shape of the level as (height, width). """
+        return self.cells.shape
+
+
+_level_template_cache = {}
+
+
+def get_level_template(level_map):
+    """
+    Get the compiled template for the level map.
+    Each distinct level map is compiled only once per process, and the template is shared.
+    """
+    key = tuple(level_map)
+    template = _level_template_cache.get(key)
+    if template is None:
+        template = LevelTemplate.from_level_map(level_map)
+        _level_template_cache[key] = template
+    return template
 
 
 class Field(object):
     """ Represents the playing field for the Snake game. """
 
-    def __init__(self, level_map=None):
+    def __init__(self, level_map=None, legacy_sampling=False, rng=None, template=None):
         """
         Create a new Snake field.
         
         Args:
             level_map: a list of strings representing the field objects (1 string per row).
+            template: (optional) a compiled `LevelTemplate` to use instead of the level map
+                (e.g. a level from a level pack). It can be replaced before any `create_level` call.
+            legacy_sampling: if True, pick random empty cells the way older versions did
+                (a set of points converted to a list on every call, using the global `random` module),
+                which is slow but reproduces the fruit positions of previously seeded runs.
+            rng: (optional) a `numpy.random.Generator` used for picking random empty cells.
         """
         self.level_map = level_map
+        self.legacy_sampling = legacy_sampling
+        self.rng = rng if rng is not None else np.random.default_rng()
+        self.template = template
         self._cells = None
-        self._empty_cells = set()
-        self._level_map_to_cell_type = {
-            'S': CellType.SNAKE_HEAD,
-            's': CellType.SNAKE_BODY,
-            '#': CellType.WALL,
-            'O': CellType.FRUIT,
-            '.': CellType.EMPTY,
-        }
+        self._flat_cells = None
+        self._width = 0
+
+        # Empty cells are tracked as a dense array of flat cell indices plus the position
+        # of every cell in that array (-1 if not empty), which allows O(1) add, remove and sample.
+        self._empty_cells = None
+        self._empty_cell_positions = None
+        self._num_empty_cells = 0
+        self._legacy_empty_cells = set()
+
+        self._level_map_to_cell_type = LEVEL_MAP_SYMBOLS
         self._cell_type_to_level_map = {
             cell_type: symbol
             for symbol, cell_type in self._level_map_to_cell_type.items()
@@ -150,14 +333,30 @@ class Field(object):
     def __setitem__(self, point, cell_type):
         """ Update the type of cell at the given point. """
         x, y = point
-        self._cells[y, x] = cell_type
+        self.set_cell(y * self._width + x, cell_type)
+
+    def get_cell(self, index):
+        """ Get the type of cell at the given flat cell index (y * width + x). """
+        return self._flat_cells[index]
+
+    def set_cell(self, index, cell_type):
+        """ Update the type of cell at the given flat cell index (y * width + x). """
+        self._flat_cells[index] = cell_type
 
         # Do some internal bookkeeping to not rely on random selection of blank cells.
         if cell_type == CellType.EMPTY:
-            self._empty_cells.add(point)
+            self._add_empty_cell(index)
         else:
-            if point in self._empty_cells:
-                self._empty_cells.remove(point)
+            self._remove_empty_cell(index)
+
+        if self.legacy_sampling:
+            y, x = divmod(index, self._width)
+            point = Point(x, y)
+            if cell_type == CellType.EMPTY:
+                self._legacy_empty_cells.add(point)
+            else:
+                if point in self._legacy_empty_cells:
+                    self._legacy_empty_cells.remove(point)
 
     def __str__(self):
         return '\n'.join(
@@ -167,41 +366,91 @@ class Field(object):
 
     @property
     def size(self):
-        """ Get the size of the field (size == width == height). """
-        return len(self.level_map)
+        """ Get the size of a square field (size == width == height). Use `shape` for rectangular fields. """
+        if self.width != self.height:
+            raise ValueError(f'The field is not square ({self.width}x{self.height}), use Field.shape instead')
+        return self.height
+
+    @property
+    def width(self):
+        """ Get the number of columns in the field. """
+        return self.shape[1]
+
+    @property
+    def height(self):
+        """ Get the number of rows in the field. """
+        return self.shape[0]
+
+    @property
+    def shape(self):
+        """ Get the shape of the field as (height, width). """
+        if self.level_map is None:
+            return self.template.shape
+        return len(self.level_map), len(self.level_map[0])
 
     def create_level(self):
-        """ Create a new field based on the level map. """
-        try:
-            self._cells = np.array([
-                [self._level_map_to_cell_type[symbol] for symbol in line]
-                for line in self.level_map
-            ])
-            self._empty_cells = {
-                Point(x, y)
-                for y in range(self.size)
-                for x in range(self.size)
-                if self[(x, y)] == CellType.EMPTY
+        """ Create a new field based on the level map (or the template, if there is no level map). """
+        if self.level_map is not None:
+            self.template = get_level_template(self.level_map)
+
+        # Reuse the buffers from the previous episode if possible, and just copy the template over.
+        if self._cells is None or self._cells.shape != self.template.shape:
+            self._cells = np.empty_like(self.template.cells)
+            self._flat_cells = self._cells.reshape(-1)
+            self._width = self._cells.shape[1]
+            self._empty_cells = np.empty(self._cells.size, dtype=np.int32)
+            self._empty_cell_positions = np.empty(self._cells.size, dtype=np.int32)
+
+        np.copyto(self._cells, self.template.cells)
+        self._num_empty_cells = len(self.template.empty_cells)
+        self._empty_cells[:self._num_empty_cells] = self.template.empty_cells
+        np.copyto(self._empty_cell_positions, self.template.empty_cell_positions)
+
+        if self.legacy_sampling:
+            self._legacy_empty_cells = {
+                Point(int(cell % self._width), int(cell // self._width))
+                for cell in self.template.empty_cells
             }
-        except KeyError as err:
-            raise ValueError(f'Unknown level map symbol: "{err.args[0]}"')
 
     def find_snake_head(self):
         """ Find the snake's head on the field. """
-        for y in range(self.size):
-            for x in range(self.size):
-                if self[(x, y)] == CellType.SNAKE_HEAD:
-                    return Point(x, y)
-        raise ValueError('Initial snake position not specified on the level map')
+        if self.template.head is None:
+            raise ValueError('Initial snake position not specified on the level map')
+        return self.template.head
 
     def get_random_empty_cell(self):
         """ Get the coordinates of a random empty cell. """
-        return random.choice(list(self._empty_cells))
+        if self.legacy_sampling:
+            return random.choice(list(self._legacy_empty_cells))
+
+        if not self._num_empty_cells:
+            raise IndexError('Cannot choose from an empty sequence')
+        index = int(self._empty_cells[self.rng.integers(self._num_empty_cells)])
+        y, x = divmod(index, self._width)
+        return Point(x, y)
+
+    def _add_empty_cell(self, index):
+        """ Mark the cell with the given flat index as empty. """
+        if self._empty_cell_positions[index] < 0:
+            self._empty_cells[self._num_empty_cells] = index
+            self._empty_cell_positions[index] = self._num_empty_cells
+            self._num_empty_cells += 1
+
+    def _remove_empty_cell(self, index):
+        """ Mark the cell with the given flat index as non-empty (swap it with the last empty cell and drop it). """
+        position = self._empty_cell_positions[index]
+        if position >= 0:
+            self._num_empty_cells -= 1
+            last_index = self._empty_cells[self._num_empty_cells]
+            self._empty_cells[position] = last_index
+            self._empty_cell_positions[last_index] = position
+            self._empty_cell_positions[index] = -1
 
     def place_snake(self, snake):
         """ Put the snake on the field and fill the cells with its body. """
-        self[snake.head] = CellType.SNAKE_HEAD
-        for snake_cell in itertools.islice(snake.body, 1, len(snake.body)):
+        body = snake.body
+        self[body[0]] = CellType.SNAKE_HEAD
+        for snake_cell in body[1:]:
             self[snake_cell] = CellType.SNAKE_BODY
 
     def update_snake_footprint(self, old_head, old_tail, new_head):
@@ -217,12 +466,27 @@ class Field(object):
             old_tail: position of the tail before the move.
             new_head: position of the head after the move.
         """
-        self[old_head] = CellType.SNAKE_BODY
+        self.update_snake_footprint_cells(
+            old_head.y * self._width + old_head.x,
+            old_tail.y * self._width + old_tail.x if old_tail else None,
+            new_head.y * self._width + new_head.x,
+        )
+
+    def update_snake_footprint_cells(self, old_head, old_tail, new_head):
+        """
+        Same as `update_snake_footprint`, but takes flat cell indices (y * width + x) instead of points.
+        
+        Args:
+            old_head: cell index of the head before the move. 
+            old_tail: cell index of the tail before the move (None if the snake has grown).
+            new_head: cell index of the head after the move.
+        """
+        self.set_cell(old_head, CellType.SNAKE_BODY)
 
         # If we've grown at this step, the tail cell shouldn't move.
-        if old_tail:
-            self[old_tail] = CellType.EMPTY
+        if old_tail is not None:
+            self.set_cell(old_tail, CellType.EMPTY)
 
         # Support the case when we're chasing own tail.
-        if self[new_head] not in (CellType.WALL, CellType.SNAKE_BODY) or new_head == old_tail:
-            self[new_head] = CellType.SNAKE_HEAD
+        if self._flat_cells[new_head] not in (CellType.WALL, CellType.SNAKE_BODY) or new_head == old_tail:
+            self.set_cell(new_head, CellType.SNAKE_HEAD)
@@ -1,11 +1,15 @@
+import array
 import pprint
 import random
 import time
 
 import numpy as np
-import pandas as pd
 
-from .entities import Snake, Field, CellType, SnakeAction, ALL_SNAKE_ACTIONS
+from .entities import Snake, Field, CellType, SnakeAction, ALL_SNAKE_ACTIONS, get_level_template
+from .levels import LevelPack
+from .navigation import get_level_tables
+from .trajectory import TrajectoryRecorder
+from snakeai.utils.stats import EpisodeStatisticsWriter
 
 
 class Environment(object):
@@ -14,22 +18,50 @@ class Environment(object):
     provides rewards for the agent and keeps track of game statistics.
     """
 
-    def __init__(self, config, verbose=1):
+    def __init__(self, config, verbose=1, legacy_sampling=False, observation_mode='copy', observation_ring_size=8,
+                 stats_format='csv'):
         """
         Create a new Snake RL environment.
         
         Args:
             config (dict): level configuration, typically found in JSON configs.  
+                Instead of a `field` map, it can specify a `level_pack` file (see `snakeai.gameplay.levels`).
+                The optional `level_cache_dir` is where the navigation tables (see `level_tables`) are cached.
             verbose (int): verbosity level:
                 0 = do not write any debug information;
-                1 = write a CSV file containing the statistics for every episode;
-                2 = same as 1, but also write a full log file containing the state of each timestep.
+                1 = write a file containing the statistics for every episode (see `stats_format`);
+                2 = same as 1, but also record every episode to a binary trajectory file
+                    (see `snakeai.gameplay.trajectory`) that allows replaying any timestep.
+            legacy_sampling (bool): place fruits exactly like older versions did, for reproducing old seeded runs.
+                In this mode, `seed` also reseeds the global `random` and `np.random` modules.
+            observation_mode (str): how observations are returned (see `get_observation`):
+                'copy' = a new uint8 array at every timestep, owned by the caller;
+                'view' = a read-only view of the live field, no allocation per timestep;
+                'ring' = a read-only array from a ring of preallocated uint8 buffers.
+            observation_ring_size (int): the number of buffers in the ring for the 'ring' mode.
+            stats_format (str): the format of the episode statistics file ('csv' or 'npz').
         """
-        self.field = Field(level_map=config['field'])
+        if observation_mode not in ('copy', 'view', 'ring'):
+            raise ValueError(f'Unknown observation mode: "{observation_mode}"')
+
+        self.rng = np.random.default_rng()
+
+        # A level pack replaces the single level map: every episode is played on a random level from the pack.
+        self.level_pack = None
+        self.level_index = None
+        if 'level_pack' in config:
+            if verbose >= 2:
+                raise ValueError('Recording trajectories is not supported for level packs')
+            self.level_pack = LevelPack(config['level_pack'])
+            self.field = Field(legacy_sampling=legacy_sampling, rng=self.rng, template=self.level_pack[0])
+        else:
+            self.field = Field(level_map=config['field'], legacy_sampling=legacy_sampling, rng=self.rng)
         self.snake = None
         self.fruit = None
+        self.fruit_cell = None
         self.initial_snake_length = config['initial_snake_length']
         self.rewards = config['rewards']
+        self.level_cache_dir = config.get('level_cache_dir')
         self.max_step_limit = config.get('max_step_limit', 1000)
         self.is_game_over = False
 
@@ -37,31 +69,145 @@ class Environment(object):
         self.current_action = None
         self.stats = EpisodeStatistics()
         self.verbose = verbose
-        self.debug_file = None
-        self.stats_file = None
+        self.trajectory_recorder = None
+        self.last_seed = None
+        self.stats_writer = None
+        self.stats_format = stats_format
+
+        self.observation_mode = observation_mode
+        self.observation_ring_size = observation_ring_size
+        self._observation_ring = None
+        self._observation_ring_index = 0
 
     def seed(self, value):
-        """ Initialize the random state of the environment to make results reproducible. """
-        random.seed(value)
-        np.random.seed(value)
+        """
+        Initialize the random state of the environment to make results reproducible.
+
+        Every environment owns its random generator, so environments seeded independently
+        do not affect each other, even when they run in the same process.
+        Use `snakeai.utils.seeding.spawn_seeds` to derive seeds for many environments from a single root seed.
+
+        Args:
+            value: an integer seed or a `numpy.random.SeedSequence`.
+        """
+        self.rng = np.random.default_rng(value)
+        self.field.rng = self.rng
+        self.last_seed = value
+
+        if self.field.legacy_sampling:
+            random.seed(value)
+            np.random.seed(value)
 
     @property
     def observation_shape(self):
         """ Get the shape of the state observed at each timestep. """
-        return self.field.size, self.field.size
+        return self.field.shape
+
+    @property
+    def level_tables(self):
+        """
+        Get the static navigation tables of the current level (see `snakeai.gameplay.navigation.LevelTables`):
+        the next cell and wall check for every (cell, direction) pair, and the distances between cells.
+        They are computed on first use and cached on disk in `level_cache_dir`, if specified.
+        """
+        template = self.field.template
+        if template is None:
+            template = get_level_template(self.field.level_map)
+        return get_level_tables(template, self.level_cache_dir)
 
     @property
     def num_actions(self):
         """ Get the number of actions the agent can take. """
         return len(ALL_SNAKE_ACTIONS)
 
+    def snapshot(self, out=None):
+        """
+        Capture the mutable game state, so that it can be restored later (e.g. for lookahead search).
+
+        Only the state that affects future timesteps is captured: the field cells and empty-cell index,
+        the snake, the fruit, the timestep index, the game-over flag and the random generator state.
+        Episode statistics, output files and the observation buffers are not part of the snapshot.
+
+        Args:
+            out: (optional) a previously taken snapshot of this environment to overwrite
+                 instead of allocating a new one.
+
+        Returns:
+            An `EnvironmentSnapshot` instance.
+        """
+        if out is None:
+            out = EnvironmentSnapshot(self.field.shape, len(self.snake._cells))
+
+        field = self.field
+        np.copyto(out.cells, field._cells)
+        out.num_empty_cells = field._num_empty_cells
+        out.empty_cells[:field._num_empty_cells] = field._empty_cells[:field._num_empty_cells]
+        np.copyto(out.empty_cell_positions, field._empty_cell_positions)
+        out.legacy_empty_cells = set(field._legacy_empty_cells) if field.legacy_sampling else None
+
+        snake = self.snake
+        if len(out.snake_cells) != len(snake._cells):
+            out.snake_cells = array.array('i', snake._cells)
+        else:
+            out.snake_cells[:] = snake._cells
+        out.snake_head_position = snake._head_position
+        out.snake_length = snake._length
+        out.snake_direction_idx = snake._direction_idx
+
+        out.fruit = self.fruit
+        out.fruit_cell = self.fruit_cell
+        out.timestep_index = self.timestep_index
+        out.current_action = self.current_action
+        out.is_game_over = self.is_game_over
+        out.rng_state = self.rng.bit_generator.state
+        return out
+
+    def restore(self, snapshot):
+        """
+        Bring the game back to the state captured by `snapshot`.
+
+        Args:
+            snapshot: an `EnvironmentSnapshot` taken from an environment on the same level.
+        """
+        field = self.field
+        if field._cells is None:
+            field.create_level()
+        np.copyto(field._cells, snapshot.cells)
+        field._num_empty_cells = snapshot.num_empty_cells
+        field._empty_cells[:snapshot.num_empty_cells] = snapshot.empty_cells[:snapshot.num_empty_cells]
+        np.copyto(field._empty_cell_positions, snapshot.empty_cell_positions)
+        if field.legacy_sampling:
+            field._legacy_empty_cells = set(snapshot.legacy_empty_cells)
+
+        if self.snake is None:
+            self.snake = Snake(field.find_snake_head(), length=snapshot.snake_length, field_shape=field.shape)
+        snake = self.snake
+        if len(snake._cells) != len(snapshot.snake_cells):
+            snake._cells = array.array('i', snapshot.snake_cells)
+            snake._capacity = len(snake._cells)
+        else:
+            snake._cells[:] = snapshot.snake_cells
+        snake._head_position = snapshot.snake_head_position
+        snake._length = snapshot.snake_length
+        snake._direction_idx = snapshot.snake_direction_idx
+
+        self.fruit = snapshot.fruit
+        self.fruit_cell = snapshot.fruit_cell
+        self.timestep_index = snapshot.timestep_index
+        self.current_action = snapshot.current_action
+        self.is_game_over = snapshot.is_game_over
+        self.rng.bit_generator.state = snapshot.rng_state
+
     def new_episode(self):
         """ Reset the environment and begin a new episode. """
+        if self.level_pack is not None:
+            self.level_index = int(self.rng.integers(len(self.level_pack)))
+            self.field.template = self.level_pack[self.level_index]
         self.field.create_level()
         self.stats.reset()
         self.timestep_index = 0
 
-        self.snake = Snake(self.field.find_snake_head(), length=self.initial_snake_length)
+        self.snake = Snake(self.field.find_snake_head(), length=self.initial_snake_length, field_shape=self.field.shape)
         self.field.place_snake(self.snake)
         self.generate_fruit()
         self.current_action = None
@@ -78,35 +224,84 @@ class Environment(object):
 
     def record_timestep_stats(self, result):
         """ Record environment statistics according to the verbosity level. """
-        timestamp = time.strftime('%Y%m%d-%H%M%S')
 
-        # Write CSV header for the stats file.
-        if self.verbose >= 1 and self.stats_file is None:
-            self.stats_file = open(f'snake-env-{timestamp}.csv', 'w')
-            stats_csv_header_line = self.stats.to_dataframe()[:0].to_csv(index=None)
-            print(stats_csv_header_line, file=self.stats_file, end='', flush=True)
-
-        # Create a blank debug log file.
-        if self.verbose >= 2 and self.debug_file is None:
-            self.debug_file = open(f'snake-env-{timestamp}.log', 'w')
+        # Create the stats file and the trajectory file on the first timestep.
+        if self.verbose >= 1 and self.stats_writer is None:
+            timestamp = time.strftime('%Y%m%d-%H%M%S')
+            self.stats_writer = EpisodeStatisticsWriter(
+                f'snake-env-{timestamp}.{self.stats_format}',
+                EpisodeStatistics.FIELDS
+            )
+            if self.verbose >= 2:
+                self.trajectory_recorder = TrajectoryRecorder(f'snake-env-{timestamp}.trj', self.field.level_map)
 
         self.stats.record_timestep(self.current_action, result)
         self.stats.timesteps_survived = self.timestep_index
 
         if self.verbose >= 2:
-            print(result, file=self.debug_file)
+            if self.timestep_index == 0:
+                self.trajectory_recorder.begin_episode(self, seed=self.last_seed)
+            else:
+                self.trajectory_recorder.record_timestep(self, self.current_action, result.reward)
 
         # Log episode stats if the appropriate verbosity level is set.
         if result.is_episode_end:
             if self.verbose >= 1:
-                stats_csv_line = self.stats.to_dataframe().to_csv(header=False, index=None)
-                print(stats_csv_line, file=self.stats_file, end='', flush=True)
+                self.stats_writer.write(self.stats.flatten())
             if self.verbose >= 2:
-                print(self.stats, file=self.debug_file)
+                self.trajectory_recorder.end_episode()
+
+    def close(self):
+        """ Flush the buffered statistics and close all output files. """
+        if self.stats_writer is not None:
+            self.stats_writer.close()
+            self.stats_writer = None
+        if self.trajectory_recorder is not None:
+            self.trajectory_recorder.close()
+            self.trajectory_recorder = None
+
+    def get_observation(self, out=None):
+        """
+        Observe the state of the environment.
+
+        The ownership of the returned array depends on the observation mode:
+            'copy': the caller owns the array and may keep or modify it.
+            'view': the array is a read-only view of the field and changes in place
+                at every timestep. Copy it if it needs to outlive the current timestep.
+            'ring': the array is read-only and stays unchanged for the next
+                `observation_ring_size - 1` timesteps, after which its buffer is reused.
 
-    def get_observation(self):
-        """ Observe the state of the environment. """
-        return np.copy(self.field._cells)
+        Consumers that copy the frame right away (such as `DeepQNetworkAgent.get_last_frames`
+        and `ExperienceReplay.remember`) are safe to use with any mode.
+
+        Args:
+            out: (optional) a caller-provided uint8 array of the observation shape to write into.
+                 If specified, the observation mode is ignored and `out` is returned.
+
+        Returns:
+            A 2D uint8 array of cell types.
+        """
+        cells = self.field._cells
+
+        if out is not None:
+            np.copyto(out, cells)
+            return out
+
+        if self.observation_mode == 'view':
+            observation = cells.view()
+            observation.flags.writeable = False
+            return observation
+
+        if self.observation_mode == 'ring':
+            if self._observation_ring is None or self._observation_ring.shape[1:] != cells.shape:
+                self._observation_ring = np.empty((self.observation_ring_size, ) + cells.shape, dtype=cells.dtype)
+            observation = self._observation_ring[self._observation_ring_index]
+            self._observation_ring_index = (self._observation_ring_index + 1) % self.observation_ring_size
+            np.copyto(observation, cells)
+            observation.flags.writeable = False
+            return observation
+
+        return np.copy(cells)
 
     def choose_action(self, action):
         """ Choose the action that will be taken at the next timestep. """
@@ -123,11 +318,12 @@ class Environment(object):
         self.timestep_index += 1
         reward = 0
 
-        old_head = self.snake.head
-        old_tail = self.snake.tail
+        # Work with flat cell indices rather than points to keep the timestep cheap.
+        old_head = self.snake.head_cell
+        old_tail = self.snake.tail_cell
 
         # Are we about to eat the fruit?
-        if self.snake.peek_next_move() == self.fruit:
+        if self.snake.peek_next_cell() == self.fruit_cell:
             self.snake.grow()
             self.generate_fruit()
             old_tail = None
@@ -139,7 +335,7 @@ class Environment(object):
             self.snake.move()
             reward += self.rewards['timestep']
 
-        self.field.update_snake_footprint(old_head, old_tail, self.snake.head)
+        self.field.update_snake_footprint_cells(old_head, old_tail, self.snake.head_cell)
 
         # Hit a wall or own body?
         if not self.is_alive():
@@ -148,7 +344,7 @@ class Environment(object):
             if self.has_hit_own_body():
                 self.stats.termination_reason = 'hit_own_body'
 
-            self.field[self.snake.head] = CellType.SNAKE_HEAD
+            self.field.set_cell(self.snake.head_cell, CellType.SNAKE_HEAD)
             self.is_game_over = True
             reward = self.rewards['died']
 
@@ -169,23 +365,66 @@ class Environment(object):
     def generate_fruit(self, position=None):
         """ Generate a new fruit at a random unoccupied cell. """
         if position is None:
-            position = self.field.get_random_empty_cell()
+            try:
+                position = self.field.get_random_empty_cell()
+            except IndexError:
+                # The snake has filled the whole field, so there is no room for a new fruit.
+                self.fruit = None
+                self.fruit_cell = None
+                return
         self.field[position] = CellType.FRUIT
         self.fruit = position
+        x, y = position
+        self.fruit_cell = y * self.field.shape[1] + x
 
     def has_hit_wall(self):
         """ True if the snake has hit a wall, False otherwise. """
-        return self.field[self.snake.head] == CellType.WALL
+        return self.field.get_cell(self.snake.head_cell) == CellType.WALL
 
     def has_hit_own_body(self):
         """ True if the snake has hit its own body, False otherwise. """
-        return self.field[self.snake.head] == CellType.SNAKE_BODY
+        return self.field.get_cell(self.snake.head_cell) == CellType.SNAKE_BODY
 
     def is_alive(self):
         """ True if the snake is still alive, False otherwise. """
         return not self.has_hit_wall() and not self.has_hit_own_body()
 
 
+class EnvironmentSnapshot(object):
+    """ Holds the minimal mutable state of an environment in preallocated buffers (see `Environment.snapshot`). """
+
+    __slots__ = (
+        'cells', 'num_empty_cells', 'empty_cells', 'empty_cell_positions', 'legacy_empty_cells',
+        'snake_cells', 'snake_head_position', 'snake_length', 'snake_direction_idx',
+        'fruit', 'fruit_cell', 'timestep_index', 'current_action', 'is_game_over', 'rng_state',
+    )
+
+    def __init__(self, field_shape, snake_capacity):
+        """
+        Allocate the buffers for a snapshot.
+
+        Args:
+            field_shape: the (height, width) of the field.
+            snake_capacity (int): the capacity of the snake body buffer.
+        """
+        num_cells = field_shape[0] * field_shape[1]
+        self.cells = np.empty(field_shape, dtype=np.uint8)
+        self.num_empty_cells = 0
+        self.empty_cells = np.empty(num_cells, dtype=np.int32)
+        self.empty_cell_positions = np.empty(num_cells, dtype=np.int32)
+        self.legacy_empty_cells = None
+        self.snake_cells = array.array('i', bytes(4 * snake_capacity))
+        self.snake_head_position = 0
+        self.snake_length = 0
+        self.snake_direction_idx = 0
+        self.fruit = None
+        self.fruit_cell = None
+        self.timestep_index = 0
+        self.current_action = None
+        self.is_game_over = False
+        self.rng_state = None
+
+
 class TimestepResult(object):
     """ Represents the information provided to the agent after each timestep. """
 
@@ -205,6 +444,18 @@ class TimestepResult(object):
 class EpisodeStatistics(object):
     """ Represents the summary of the agent's performance during the episode. """
 
+    # Names and NumPy types of the columns produced by `flatten`, for columnar storage.
+    FIELDS = [
+        ('timesteps_survived', 'i8'),
+        ('sum_episode_rewards', 'f8'),
+        ('mean_reward', 'f8'),
+        ('fruits_eaten', 'i8'),
+        ('termination_reason', 'U32'),
+    ] + [
+        (f'action_counter_{action}', 'i8')
+        for action in ALL_SNAKE_ACTIONS
+    ]
+
     def __init__(self):
         self.reset()
 
@@ -242,6 +493,7 @@ class EpisodeStatistics(object):
 
     def to_dataframe(self):
         """ Convert the episode statistics to a Pandas data frame. """
+        import pandas as pd
         return pd.DataFrame([self.flatten()])
 
     def __str__(self):
@@ -0,0 +1,189 @@
+""" Provides a procedural level generator and a compact binary format for storing many levels in one file. """
+
+import collections
+import json
+import os
+import struct
+
+import numpy as np
+
+from .entities import CellType, LevelTemplate, Point
+
+
+# File layout:
+#   file header: magic, number of levels, field height, field width;
+#   level index (INDEX_DTYPE), one record per level;
+#   level grids (uint8 cell types of shape (height, width)), at the offsets listed in the index.
+# All levels in a pack have the same size, so that agents can switch between them freely.
+FILE_MAGIC = b'SNKLVL01'
+FILE_HEADER = struct.Struct('<8sIHH')
+
+# Byte offset of the grid from the start of the file, and the position of the snake's head.
+INDEX_DTYPE = np.dtype([
+    ('offset', '<u8'),
+    ('head_x', '<u2'),
+    ('head_y', '<u2'),
+])
+
+
+def generate_level(height, width, rng, obstacle_density=0.15, snake_length=3):
+    """
+    Generate a random level with obstacles, in which every empty cell can be reached by the snake.
+
+    The snake starts in the middle of the level, heading north, with its body below the head
+    (see `Snake`), so these cells are always kept free.
+
+    Args:
+        height (int): the number of rows, including the outer walls.
+        width (int): the number of columns, including the outer walls.
+        rng: a `numpy.random.Generator` that defines the layout.
+        obstacle_density (float): the probability of an inner cell to become a wall.
+        snake_length (int): the initial length of the snake.
+
+    Returns:
+        A 2D uint8 array of cell types, containing a single snake head cell.
+    """
+    head = Point(width // 2, height // 2)
+    if width < 3 or head.y + snake_length > height - 1:
+        raise ValueError(f'A {width}x{height} level is too small for a snake of length {snake_length}')
+
+    cells = np.full((height, width), CellType.WALL, dtype=np.uint8)
+    inner_cells = cells[1:-1, 1:-1]
+    inner_cells[rng.random(inner_cells.shape) >= obstacle_density] = CellType.EMPTY
+    cells[head.y:head.y + snake_length, head.x] = CellType.EMPTY
+
+    # Wall off the cells the snake cannot get to, so that fruits are never placed there.
+    cells[~get_reachable_mask(cells != CellType.WALL, head)] = CellType.WALL
+    cells[head.y, head.x] = CellType.SNAKE_HEAD
+    return cells
+
+
+def get_reachable_mask(open_mask, start):
+    """
+    Find the cells that can be reached from the start point by moving between adjacent open cells.
+
+    Args:
+        open_mask: a 2D boolean array, True for the cells that can be entered.
+        start: the starting point.
+
+    Returns:
+        A 2D boolean array, True for the reachable cells.
+    """
+    reachable = np.zeros_like(open_mask)
+    reachable[start.y, start.x] = True
+    expanded = reachable.copy()
+
+    # Grow the reachable region one step in every direction until it stops changing.
+    while True:
+        expanded[1:, :] |= reachable[:-1, :]
+        expanded[:-1, :] |= reachable[1:, :]
+        expanded[:, 1:] |= reachable[:, :-1]
+        expanded[:, :-1] |= reachable[:, 1:]
+        expanded &= open_mask
+        if np.array_equal(expanded, reachable):
+            return reachable
+        reachable[:] = expanded
+
+
+def write_level_pack(filename, levels):
+    """
+    Write the levels into a level pack file.
+
+    Args:
+        filename: the output file.
+        levels: a sequence of 2D uint8 arrays of cell types, all of the same shape,
+            each containing a single snake head cell.
+    """
+    height, width = levels[0].shape
+    index = np.zeros(len(levels), dtype=INDEX_DTYPE)
+    index['offset'] = FILE_HEADER.size + index.nbytes + np.arange(len(levels)) * (height * width)
+
+    for i, level in enumerate(levels):
+        if level.shape != (height, width):
+            raise ValueError(f'All levels in a pack must have the same shape: got {level.shape}, expected {(height, width)}')
+        heads = np.argwhere(level == CellType.SNAKE_HEAD)
+        if len(heads) != 1:
+            raise ValueError('Every level must contain exactly one snake head')
+        index['head_y'][i], index['head_x'][i] = heads[0]
+
+    with open(filename, 'wb') as pack_file:
+        pack_file.write(FILE_HEADER.pack(FILE_MAGIC, len(levels), height, width))
+        pack_file.write(index.tobytes())
+        for level in levels:
+            pack_file.write(np.ascontiguousarray(level, dtype=np.uint8).tobytes())
+
+
+class LevelPack(object):
+    """
+    Provides memory-mapped access to the levels stored in a level pack file.
+
+    The compiled templates of the most recently used levels are kept, so that picking the same level again
+    reuses its template along with the navigation tables computed for it.
+    """
+
+    def __init__(self, filename, template_cache_size=1024):
+        """
+        Open a level pack for reading.
+
+        Args:
+            filename: the level pack written by `write_level_pack`.
+            template_cache_size (int): the maximum number of compiled level templates to keep.
+        """
+        self.filename = filename
+        self.template_cache_size = template_cache_size
+        self._templates = collections.OrderedDict()
+        self.data = np.memmap(filename, dtype=np.uint8, mode='r')
+        if len(self.data) < FILE_HEADER.size:
+            raise ValueError('Not a Snake level pack: the header is truncated')
+
+        magic, num_levels, self.height, self.width = FILE_HEADER.unpack_from(self.data, 0)
+        if magic != FILE_MAGIC:
+            raise ValueError('Not a Snake level pack: wrong magic number')
+        self.index = np.ndarray((num_levels, ), dtype=INDEX_DTYPE, buffer=self.data, offset=FILE_HEADER.size)
+
+    @property
+    def shape(self):
+        """ Get the shape of every level in the pack as (height, width). """
+        return self.height, self.width
+
+    def __len__(self):
+        return len(self.index)
+
+    def __getitem__(self, index):
+        """ Get the `LevelTemplate` of the level with the given index, compiling it on first use. """
+        index = range(len(self))[index]
+        template = self._templates.get(index)
+        if template is not None:
+            self._templates.move_to_end(index)
+            return template
+
+        record = self.index[index]
+        template = LevelTemplate(self.get_cells(index), head=Point(int(record['head_x']), int(record['head_y'])))
+        self._templates[index] = template
+        if len(self._templates) > self.template_cache_size:
+            self._templates.popitem(last=False)
+        return template
+
+    def get_cells(self, index):
+        """ Get a read-only view of the cells of the level with the given index. """
+        offset = int(self.index[index]['offset'])
+        return np.ndarray(self.shape, dtype=np.uint8, buffer=self.data, offset=offset)
+
+
+def load_level_config(filename):
+    """
+    Load a level configuration from a JSON file.
+
+    Relative `level_pack` and `level_cache_dir` paths in the config are resolved against the directory
+    of the config file. The navigation tables of the levels are only cached on disk if the config
+    specifies a `level_cache_dir`.
+    """
+    with open(filename) as cfg:
+        config = json.load(cfg)
+
+    config_dir = os.path.dirname(os.path.abspath(filename))
+    if 'level_pack' in config:
+        config['level_pack'] = os.path.join(config_dir, config['level_pack'])
+    if 'level_cache_dir' in config:
+        config['level_cache_dir'] = os.path.join(config_dir, config['level_cache_dir'])
+    return config
@@ -0,0 +1,207 @@
+""" Provides precomputed static navigation tables (moves and distances) for compiled levels. """
+
+import collections
+import hashlib
+import os
+
+import numpy as np
+
+from .entities import ALL_SNAKE_DIRECTIONS
+
+
+# Distance to cells that cannot be reached (walls, or cells cut off by walls).
+UNREACHABLE = np.iinfo(np.uint16).max
+
+# Levels with at most this many cells get a full all-pairs distance table (2 bytes per pair of cells).
+# Larger levels compute the distance maps to individual targets on demand.
+ALL_PAIRS_MAX_CELLS = 1024
+
+# The number of on-demand distance maps kept per level (the most recently used ones).
+DISTANCE_MAP_CACHE_SIZE = 64
+
+
+def get_template_id(template):
+    """ Get a short identifier of the compiled level, for naming cache files. """
+    digest = hashlib.sha1(np.array(template.shape, dtype='<u4').tobytes() + template.cells.tobytes())
+    return digest.hexdigest()[:16]
+
+
+def compute_transitions(wall_mask):
+    """
+    Compute the static move table of a level.
+
+    Args:
+        wall_mask: a 2D boolean array, True for the wall cells.
+
+    Returns:
+        A tuple of two (height * width, 4) arrays, indexed by flat cell index and direction index
+        (in ALL_SNAKE_DIRECTIONS order): the next cell index (-1 if off the grid),
+        and whether the move hits a wall or leaves the grid.
+    """
+    height, width = wall_mask.shape
+    ys, xs = np.divmod(np.arange(height * width), width)
+    transitions = np.empty((height * width, len(ALL_SNAKE_DIRECTIONS)), dtype=np.int32)
+    for direction_idx, direction in enumerate(ALL_SNAKE_DIRECTIONS):
+        next_xs, next_ys = xs + direction.x, ys + direction.y
+        inside = (next_xs >= 0) & (next_xs < width) & (next_ys >= 0) & (next_ys < height)
+        transitions[:, direction_idx] = np.where(inside, next_ys * width + next_xs, -1)
+
+    blocked = (transitions < 0) | wall_mask.ravel()[transitions]
+    return transitions, blocked
+
+
+def compute_distances(transitions, blocked, sources):
+    """
+    Compute the shortest path lengths from the source cells to every cell, going around the walls.
+
+    All sources are expanded together, one step of breadth-first search per iteration.
+
+    Args:
+        transitions: the move table from `compute_transitions`.
+        blocked: the blocked-move table from `compute_transitions`.
+        sources: a 1D array of flat cell indices.
+
+    Returns:
+        A (len(sources), height * width) uint16 array of distances, UNREACHABLE for unreachable cells.
+    """
+    num_cells = len(transitions)
+    open_cells = np.zeros(num_cells, dtype=bool)
+    open_cells[transitions[~blocked]] = True
+
+    # Walls are never passed through, but the search may start from one, which gives the number of moves
+    # needed to hit that wall. An extra always-False column stands for the cells beyond the edge of the grid.
+    neighbors = np.where(transitions < 0, num_cells, transitions)
+    frontier = np.zeros((len(sources), num_cells + 1), dtype=bool)
+    frontier[np.arange(len(sources)), sources] = True
+    reached = frontier[:, :num_cells].copy()
+
+    distances = np.full((len(sources), num_cells), UNREACHABLE, dtype=np.uint16)
+    distances[reached] = 0
+    distance = 0
+    while frontier.any():
+        distance += 1
+        expanded = frontier[:, neighbors[:, 0]]
+        for direction_idx in range(1, neighbors.shape[1]):
+            expanded |= frontier[:, neighbors[:, direction_idx]]
+        expanded &= open_cells
+        expanded &= ~reached
+        reached |= expanded
+        distances[expanded] = distance
+        frontier[:, :num_cells] = expanded
+    return distances
+
+
+class LevelTables(object):
+    """
+    Holds the static navigation tables of a level: the move table and the distances between cells.
+
+    The tables only depend on the walls, so they are computed once per level and never change during
+    an episode. The snake's own body is not taken into account.
+    """
+
+    def __init__(self, shape, transitions, blocked, distances=None):
+        """
+        Create the tables from precomputed arrays (see `LevelTables.compute`).
+
+        Args:
+            shape: the (height, width) of the level.
+            transitions: (height * width, 4) int32 array of next cell indices (-1 if off the grid).
+            blocked: (height * width, 4) boolean array, True if the move hits a wall or leaves the grid.
+            distances: (optional) (height * width, height * width) uint16 array of all-pairs distances.
+        """
+        self.shape = tuple(shape)
+        self.transitions = transitions
+        self.blocked = blocked
+        self.distances = distances
+        self._distance_maps = collections.OrderedDict()
+
+    @classmethod
+    def compute(cls, template):
+        """ Compute the tables of a compiled level. """
+        transitions, blocked = compute_transitions(template.wall_mask)
+        distances = None
+        if len(transitions) <= ALL_PAIRS_MAX_CELLS:
+            distances = compute_distances(transitions, blocked, np.arange(len(transitions)))
+        return cls(template.shape, transitions, blocked, distances)
+
+    @classmethod
+    def load(cls, filename):
+        """ Load the tables from a file written by `save`. """
+        with np.load(filename) as data:
+            distances = data['distances'] if 'distances' in data else None
+            return cls(data['shape'], data['transitions'], data['blocked'], distances)
+
+    def save(self, filename):
+        """ Save the tables to a `.npz` file. """
+        arrays = {'shape': np.array(self.shape), 'transitions': self.transitions, 'blocked': self.blocked}
+        if self.distances is not None:
+            arrays['distances'] = self.distances
+        np.savez(filename, **arrays)
+
+    def distance_map(self, cell):
+        """
+        Get the number of moves from every cell of the level to the given cell (which may also be a wall).
+
+        Args:
+            cell: flat cell index (y * width + x).
+
+        Returns:
+            A read-only 1D uint16 array indexed by flat cell index, UNREACHABLE for unreachable cells.
+        """
+        if self.distances is not None:
+            return self.distances[cell]
+
+        distance_map = self._distance_maps.get(cell)
+        if distance_map is not None:
+            self._distance_maps.move_to_end(cell)
+            return distance_map
+
+        distance_map = compute_distances(self.transitions, self.blocked, np.array([cell]))[0]
+        distance_map.flags.writeable = False
+        self._distance_maps[cell] = distance_map
+        if len(self._distance_maps) > DISTANCE_MAP_CACHE_SIZE:
+            self._distance_maps.popitem(last=False)
+        return distance_map
+
+    def distance(self, from_cell, to_cell):
+        """ Get the length of the shortest path between two cells, UNREACHABLE if there is none. """
+        return int(self.distance_map(to_cell)[from_cell])
+
+
+def get_level_tables(template, cache_dir=None):
+    """
+    Get the navigation tables of a compiled level.
+
+    The tables are computed once per template. If a cache directory is specified,
+    they are also stored there and loaded from there by any later process.
+
+    Args:
+        template: a `LevelTemplate`.
+        cache_dir: (optional) the directory for the table files.
+
+    Returns:
+        A `LevelTables` instance.
+    """
+    if template.tables is not None:
+        return template.tables
+
+    if cache_dir is not None:
+        filename = os.path.join(cache_dir, f'{get_template_id(template)}.npz')
+        if os.path.exists(filename):
+            tables = LevelTables.load(filename)
+        else:
+            tables = LevelTables.compute(template)
+            os.makedirs(cache_dir, exist_ok=True)
+
+            # Write to a temporary file first, so that concurrent processes never read a partial file.
+            temp_filename = f'{filename}.{os.getpid()}.tmp.npz'
+            tables.save(temp_filename)
+            os.replace(temp_filename, filename)
+    else:
+        tables = LevelTables.compute(template)
+
+    for array in (tables.transitions, tables.blocked, tables.distances):
+        if array is not None:
+            array.flags.writeable = False
+    template.tables = tables
+    return tables
@@ -0,0 +1,247 @@
+""" Provides a compact binary format for recording and replaying Snake episodes. """
+
+import collections
+import hashlib
+import numbers
+import os
+import struct
+
+import numpy as np
+
+from .entities import CellType, SnakeAction, ALL_SNAKE_DIRECTIONS
+
+
+# File layout:
+#   file header: magic, field height, field width, keyframe interval, level id.
+#   any number of episodes, each being:
+#     episode header: magic, seed (-1 if unknown), number of steps, number of keyframes;
+#     step records (STEP_DTYPE), one per timestep after the initial one;
+#     keyframe records (see `keyframe_dtype`), one per `keyframe_interval` timesteps, starting at timestep 0.
+FILE_MAGIC = b'SNKTRJ01'
+FILE_HEADER = struct.Struct('<8sHHI16s')
+EPISODE_MAGIC = b'EPIS'
+EPISODE_HEADER = struct.Struct('<4sqII')
+
+# Action taken at the timestep, reward received, and the fruit cell after the timestep (-1 if there is no fruit).
+STEP_DTYPE = np.dtype([
+    ('action', 'i1'),
+    ('reward', '<f4'),
+    ('fruit', '<i4'),
+])
+
+
+def keyframe_dtype(height, width):
+    """ Get the record type of a full state snapshot for a field of the given size. """
+    return np.dtype([
+        ('timestep', '<u4'),
+        ('direction', 'u1'),
+        ('length', '<u4'),
+        ('fruit', '<i4'),
+        ('cells', 'u1', (height, width)),
+        ('body', '<i4', (height * width, )),
+    ])
+
+
+def get_level_id(level_map):
+    """ Get a short identifier of the level map, for matching trajectories with their levels. """
+    return hashlib.sha1('\n'.join(level_map).encode('utf-8')).hexdigest()[:16]
+
+
+class TrajectoryRecorder(object):
+    """
+    Records episodes to an appendable binary trajectory file.
+
+    Only the action, reward and fruit position are stored for each timestep.
+    Full states are stored as keyframes every `keyframe_interval` timesteps,
+    and any other state is reconstructed by re-simulating the steps since the last keyframe.
+    """
+
+    def __init__(self, filename, level_map, keyframe_interval=100):
+        """
+        Create a new trajectory recorder, or append to an existing trajectory file.
+
+        Args:
+            filename: the trajectory file.
+            level_map: the level map of the recorded environment (a list of strings).
+            keyframe_interval (int): the number of timesteps between full state snapshots.
+        """
+        self.height = len(level_map)
+        self.width = len(level_map[0])
+        self.level_id = get_level_id(level_map)
+        self.keyframe_interval = keyframe_interval
+        self.keyframe_dtype = keyframe_dtype(self.height, self.width)
+
+        if os.path.exists(filename) and os.path.getsize(filename) > 0:
+            with open(filename, 'rb') as trajectory_file:
+                header = read_file_header(trajectory_file)
+            if header[:3] != (self.height, self.width, keyframe_interval) or header[3] != self.level_id:
+                raise ValueError(f'Cannot append to "{filename}": it was recorded with a different level or settings')
+            self.file = open(filename, 'ab')
+        else:
+            self.file = open(filename, 'wb')
+            self.file.write(FILE_HEADER.pack(
+                FILE_MAGIC, self.height, self.width, keyframe_interval, self.level_id.encode('ascii')
+            ))
+
+        self.seed = -1
+        self.steps = []
+        self.keyframes = []
+
+    def begin_episode(self, env, seed=None):
+        """ Start recording a new episode from the initial state of the environment. """
+        # Only plain integer seeds fit into the file, other seeds (e.g. spawned SeedSequences) are not stored.
+        self.seed = int(seed) if isinstance(seed, numbers.Integral) else -1
+        self.steps = []
+        self.keyframes = [self._make_keyframe(env)]
+
+    def record_timestep(self, env, action, reward):
+        """ Record the action taken at the last timestep, the reward, and the resulting fruit position. """
+        fruit_cell = -1 if env.fruit_cell is None else env.fruit_cell
+        self.steps.append((SnakeAction.MAINTAIN_DIRECTION if action is None else action, reward, fruit_cell))
+        if env.timestep_index % self.keyframe_interval == 0:
+            self.keyframes.append(self._make_keyframe(env))
+
+    def end_episode(self):
+        """ Append the recorded episode to the file. """
+        steps = np.array(self.steps, dtype=STEP_DTYPE)
+        keyframes = np.array(self.keyframes, dtype=self.keyframe_dtype)
+        self.file.write(EPISODE_HEADER.pack(EPISODE_MAGIC, self.seed, len(steps), len(keyframes)))
+        self.file.write(steps.tobytes())
+        self.file.write(keyframes.tobytes())
+        self.file.flush()
+        self.steps = []
+        self.keyframes = []
+
+    def close(self):
+        """ Close the trajectory file. Unfinished episodes are discarded. """
+        self.file.close()
+
+    def _make_keyframe(self, env):
+        """ Take a full snapshot of the environment state. """
+        body = np.zeros(self.height * self.width, dtype=np.int32)
+        snake_cells = env.snake.cells
+        body[:len(snake_cells)] = snake_cells
+        direction = ALL_SNAKE_DIRECTIONS.index(env.snake.direction)
+        fruit_cell = -1 if env.fruit_cell is None else env.fruit_cell
+        return env.timestep_index, direction, len(snake_cells), fruit_cell, env.field._cells.copy(), body
+
+
+def read_file_header(trajectory_file):
+    """ Read and validate the header of a trajectory file. Returns (height, width, keyframe interval, level id). """
+    header = trajectory_file.read(FILE_HEADER.size)
+    if len(header) < FILE_HEADER.size:
+        raise ValueError('Not a Snake trajectory file: the header is truncated')
+    magic, height, width, keyframe_interval, level_id = FILE_HEADER.unpack(header)
+    if magic != FILE_MAGIC:
+        raise ValueError('Not a Snake trajectory file: wrong magic number')
+    return height, width, keyframe_interval, level_id.decode('ascii')
+
+
+class TrajectoryReader(object):
+    """ Provides memory-mapped access to the episodes stored in a trajectory file. """
+
+    def __init__(self, filename):
+        """
+        Open a trajectory file for reading.
+
+        Args:
+            filename: the trajectory file written by `TrajectoryRecorder`.
+        """
+        with open(filename, 'rb') as trajectory_file:
+            self.height, self.width, self.keyframe_interval, self.level_id = read_file_header(trajectory_file)
+
+        self.keyframe_dtype = keyframe_dtype(self.height, self.width)
+        self.data = np.memmap(filename, dtype=np.uint8, mode='r')
+
+        # Index the episodes. Only the headers are read, the records stay on disk until accessed.
+        self.episodes = []
+        offset = FILE_HEADER.size
+        while offset + EPISODE_HEADER.size <= len(self.data):
+            magic, seed, num_steps, num_keyframes = EPISODE_HEADER.unpack_from(self.data, offset)
+            if magic != EPISODE_MAGIC:
+                raise ValueError(f'Corrupted trajectory file: no episode header at offset {offset}')
+            offset += EPISODE_HEADER.size
+            steps = np.ndarray((num_steps, ), dtype=STEP_DTYPE, buffer=self.data, offset=offset)
+            offset += steps.nbytes
+            keyframes = np.ndarray((num_keyframes, ), dtype=self.keyframe_dtype, buffer=self.data, offset=offset)
+            offset += keyframes.nbytes
+            self.episodes.append(EpisodeTrajectory(seed, steps, keyframes, self.keyframe_interval))
+
+    def __len__(self):
+        return len(self.episodes)
+
+    def __getitem__(self, index):
+        return self.episodes[index]
+
+    def __iter__(self):
+        return iter(self.episodes)
+
+
+class EpisodeTrajectory(object):
+    """ Represents a single recorded episode. States are reconstructed from the nearest keyframe on demand. """
+
+    def __init__(self, seed, steps, keyframes, keyframe_interval):
+        self.seed = seed
+        self.steps = steps
+        self.keyframes = keyframes
+        self.keyframe_interval = keyframe_interval
+
+    def __len__(self):
+        """ Get the number of states in the episode (including the initial one). """
+        return len(self.steps) + 1
+
+    def __iter__(self):
+        """ Iterate over the observed field states, from the initial one to the last one. """
+        state = EpisodeReplayState(self.keyframes[0])
+        yield state.cells.copy()
+        for step in self.steps:
+            state.advance(step)
+            yield state.cells.copy()
+
+    def get_observation(self, timestep):
+        """ Reconstruct the field state observed at the given timestep. """
+        if not 0 <= timestep < len(self):
+            raise IndexError(f'Timestep {timestep} is out of range for an episode of {len(self)} states')
+
+        keyframe_index = min(timestep // self.keyframe_interval, len(self.keyframes) - 1)
+        keyframe = self.keyframes[keyframe_index]
+        state = EpisodeReplayState(keyframe)
+        for step in self.steps[keyframe['timestep']:timestep]:
+            state.advance(step)
+        return state.cells.copy()
+
+
+class EpisodeReplayState(object):
+    """ A minimal re-simulation of the game that applies recorded steps to a keyframe. """
+
+    def __init__(self, keyframe):
+        height, width = keyframe['cells'].shape
+        self.cells = np.array(keyframe['cells'])
+        self.flat_cells = self.cells.reshape(-1)
+        self.body = collections.deque(keyframe['body'][:keyframe['length']].tolist())
+        self.direction = int(keyframe['direction'])
+        self.fruit = int(keyframe['fruit'])
+        self.direction_offsets = [direction.y * width + direction.x for direction in ALL_SNAKE_DIRECTIONS]
+
+    def advance(self, step):
+        """ Apply a single recorded step, following the same rules as `Environment.timestep`. """
+        action = step['action']
+        if action == SnakeAction.TURN_LEFT:
+            self.direction = (self.direction - 1) % len(ALL_SNAKE_DIRECTIONS)
+        elif action == SnakeAction.TURN_RIGHT:
+            self.direction = (self.direction + 1) % len(ALL_SNAKE_DIRECTIONS)
+
+        old_head = self.body[0]
+        new_head = old_head + self.direction_offsets[self.direction]
+        self.body.appendleft(new_head)
+        self.flat_cells[old_head] = CellType.SNAKE_BODY
+
+        if new_head == self.fruit:
+            self.fruit = int(step['fruit'])
+            if self.fruit >= 0:
+                self.flat_cells[self.fruit] = CellType.FRUIT
+        else:
+            self.flat_cells[self.body.pop()] = CellType.EMPTY
+
+        # Whether the snake survives or not, the head is drawn on top of whatever it has hit.
+        self.flat_cells[new_head] = CellType.SNAKE_HEAD
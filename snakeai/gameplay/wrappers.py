@@ -1,10 +1,16 @@
 """ Provides adapters for other AI/RL frameworks, such as OpenAI Gym. """
 
+import ctypes
 import json
+import multiprocessing
+import traceback
+
 import numpy as np
 
+from .batch import BatchEnvironment, TERMINATION_REASONS
 from .entities import ALL_SNAKE_ACTIONS
 from .environment import Environment
+from snakeai.utils.seeding import spawn_seeds
 
 
 class OpenAIGymEnvAdapter(object):
@@ -56,5 +62,260 @@ def make_openai_gym_environment(config_filename):
         env_config = json.load(cfg)
 
     env_raw = Environment(config=env_config, verbose=1)
-    env = OpenAIGymEnvAdapter(env_raw, ALL_SNAKE_ACTIONS, np.zeros((10, 10)))
+    env = OpenAIGymEnvAdapter(env_raw, ALL_SNAKE_ACTIONS, np.zeros(env_raw.observation_shape))
     return env
+
+
+class OpenAIGymVectorEnvAdapter(object):
+    """
+    Converts a batch of Snake games to OpenAI Gym vector environment format.
+
+    Finished games are reset automatically: the observation returned for a finished game is the first
+    observation of its next episode, while the final observation and episode statistics are reported in `info`.
+    """
+
+    def __init__(self, batch_env, action_space):
+        self.batch_env = batch_env
+        self.num_envs = batch_env.num_games
+        self.action_space = OpenAIGymActionSpaceAdapter(action_space)
+        self.single_observation_space = np.zeros(batch_env.observation_shape, dtype=np.uint8)
+        self.observation_space = np.zeros((self.num_envs, ) + batch_env.observation_shape, dtype=np.uint8)
+        self.termination_reasons = np.array(TERMINATION_REASONS, dtype=object)
+
+    def seed(self, value):
+        self.batch_env.seed(value)
+
+    def reset(self):
+        return self.batch_env.reset()
+
+    def step(self, actions):
+        """
+        Take one action in every sub-environment.
+
+        Returns:
+            A tuple of (observations, rewards, dones, info). Every value in `info` is an array over
+            the sub-environments, and only the entries where `dones` is True are meaningful.
+            The observation arrays are owned by the environment and get overwritten by the next step.
+        """
+        observations, rewards, dones = self.batch_env.step(actions)
+        info = {
+            'terminal_observation': self.batch_env.terminal_observations,
+            'episode_timesteps': self.batch_env.final_timesteps,
+            'episode_reward': self.batch_env.final_sum_episode_rewards,
+            'episode_fruits_eaten': self.batch_env.final_fruits_eaten,
+            'episode_termination_reason': self.termination_reasons[self.batch_env.final_termination_reasons],
+        }
+        return observations, rewards, dones, info
+
+
+def make_openai_gym_vector_environment(config_filename, num_envs, seed=None, backend='auto'):
+    """
+    Create an OpenAI Gym vector environment that steps many Snake games at once.
+
+    Args:
+        config_filename: JSON config for the Snake game level.
+        num_envs (int): the number of games to run side by side.
+        seed: (optional) seed for the random generator used for fruit placement.
+        backend (str): the `BatchEnvironment` backend that executes the timesteps.
+
+    Returns:
+        An instance of OpenAI Gym vector environment.
+    """
+
+    with open(config_filename) as cfg:
+        env_config = json.load(cfg)
+
+    batch_env = BatchEnvironment(env_config, num_envs, seed=seed, backend=backend)
+    return OpenAIGymVectorEnvAdapter(batch_env, ALL_SNAKE_ACTIONS)
+
+
+class SubprocVectorEnv(object):
+    """
+    Runs many Snake environments in worker processes that write their results to shared memory.
+
+    Each of the K workers owns a `BatchEnvironment` of M games. The actions, observations, rewards
+    and dones of all K * M environments live in a single shared memory block, so the parent process
+    reads the results without any pickling; the pipes only carry short commands.
+    Finished games are reset automatically, and their final observations are kept in `terminal_observations`.
+    """
+
+    def __init__(self, config, num_workers, envs_per_worker, seed=None, start_method=None):
+        """
+        Create the vector environment and start the workers.
+
+        Args:
+            config (dict): level configuration, typically found in JSON configs.
+            num_workers (int): the number of worker processes (K).
+            envs_per_worker (int): the number of environments stepped by each worker (M).
+            seed: (optional) root seed, from which an independent seed for every worker is derived.
+            start_method (str): (optional) multiprocessing start method ('fork', 'spawn', 'forkserver').
+        """
+        self.num_workers = num_workers
+        self.envs_per_worker = envs_per_worker
+        self.num_envs = num_workers * envs_per_worker
+        self.observation_shape = (len(config['field']), len(config['field'][0]))
+        self.num_actions = len(ALL_SNAKE_ACTIONS)
+
+        context = multiprocessing.get_context(start_method)
+        self._shared_buffer = context.RawArray(ctypes.c_uint8, shared_buffer_size(self.num_envs, self.observation_shape))
+        self.actions, self.observations, self.rewards, self.dones, self.terminal_observations = \
+            map_shared_buffer(self._shared_buffer, self.num_envs, self.observation_shape)
+
+        self._connections = []
+        self._processes = []
+        for worker_index, worker_seed in enumerate(spawn_seeds(seed, num_workers)):
+            parent_connection, worker_connection = context.Pipe()
+            process = context.Process(
+                target=subproc_vector_env_worker,
+                args=(worker_connection, self._shared_buffer, config, self.num_envs,
+                      worker_index * envs_per_worker, envs_per_worker, worker_seed),
+                daemon=True,
+            )
+            process.start()
+            worker_connection.close()
+            self._connections.append(parent_connection)
+            self._processes.append(process)
+
+        self._waiting = False
+        self._closed = False
+
+    def reset(self):
+        """
+        Begin a new episode in every environment.
+
+        Returns:
+            The observations of all environments, shaped (num_envs, height, width).
+            The array lives in shared memory and gets overwritten by the next call.
+        """
+        self._check_not_closed()
+        self._send_to_all('reset')
+        self._wait_for_all()
+        return self.observations
+
+    def step_async(self, actions):
+        """ Tell all workers to take the given actions, without waiting for the results. """
+        self._check_not_closed()
+        if self._waiting:
+            raise RuntimeError('Cannot step the vector environment before the previous step has completed')
+        self.actions[:] = actions
+        self._send_to_all('step')
+        self._waiting = True
+
+    def step_wait(self):
+        """
+        Wait for the step started by `step_async` to complete.
+
+        Returns:
+            A tuple of (observations, rewards, dones) arrays with num_envs as the first dimension.
+            The arrays live in shared memory and get overwritten by the next step.
+        """
+        self._check_not_closed()
+        self._wait_for_all()
+        self._waiting = False
+        return self.observations, self.rewards, self.dones
+
+    def step(self, actions):
+        """ Take one action in every environment and wait for the results (see `step_wait`). """
+        self.step_async(actions)
+        return self.step_wait()
+
+    def close(self):
+        """ Stop the workers. """
+        if self._closed:
+            return
+        for connection in self._connections:
+            try:
+                if self._waiting:
+                    connection.recv()
+                connection.send('close')
+            except (BrokenPipeError, EOFError):
+                # The worker has already exited after an error.
+                pass
+            connection.close()
+        for process in self._processes:
+            process.join()
+        self._waiting = False
+        self._closed = True
+
+    def _check_not_closed(self):
+        if self._closed:
+            raise RuntimeError('Cannot use the vector environment after it has been closed')
+
+    def _send_to_all(self, command):
+        for connection in self._connections:
+            connection.send(command)
+
+    def _wait_for_all(self):
+        # Read the replies of all workers, so that none of them is left pending in a pipe.
+        errors = []
+        for connection in self._connections:
+            status, message = connection.recv()
+            if status != 'ok':
+                errors.append(message)
+
+        if errors:
+            # A failed worker has exited, so the environment cannot be stepped anymore.
+            self._waiting = False
+            self.close()
+            raise RuntimeError(f'Vector environment worker failed:\n{errors[0]}')
+
+
+def shared_buffer_size(num_envs, observation_shape):
+    """ Get the size (in bytes) of the shared memory block used by `SubprocVectorEnv`. """
+    num_cells = int(np.prod(observation_shape))
+    return num_envs * (1 + 8 + 1 + 2 * num_cells)
+
+
+def map_shared_buffer(shared_buffer, num_envs, observation_shape):
+    """
+    Lay out the arrays of `SubprocVectorEnv` over the shared memory block.
+
+    Returns:
+        A tuple of (actions, observations, rewards, dones, terminal observations) arrays.
+    """
+    buffer = np.frombuffer(shared_buffer, dtype=np.uint8)
+    num_cells = int(np.prod(observation_shape))
+    offset = 0
+
+    def take(dtype, shape):
+        nonlocal offset
+        array = np.ndarray(shape, dtype=dtype, buffer=buffer, offset=offset)
+        offset += array.nbytes
+        return array
+
+    # The rewards come first so that they are 8-byte aligned.
+    rewards = take(np.float64, (num_envs, ))
+    actions = take(np.int8, (num_envs, ))
+    dones = take(np.bool_, (num_envs, ))
+    observations = take(np.uint8, (num_envs, ) + tuple(observation_shape))
+    terminal_observations = take(np.uint8, (num_envs, ) + tuple(observation_shape))
+    assert offset == num_envs * (1 + 8 + 1 + 2 * num_cells)
+    return actions, observations, rewards, dones, terminal_observations
+
+
+def subproc_vector_env_worker(connection, shared_buffer, config, num_envs, first_env, envs_per_worker, seed):
+    """ The main loop of a `SubprocVectorEnv` worker process. """
+
+    try:
+        actions, observations, rewards, dones, terminal_observations = \
+            map_shared_buffer(shared_buffer, num_envs, (len(config['field']), len(config['field'][0])))
+        envs = slice(first_env, first_env + envs_per_worker)
+        batch_env = BatchEnvironment(config, envs_per_worker, seed=seed, cells=observations[envs])
+
+        while True:
+            command = connection.recv()
+            if command == 'step':
+                _, rewards[envs], dones[envs] = batch_env.step(actions[envs])
+                finished = np.flatnonzero(dones[envs])
+                terminal_observations[envs][finished] = batch_env.terminal_observations[finished]
+            elif command == 'reset':
+                batch_env.reset()
+                rewards[envs] = 0
+                dones[envs] = False
+            elif command == 'close':
+                break
+            connection.send(('ok', None))
+    except Exception:
+        connection.send(('error', traceback.format_exc()))
+    finally:
+        connection.close()
@@ -31,7 +31,7 @@ class PyGameGUI:
     def load_environment(self, environment):
         """ Load the RL environment into the GUI. """
         self.env = environment
-        screen_size = (self.env.field.size * self.CELL_SIZE, self.env.field.size * self.CELL_SIZE)
+        screen_size = (self.env.field.width * self.CELL_SIZE, self.env.field.height * self.CELL_SIZE)
         self.screen = pygame.display.set_mode(screen_size)
         self.screen.fill(Colors.SCREEN_BACKGROUND)
         pygame.display.set_caption('Snake')
@@ -60,8 +60,8 @@ class PyGameGUI:
 
     def render(self):
         """ Draw the entire game frame. """
-        for x in range(self.env.field.size):
-            for y in range(self.env.field.size):
+        for x in range(self.env.field.width):
+            for y in range(self.env.field.height):
                 self.render_cell(x, y)
 
     def map_key_to_snake_action(self, key):
@@ -0,0 +1,109 @@
+import json
+import os
+
+import numpy as np
+import pytest
+
+from snakeai.agent import DeepQNetworkAgent
+from snakeai.agent.actor_learner import ActorLearnerTrainer, get_actor_exploration_rates
+
+
+class FakeModel(object):
+    """ Mimics the interface of a compiled Keras DQN model, learning a single bias weight per action. """
+
+    def __init__(self, num_last_frames=4, grid_size=10, num_actions=3):
+        self.input_shape = (None, num_last_frames, grid_size, grid_size)
+        self.output_shape = (None, num_actions)
+        self.bias = np.zeros(num_actions, dtype=np.float32)
+        self.num_updates = 0
+
+    def predict(self, states):
+        return np.tile(self.bias, (len(states), 1))
+
+    def train_on_batch(self, inputs, targets, sample_weight=None):
+        self.bias += 0.1 * (targets.mean(axis=0) - self.bias)
+        self.num_updates += 1
+        return 0.0
+
+    def get_weights(self):
+        return [self.bias.copy()]
+
+    def set_weights(self, weights):
+        self.bias[:] = weights[0]
+
+    def save(self, filename):
+        np.save(filename, self.bias)
+
+
+def create_fake_model(env, num_last_frames):
+    return FakeModel(num_last_frames, env.observation_shape[0], env.num_actions)
+
+
+def create_broken_model(env, num_last_frames):
+    raise ValueError('Cannot build the model')
+
+
+def create_model_and_crash(env, num_last_frames):
+    os._exit(3)
+
+
+def load_level_config():
+    level_filename = os.path.join(os.path.dirname(__file__), os.pardir, 'levels', '10x10-blank.json')
+    with open(level_filename) as cfg:
+        return json.load(cfg)
+
+
+def test_actor_exploration_rates_range_from_exploring_to_exploiting():
+    assert get_actor_exploration_rates(1) == [0.4]
+    rates = get_actor_exploration_rates(4)
+    assert rates[0] == pytest.approx(0.4)
+    assert rates[-1] == pytest.approx(0.4 ** 8)
+    assert rates == sorted(rates, reverse=True)
+
+
+def test_actor_learner_trainer_collects_transitions_from_all_actors(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    agent = DeepQNetworkAgent(model=FakeModel(), memory_size=-1)
+    trainer = ActorLearnerTrainer(agent, load_level_config(), create_fake_model, num_actors=2, seed=0,
+                                  slots_per_actor=16)
+
+    episodes = []
+    trainer.train(
+        num_episodes=20, batch_size=8, train_freq=2, learning_starts=10, broadcast_freq=5,
+        episode_callback=lambda episode, stats: episodes.append(stats),
+    )
+
+    assert len(episodes) == 20
+    assert all(len(shard) > 0 for shard in agent.memory.shards)
+    assert len(agent.memory) >= sum(stats.timesteps_survived for stats in episodes)
+    assert agent.model.num_updates > 0
+    assert trainer._weights_version.value == agent.model.num_updates // 5
+    assert os.path.exists('dqn-final.model.npy')
+
+    states, targets, weights, positions, _ = agent.memory.get_batch(agent.model, batch_size=8)
+    assert states.shape == (8, 4, 10, 10)
+    assert weights is None and positions is None
+
+
+def test_actor_learner_trainer_reports_actor_errors(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    agent = DeepQNetworkAgent(model=FakeModel(), memory_size=-1)
+    trainer = ActorLearnerTrainer(agent, load_level_config(), create_broken_model, num_actors=1)
+
+    with pytest.raises(RuntimeError, match='Cannot build the model'):
+        trainer.train(num_episodes=1)
+
+
+def test_actor_learner_trainer_reports_crashed_actors(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    agent = DeepQNetworkAgent(model=FakeModel(), memory_size=-1)
+    trainer = ActorLearnerTrainer(agent, load_level_config(), create_model_and_crash, num_actors=2)
+
+    with pytest.raises(RuntimeError, match='exit code 3'):
+        trainer.train(num_episodes=1)
+
+
+def test_actor_learner_trainer_requires_uniform_in_memory_replay():
+    agent = DeepQNetworkAgent(model=FakeModel(), memory_size=-1, prioritized_replay=True)
+    with pytest.raises(ValueError):
+        ActorLearnerTrainer(agent, load_level_config(), create_fake_model, num_actors=2)
@@ -0,0 +1,131 @@
+import json
+import os
+
+import numpy as np
+import pytest
+
+from snakeai.gameplay.batch import BatchEnvironment, TERMINATION_REASONS
+from snakeai.gameplay.batch_kernels import HAS_NUMBA
+from snakeai.gameplay.entities import CellType, Point, ALL_SNAKE_ACTIONS
+from snakeai.gameplay.environment import Environment
+
+
+def load_config(name):
+    level_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir, 'levels'))
+    with open(os.path.join(level_dir, name) + '.json') as cfg:
+        return json.load(cfg)
+
+
+# Every backend must follow the same rules, so the reference tests run against all of them.
+BACKENDS = [
+    'numpy',
+    'python',
+    pytest.param('numba', marks=pytest.mark.skipif(not HAS_NUMBA, reason='Numba is not installed')),
+]
+
+
+def force_fruit_position(env, expected_observation):
+    """ Make the reference environment put the next fruit where the batch environment has put it. """
+
+    def get_fruit_cell():
+        y, x = np.argwhere(expected_observation == CellType.FRUIT)[0]
+        assert env.field[(x, y)] == CellType.EMPTY
+        return Point(x, y)
+
+    env.field.get_random_empty_cell = get_fruit_cell
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+@pytest.mark.parametrize('level_name', ['10x10-blank', '10x10-obstacles'])
+@pytest.mark.parametrize('max_step_limit', [12, 150])
+def test_batch_env_matches_reference_env_on_random_play(level_name, max_step_limit, backend):
+    config = load_config(level_name)
+    config['max_step_limit'] = max_step_limit
+    num_games = 8
+
+    batch_env = BatchEnvironment(config, num_games=num_games, seed=42, backend=backend)
+    envs = [Environment(config=config, verbose=0) for _ in range(num_games)]
+    observations = batch_env.reset()
+    for env, observation in zip(envs, observations):
+        force_fruit_position(env, observation.copy())
+        assert np.array_equal(env.new_episode().observation, observation)
+
+    rng = np.random.default_rng(7)
+    num_finished_episodes = 0
+    for _ in range(1500):
+        actions = rng.choice(ALL_SNAKE_ACTIONS, size=num_games, p=[0.6, 0.2, 0.2])
+        observations, rewards, dones = batch_env.step(actions)
+
+        for i, env in enumerate(envs):
+            expected_observation = batch_env.terminal_observations[i] if dones[i] else observations[i]
+            force_fruit_position(env, expected_observation.copy())
+            env.choose_action(actions[i])
+            tsr = env.timestep()
+
+            assert np.array_equal(tsr.observation, expected_observation)
+            assert tsr.reward == rewards[i]
+            assert tsr.is_episode_end == dones[i]
+
+            if dones[i]:
+                num_finished_episodes += 1
+                assert env.stats.timesteps_survived == batch_env.final_timesteps[i]
+                assert env.stats.fruits_eaten == batch_env.final_fruits_eaten[i]
+                assert env.stats.sum_episode_rewards == batch_env.final_sum_episode_rewards[i]
+                assert env.stats.termination_reason == TERMINATION_REASONS[batch_env.final_termination_reasons[i]]
+
+                force_fruit_position(env, observations[i].copy())
+                assert np.array_equal(env.new_episode().observation, observations[i])
+
+    assert num_finished_episodes > num_games
+
+
+def test_batch_env_same_seed_produces_same_games():
+    config = load_config('10x10-obstacles')
+    batch_env_a = BatchEnvironment(config, num_games=4, seed=1)
+    batch_env_b = BatchEnvironment(config, num_games=4, seed=1)
+    assert np.array_equal(batch_env_a.reset(), batch_env_b.reset())
+
+    for action in [0, 0, 1, 0, 2, 2, 0, 0, 1]:
+        actions = np.full(4, action)
+        obs_a, rewards_a, dones_a = batch_env_a.step(actions)
+        obs_b, rewards_b, dones_b = batch_env_b.step(actions)
+        assert np.array_equal(obs_a, obs_b)
+        assert np.array_equal(rewards_a, rewards_b)
+        assert np.array_equal(dones_a, dones_b)
+
+
+@pytest.mark.parametrize('backend', BACKENDS[1:])
+def test_batch_env_loop_backends_match_numpy_backend(backend):
+    config = load_config('10x10-obstacles')
+    config['max_step_limit'] = 40
+    num_games = 32
+    numpy_env = BatchEnvironment(config, num_games=num_games, seed=9, backend='numpy')
+    loop_env = BatchEnvironment(config, num_games=num_games, seed=9, backend=backend)
+    assert np.array_equal(numpy_env.reset(), loop_env.reset())
+
+    rng = np.random.default_rng(0)
+    for _ in range(300):
+        actions = rng.choice(ALL_SNAKE_ACTIONS, size=num_games, p=[0.8, 0.1, 0.1])
+        numpy_result = numpy_env.step(actions)
+        loop_result = loop_env.step(actions)
+        for numpy_array, loop_array in zip(numpy_result, loop_result):
+            assert np.array_equal(numpy_array, loop_array)
+
+        dones = numpy_result[2]
+        for attribute in ['terminal_observations', 'final_timesteps', 'final_fruits_eaten',
+                          'final_sum_episode_rewards', 'final_termination_reasons']:
+            assert np.array_equal(getattr(numpy_env, attribute)[dones], getattr(loop_env, attribute)[dones])
+
+
+def test_batch_env_unknown_backend_throws():
+    with pytest.raises(ValueError):
+        BatchEnvironment(load_config('10x10-blank'), num_games=2, backend='cuda')
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+@pytest.mark.parametrize('actions', [[0, -1], [0, 3]])
+def test_batch_env_invalid_actions_throw(backend, actions):
+    env = BatchEnvironment(load_config('10x10-blank'), num_games=2, seed=0, backend=backend)
+    env.reset()
+    with pytest.raises(ValueError):
+        env.step(actions)
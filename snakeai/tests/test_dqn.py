@@ -0,0 +1,133 @@
+import json
+import os
+
+import numpy as np
+
+from snakeai.agent import DeepQNetworkAgent
+from snakeai.agent import dqn
+from snakeai.gameplay.environment import Environment
+
+
+class FakeModel(object):
+    """ Mimics the interface of a compiled Keras DQN model. """
+
+    def __init__(self, num_last_frames=4, grid_size=10, num_actions=3):
+        self.input_shape = (None, num_last_frames, grid_size, grid_size)
+        self.output_shape = (None, num_actions)
+
+    def predict(self, states):
+        return np.zeros((len(states), self.output_shape[-1]))
+
+    def train_on_batch(self, inputs, targets, sample_weight=None):
+        self.batch_sizes = getattr(self, 'batch_sizes', []) + [len(inputs)]
+        return 0.0
+
+    def save(self, filename):
+        with open(filename, 'w') as model_file:
+            json.dump({'input_shape': self.input_shape, 'output_shape': self.output_shape}, model_file)
+
+
+def load_fake_model(filename):
+    with open(filename) as model_file:
+        shapes = json.load(model_file)
+    model = FakeModel()
+    model.input_shape, model.output_shape = tuple(shapes['input_shape']), tuple(shapes['output_shape'])
+    return model
+
+
+def create_training_setup(seed=0):
+    level_filename = os.path.join(os.path.dirname(__file__), os.pardir, 'levels', '10x10-blank.json')
+    with open(level_filename) as cfg:
+        env = Environment(config=json.load(cfg), verbose=0)
+    env.seed(seed)
+    np.random.seed(seed)
+    agent = DeepQNetworkAgent(model=FakeModel(), memory_size=500)
+    agent.memory.rng = np.random.default_rng(seed)
+    return env, agent
+
+
+def test_get_last_frames_with_reused_observation_buffer_keeps_history():
+    agent = DeepQNetworkAgent(model=FakeModel(num_last_frames=3, grid_size=2), num_last_frames=3)
+    agent.begin_episode()
+
+    observation = np.zeros((2, 2), dtype=np.uint8)
+    states = []
+    for value in range(4):
+        observation[:] = value
+        states.append(agent.get_last_frames(observation))
+
+    assert states[0].shape == (1, 3, 2, 2)
+    assert [frame[0, 0] for frame in states[0][0]] == [0, 0, 0]
+    assert [frame[0, 0] for frame in states[2][0]] == [0, 1, 2]
+    assert [frame[0, 0] for frame in states[3][0]] == [1, 2, 3]
+
+
+def test_training_resumed_from_checkpoint_matches_uninterrupted_training(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(dqn, 'load_model', load_fake_model)
+
+    env, agent = create_training_setup()
+    agent.train(env, num_episodes=5, batch_size=4, checkpoint_freq=2)
+    assert sorted(os.listdir(tmp_path)) == ['dqn-00000000.checkpoint', 'dqn-00000002.checkpoint',
+                                            'dqn-00000004.checkpoint', 'dqn-final.model']
+    assert sorted(os.listdir(tmp_path / 'dqn-00000002.checkpoint')) == ['dqn.model', 'replay', 'training.json']
+
+    # Start from a different random state, which the checkpoint must override.
+    resumed_env, resumed_agent = create_training_setup(seed=1)
+    resumed_agent.train(resumed_env, num_episodes=5, batch_size=4, resume_from='dqn-00000002.checkpoint')
+
+    assert len(resumed_agent.memory) == len(agent.memory)
+    for name in resumed_agent.memory.COLUMNS:
+        assert np.array_equal(getattr(resumed_agent.memory, name), getattr(agent.memory, name))
+    assert resumed_agent.memory.rng.bit_generator.state == agent.memory.rng.bit_generator.state
+    assert resumed_env.rng.bit_generator.state == env.rng.bit_generator.state
+    assert resumed_env.stats.flatten() == env.stats.flatten()
+
+
+def test_training_schedule_controls_model_updates(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    env, agent = create_training_setup()
+
+    num_timesteps = []
+    agent.train(
+        env, num_episodes=6, batch_size=8, train_freq=4, gradient_steps=3, learning_starts=10,
+        episode_callback=lambda episode, stats: num_timesteps.append(stats.timesteps_survived),
+    )
+
+    num_updates = len([t for t in range(11, sum(num_timesteps) + 1) if t % 4 == 0])
+    assert agent.model.batch_sizes == [8] * (3 * num_updates)
+
+
+def test_training_stops_when_episode_callback_returns_true(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    env, agent = create_training_setup()
+
+    episodes = []
+    agent.train(
+        env, num_episodes=10, batch_size=4,
+        episode_callback=lambda episode, stats: episodes.append(episode) or episode == 2,
+    )
+    assert episodes == [0, 1, 2]
+
+
+def test_prioritized_training_updates_priorities_after_each_model_update(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    env, _ = create_training_setup()
+    agent = DeepQNetworkAgent(model=FakeModel(), memory_size=500, prioritized_replay=True, prioritized_replay_beta=0.5)
+    assert agent.memory.beta == 0.5
+
+    num_model_updates = []
+    update_priorities = agent.memory.update_priorities
+
+    def record_update_priorities(positions, td_errors):
+        num_model_updates.append(len(agent.model.batch_sizes))
+        update_priorities(positions, td_errors)
+
+    monkeypatch.setattr(agent.memory, 'update_priorities', record_update_priorities)
+    agent.train(env, num_episodes=3, batch_size=4)
+
+    assert len(num_model_updates) > 0
+    assert num_model_updates == list(range(1, len(agent.model.batch_sizes) + 1))
+
+    # The importance-sampling correction is complete in the last episode.
+    assert agent.memory.beta == 1.0
@@ -1,8 +1,11 @@
 import json
 import os
 
+import numpy as np
+
 from snakeai.gameplay.entities import SnakeAction
 from snakeai.gameplay.environment import Environment
+from snakeai.utils.seeding import spawn_seeds
 
 
 def get_env_config_file(name):
@@ -10,10 +13,10 @@ def get_env_config_file(name):
     return os.path.join(level_dir, name) + ".json"
 
 
-def load_env(name):
+def load_env(name, **kwargs):
     with open(get_env_config_file(name)) as cfg:
         env_config = json.load(cfg)
-        return Environment(config=env_config, verbose=0)
+        return Environment(config=env_config, verbose=0, **kwargs)
 
 
 def test_env_on_first_episode_has_consistent_initial_state():
@@ -30,9 +33,8 @@ def test_env_idle_run_reports_correct_timesteps():
     env = load_env('10x10-blank')
 
     # This makes the fruit appear exactly 2 steps away from the snake,
-    # and the next one appear far to the southwest.
-    # TODO: This seems dirty and might not be portable across machines.
-    env.seed(228)
+    # and the next one appear away from the snake's path.
+    env.seed(74)
     tsr = env.new_episode()
     print(tsr)
 
@@ -70,7 +72,7 @@ def test_env_bite_own_tail_reports_game_over():
     env = load_env('10x10-blank')
 
     # Make 2 consecutive fruits appear directly on our path.
-    env.seed(143)
+    env.seed(516)
     tsr = env.new_episode()
     print(tsr)
 
@@ -156,3 +158,138 @@ def test_env_when_new_episode_starts_resets_previous_state():
     assert env.stats.timesteps_survived == 0
     assert env.stats.termination_reason is None
     assert set(env.stats.action_counter.values()) == {0}
+
+
+def test_env_view_observation_mode_returns_read_only_live_view():
+    env = load_env('10x10-blank', observation_mode='view')
+    observation = env.new_episode().observation
+
+    assert observation.dtype == np.uint8
+    assert not observation.flags.writeable
+    assert np.shares_memory(observation, env.field._cells)
+
+
+def test_env_ring_observation_mode_keeps_recent_observations_intact():
+    env = load_env('10x10-blank', observation_mode='ring', observation_ring_size=3)
+    observations = [env.new_episode().observation]
+    snapshots = [observations[0].copy()]
+
+    for _ in range(4):
+        env.choose_action(SnakeAction.MAINTAIN_DIRECTION)
+        observations.append(env.timestep().observation)
+        snapshots.append(observations[-1].copy())
+
+        # The last (ring size - 1) observations must not be overwritten yet.
+        for observation, snapshot in zip(observations[-2:], snapshots[-2:]):
+            assert np.array_equal(observation, snapshot)
+            assert not observation.flags.writeable
+
+
+def test_env_get_observation_with_output_buffer_writes_into_it():
+    env = load_env('10x10-blank')
+    env.new_episode()
+
+    buffer = np.zeros(env.observation_shape, dtype=np.uint8)
+    observation = env.get_observation(out=buffer)
+    assert observation is buffer
+    assert np.array_equal(buffer, env.field._cells)
+
+
+def play_fixed_actions(env, num_steps):
+    """ Play a fixed action sequence and collect the observations. """
+    observations = [env.new_episode().observation]
+    for step in range(num_steps):
+        env.choose_action(SnakeAction.TURN_RIGHT if step % 3 == 0 else SnakeAction.MAINTAIN_DIRECTION)
+        tsr = env.timestep()
+        observations.append(tsr.observation)
+        if tsr.is_episode_end:
+            observations.append(env.new_episode().observation)
+    return observations
+
+
+def test_env_seeded_environments_do_not_interfere():
+    seeds = spawn_seeds(2024, 2)
+    env_a = load_env('10x10-blank')
+    env_b = load_env('10x10-blank')
+    env_a.seed(seeds[0])
+    env_b.seed(seeds[1])
+    interleaved_a = play_fixed_actions(env_a, 100)
+    play_fixed_actions(env_b, 100)
+    interleaved_a += play_fixed_actions(env_a, 100)
+
+    env_solo = load_env('10x10-blank')
+    env_solo.seed(spawn_seeds(2024, 2)[0])
+    solo = play_fixed_actions(env_solo, 100) + play_fixed_actions(env_solo, 100)
+
+    assert len(solo) == len(interleaved_a)
+    assert all(np.array_equal(a, b) for a, b in zip(solo, interleaved_a))
+
+
+def test_env_restore_snapshot_replays_identically():
+    env = load_env('10x10-blank')
+
+    # The fruit appears 2 steps away, so the replay will eat it and generate a new one.
+    env.seed(74)
+    env.new_episode()
+    snapshot = env.snapshot()
+    actions = [0, 0, 2, 0, 0, 2, 2, 0, 1, 0, 0, 0, 0, 0, 0, 0]
+
+    def play_until_end():
+        results = []
+        for action in actions:
+            env.choose_action(action)
+            tsr = env.timestep()
+            results.append((tsr.observation, tsr.reward, tsr.is_episode_end, env.fruit, env.snake.body))
+            if tsr.is_episode_end:
+                break
+        return results
+
+    expected = play_until_end()
+    assert expected[1][1] > 0
+    for _ in range(3):
+        env.restore(snapshot)
+        actual = play_until_end()
+        assert len(actual) == len(expected)
+        for (obs_a, *rest_a), (obs_e, *rest_e) in zip(actual, expected):
+            assert np.array_equal(obs_a, obs_e)
+            assert rest_a == rest_e
+
+
+def test_env_snapshot_into_existing_buffer_reuses_it():
+    env = load_env('10x10-blank')
+    env.new_episode()
+    snapshot = env.snapshot()
+    cells_buffer = snapshot.cells
+
+    env.choose_action(SnakeAction.TURN_LEFT)
+    env.timestep()
+    assert env.snapshot(out=snapshot) is snapshot
+    assert snapshot.cells is cells_buffer
+    assert np.array_equal(snapshot.cells, env.field._cells)
+    assert snapshot.timestep_index == 1
+
+
+def test_env_rectangular_level_runs_until_wall():
+    env = Environment(config={
+        'field': [
+            '################',
+            '#..............#',
+            '#....S.........#',
+            '#..............#',
+            '################',
+        ],
+        'initial_snake_length': 3,
+        'rewards': {'timestep': 0, 'ate_fruit': 1, 'died': -1},
+    }, verbose=0)
+    assert env.observation_shape == (5, 16)
+
+    tsr = env.new_episode()
+    assert tsr.observation.shape == (5, 16)
+    env.choose_action(SnakeAction.TURN_RIGHT)
+    timesteps = 0
+    while not tsr.is_episode_end:
+        tsr = env.timestep()
+        timesteps += 1
+
+    assert env.stats.termination_reason == 'hit_wall'
+    assert timesteps == 10
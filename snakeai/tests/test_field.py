@@ -1,5 +1,7 @@
+import random
+
 import pytest
-from snakeai.gameplay.entities import Field, Snake
+from snakeai.gameplay.entities import CellType, Field, Snake, get_level_template
 
 
 small_level_map = [
@@ -89,3 +91,82 @@ def test_get_random_empty_cell_no_cells_left_throws():
     field.create_level()
     with pytest.raises(IndexError):
         field.get_random_empty_cell()
+
+
+def test_get_random_empty_cell_after_many_updates_tracks_empty_cells():
+    field = Field(small_level_map)
+    field.create_level()
+
+    random.seed(1)
+    for _ in range(200):
+        point = (random.randint(1, 5), random.randint(1, 5))
+        field[point] = random.choice([CellType.EMPTY, CellType.EMPTY, CellType.SNAKE_BODY, CellType.FRUIT])
+
+    expected_empty_cells = {
+        (x, y)
+        for y in range(field.size)
+        for x in range(field.size)
+        if field[(x, y)] == CellType.EMPTY
+    }
+    sampled_cells = {field.get_random_empty_cell() for _ in range(2000)}
+    assert sampled_cells == expected_empty_cells
+
+
+def test_get_random_empty_cell_legacy_sampling_returns_empty_cell():
+    field = Field(small_level_map, legacy_sampling=True)
+    field.create_level()
+    field[(1, 1)] = CellType.WALL
+
+    for _ in range(100):
+        point = field.get_random_empty_cell()
+        assert field[point] == CellType.EMPTY
+
+
+def test_create_level_same_map_shares_compiled_template():
+    field_a = Field(list(small_level_map))
+    field_b = Field(list(small_level_map))
+    field_a.create_level()
+    field_b.create_level()
+
+    assert field_a.template is field_b.template
+    assert field_a.template is get_level_template(small_level_map)
+    assert not field_a.template.cells.flags.writeable
+    assert field_a.template.head == (3, 3)
+
+
+def test_create_level_after_changes_restores_initial_state():
+    field = Field(small_level_map)
+    field.create_level()
+    cells_buffer = field._cells
+
+    snake = Snake(field.find_snake_head(), length=3)
+    field.place_snake(snake)
+    field[(1, 1)] = CellType.FRUIT
+    field.create_level()
+
+    assert field._cells is cells_buffer
+    assert str(field).split('\n') == small_level_map
+    assert field.get_random_empty_cell() != (3, 3)
+    assert field._num_empty_cells == 24
+
+
+def test_field_rectangular_map_reports_width_and_height():
+    field = Field([
+        '##########',
+        '#...S....#',
+        '#........#',
+        '##########',
+    ])
+    field.create_level()
+    assert field.shape == (4, 10)
+    assert (field.width, field.height) == (10, 4)
+    assert field.find_snake_head() == (4, 1)
+    assert field[9, 3] == CellType.WALL
+    with pytest.raises(ValueError):
+        field.size
+
+
+def test_create_level_rows_of_different_width_throws():
+    field = Field(['#####', '#.S.#', '####'])
+    with pytest.raises(ValueError):
+        field.create_level()
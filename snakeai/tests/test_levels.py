@@ -0,0 +1,107 @@
+import json
+
+import numpy as np
+import pytest
+
+from snakeai.gameplay.entities import CellType, Point
+from snakeai.gameplay.environment import Environment
+from snakeai.gameplay.levels import (
+    LevelPack, generate_level, get_reachable_mask, load_level_config, write_level_pack
+)
+
+
+def test_generate_level_all_empty_cells_are_reachable():
+    rng = np.random.default_rng(0)
+    for _ in range(50):
+        cells = generate_level(12, 15, rng, obstacle_density=0.35)
+        assert cells.shape == (12, 15)
+        assert np.count_nonzero(cells == CellType.SNAKE_HEAD) == 1
+        assert np.all(cells[[0, -1], :] == CellType.WALL) and np.all(cells[:, [0, -1]] == CellType.WALL)
+
+        head = Point(15 // 2, 12 // 2)
+        assert np.all(cells[head.y + 1:head.y + 3, head.x] == CellType.EMPTY)
+        reachable = get_reachable_mask(cells != CellType.WALL, head)
+        assert np.array_equal(reachable, cells != CellType.WALL)
+
+
+def test_generate_level_same_seed_produces_same_level():
+    level_a = generate_level(10, 10, np.random.default_rng(3))
+    level_b = generate_level(10, 10, np.random.default_rng(3))
+    assert np.array_equal(level_a, level_b)
+
+
+def test_level_pack_roundtrip_preserves_levels(tmp_path):
+    rng = np.random.default_rng(1)
+    levels = [generate_level(8, 11, rng) for _ in range(20)]
+    filename = str(tmp_path / 'levels.pack')
+    write_level_pack(filename, levels)
+
+    pack = LevelPack(filename)
+    assert len(pack) == 20
+    assert pack.shape == (8, 11)
+    for i in [0, 7, 19]:
+        assert np.array_equal(pack.get_cells(i), levels[i])
+        template = pack[i]
+        assert np.array_equal(template.cells, levels[i])
+        assert template.head == Point(5, 4)
+
+
+def test_level_pack_reuses_recently_used_templates(tmp_path):
+    rng = np.random.default_rng(1)
+    filename = str(tmp_path / 'levels.pack')
+    write_level_pack(filename, [generate_level(8, 11, rng) for _ in range(5)])
+
+    pack = LevelPack(filename, template_cache_size=2)
+    template = pack[0]
+    assert pack[0] is template
+    assert pack[-5] is template
+
+    # Level 1 is the least recently used one when level 2 is compiled.
+    pack[1]
+    pack[0]
+    pack[2]
+    assert pack[0] is template
+    assert list(pack._templates) == [2, 0]
+
+
+def test_level_pack_not_a_pack_throws(tmp_path):
+    filename = tmp_path / 'bogus.pack'
+    filename.write_bytes(b'not a level pack at all')
+    with pytest.raises(ValueError):
+        LevelPack(str(filename))
+
+
+def test_env_with_level_pack_plays_on_random_levels(tmp_path):
+    rng = np.random.default_rng(2)
+    levels = [generate_level(10, 10, rng, obstacle_density=0.25) for _ in range(30)]
+    write_level_pack(str(tmp_path / 'random.pack'), levels)
+    with open(tmp_path / 'random.json', 'w') as cfg:
+        json.dump({
+            'level_pack': 'random.pack',
+            'initial_snake_length': 3,
+            'rewards': {'timestep': 0, 'ate_fruit': 1, 'died': -1},
+        }, cfg)
+
+    env = Environment(config=load_level_config(str(tmp_path / 'random.json')), verbose=0)
+    env.seed(5)
+    assert env.observation_shape == (10, 10)
+
+    level_indices = set()
+    for _ in range(10):
+        tsr = env.new_episode()
+        level_indices.add(env.level_index)
+        walls = tsr.observation == CellType.WALL
+        assert np.array_equal(walls, levels[env.level_index] == CellType.WALL)
+        while not tsr.is_episode_end:
+            tsr = env.timestep()
+    assert len(level_indices) > 1
+
+
+def test_load_level_config_caches_tables_on_disk_only_when_asked(tmp_path):
+    with open(tmp_path / 'plain.json', 'w') as cfg:
+        json.dump({'field': ['###', '#S#', '###']}, cfg)
+    with open(tmp_path / 'cached.json', 'w') as cfg:
+        json.dump({'field': ['###', '#S#', '###'], 'level_cache_dir': 'tables'}, cfg)
+
+    assert 'level_cache_dir' not in load_level_config(str(tmp_path / 'plain.json'))
+    assert load_level_config(str(tmp_path / 'cached.json'))['level_cache_dir'] == str(tmp_path / 'tables')
@@ -0,0 +1,268 @@
+import numpy as np
+import pytest
+
+from snakeai.agent import DeepQNetworkAgent
+from snakeai.utils.memory import DiskExperienceReplay, ExperienceReplay, PrioritizedExperienceReplay, SumTree
+
+
+class FirstPixelModel(object):
+    """ Predicts the sum of the first pixel of the oldest frame and the action index as the Q value. """
+
+    def __init__(self, num_last_frames=3, grid_size=2, num_actions=3):
+        self.input_shape = (None, num_last_frames, grid_size, grid_size)
+        self.output_shape = (None, num_actions)
+
+    def predict(self, states):
+        return states[:, 0, 0, 0, None].astype(np.float32) + np.arange(3, dtype=np.float32)
+
+
+def play_transitions(memory, episode_lengths, num_last_frames=3, grid_size=2):
+    """ Remember the transitions of a few episodes the way the DQN agent does, returning all of them. """
+    agent = DeepQNetworkAgent(model=FirstPixelModel(num_last_frames, grid_size), num_last_frames=num_last_frames)
+    transitions = []
+    frame_value = 0
+    for episode_length in episode_lengths:
+        agent.begin_episode()
+        state = agent.get_last_frames(np.full((grid_size, grid_size), frame_value % 251, dtype=np.uint8))
+        for timestep in range(episode_length):
+            frame_value += 1
+            state_next = agent.get_last_frames(np.full((grid_size, grid_size), frame_value % 251, dtype=np.uint8))
+            transition = (state[0], frame_value % 3, float(frame_value), state_next[0], timestep == episode_length - 1)
+            memory.remember(state, *transition[1:])
+            transitions.append(transition)
+            state = state_next
+        frame_value += 1
+    return transitions
+
+
+def assert_experience_matches(memory, transitions):
+    first, last = memory.get_valid_positions()
+    states, actions, rewards, states_next, episode_ends = memory.get_experience(np.arange(first, last))
+
+    expected = transitions[len(transitions) - len(memory):][first:last]
+    assert len(states) == len(expected)
+    for i, (state, action, reward, state_next, is_episode_end) in enumerate(expected):
+        assert np.array_equal(states[i], state)
+        assert actions[i] == action
+        assert rewards[i] == reward
+        assert episode_ends[i] == is_episode_end
+        if not is_episode_end:
+            assert np.array_equal(states_next[i], state_next)
+
+
+@pytest.mark.parametrize('memory_size', [-1, 1000])
+def test_experience_replay_rebuilds_frame_stacks(memory_size):
+    memory = ExperienceReplay((3, 2, 2), num_actions=3, memory_size=memory_size)
+    transitions = play_transitions(memory, [1, 2, 5, 3])
+
+    assert len(memory) == 11
+    assert memory.get_valid_positions() == (0, 11)
+    assert_experience_matches(memory, transitions)
+
+
+def test_experience_replay_stores_each_frame_once():
+    memory = ExperienceReplay((3, 2, 2), num_actions=3, memory_size=20)
+    play_transitions(memory, [4, 6])
+
+    assert memory.frames.shape == (20, 2, 2)
+    assert memory.frames.dtype == np.uint8
+    assert list(memory.frames[:10, 0, 0]) == [0, 1, 2, 3, 5, 6, 7, 8, 9, 10]
+
+
+def test_experience_replay_overwrites_oldest_items_when_full():
+    memory = ExperienceReplay((3, 2, 2), num_actions=3, memory_size=8)
+    transitions = play_transitions(memory, [5, 4, 6])
+
+    assert len(memory) == 8
+    assert memory.capacity == 8
+    assert memory.get_valid_positions() == (2, 8)
+    assert_experience_matches(memory, transitions)
+
+
+def test_experience_replay_skips_newest_transition_until_next_state_is_known():
+    memory = ExperienceReplay((3, 2, 2), num_actions=3, memory_size=8)
+    assert memory.get_batch(FirstPixelModel(), batch_size=4) is None
+
+    play_transitions(memory, [1])
+    memory.remember(np.zeros((1, 3, 2, 2)), 0, 0.0, np.zeros((1, 3, 2, 2)), False)
+    assert memory.get_valid_positions() == (0, 1)
+
+
+def test_unlimited_experience_replay_grows_and_keeps_items():
+    memory = ExperienceReplay((3, 2, 2), num_actions=3, memory_size=-1)
+    transitions = play_transitions(memory, [100] * 11, grid_size=2)
+
+    assert len(memory) == 1100
+    assert memory.capacity == 2 * ExperienceReplay.INITIAL_UNLIMITED_CAPACITY
+    assert_experience_matches(memory, transitions)
+
+
+def test_experience_replay_batch_targets():
+    memory = ExperienceReplay((3, 2, 2), num_actions=3, memory_size=10, rng=np.random.default_rng(0))
+    transitions = play_transitions(memory, [2, 1])
+    states, targets, weights, positions, _ = memory.get_batch(FirstPixelModel(), batch_size=16, discount_factor=0.5)
+
+    assert len(states) == len(positions) == 16
+    assert weights is None
+    for state, target in zip(states, targets):
+        _, action, reward, state_next, is_episode_end = next(
+            transition for transition in transitions if np.array_equal(transition[0], state)
+        )
+        q_next = 0 if is_episode_end else state_next[0, 0, 0] + 2
+        expected = np.arange(3) + state[0, 0, 0]
+        expected[action] = reward + 0.5 * q_next
+        assert np.allclose(target, expected)
+
+
+def test_sum_tree_updates_and_finds_items():
+    tree = SumTree(5)
+    tree.update([0, 1, 2, 3, 4], [1.0, 0.0, 2.0, 3.0, 4.0])
+    assert tree.total == 10
+
+    # Duplicate indices keep the last priority.
+    tree.update([4, 4], [5.0, 0.5])
+    assert tree.total == 6.5
+    assert list(tree.find([0.0, 0.99, 1.0, 2.99, 3.0, 5.99, 6.0, 6.4999])) == [0, 0, 2, 2, 3, 3, 4, 4]
+
+
+def test_sum_tree_never_finds_zero_priority_items():
+    tree = SumTree(4)
+    tree.update([1, 2], [0.1, 0.2])
+    assert set(tree.find(np.linspace(0, tree.total, 100))) == {1, 2}
+
+
+@pytest.mark.parametrize('memory_size', [-1, 8])
+def test_prioritized_experience_replay_samples_only_valid_transitions(memory_size):
+    memory = PrioritizedExperienceReplay((3, 2, 2), num_actions=3, memory_size=memory_size, rng=np.random.default_rng(0))
+    play_transitions(memory, [5, 4, 6])
+    memory.remember(np.zeros((1, 3, 2, 2)), 0, 0.0, np.zeros((1, 3, 2, 2)), False)
+
+    first, last = memory.get_valid_positions()
+    positions, weights = memory.sample_prioritized(1000)
+    assert set(positions) == set(range(first, last))
+    assert np.allclose(weights, 1)
+
+
+def test_prioritized_experience_replay_prefers_large_td_errors():
+    memory = PrioritizedExperienceReplay((3, 2, 2), num_actions=3, memory_size=20, rng=np.random.default_rng(0))
+    play_transitions(memory, [10])
+    td_errors = np.full(10, 0.01)
+    td_errors[3] = 10.0
+    memory.update_priorities(np.arange(10), td_errors)
+
+    positions, weights = memory.sample_prioritized(1000)
+    assert np.mean(positions == 3) > 0.5
+    assert weights.max() == 1
+    assert np.all(weights[positions == 3] < weights[positions != 3].min())
+
+
+def test_prioritized_experience_replay_anneals_beta_to_full_correction():
+    memory = PrioritizedExperienceReplay((3, 2, 2), num_actions=3, memory_size=20, beta=0.4)
+    for progress, beta in [(0.0, 0.4), (0.5, 0.7), (1.0, 1.0), (1.5, 1.0)]:
+        memory.anneal_beta(progress)
+        assert np.isclose(memory.beta, beta)
+
+
+def test_prioritized_experience_replay_updates_batch_priorities_after_learning():
+    memory = PrioritizedExperienceReplay((3, 2, 2), num_actions=3, memory_size=20, rng=np.random.default_rng(0))
+    play_transitions(memory, [3, 4])
+    assert np.all(memory.tree.priorities[:7] == 1)
+
+    model = FirstPixelModel()
+    model.num_predictions = 0
+    predict = model.predict
+
+    def count_predictions(states):
+        model.num_predictions += 1
+        return predict(states)
+
+    model.predict = count_predictions
+    states, targets, weights, positions, td_errors = memory.get_batch(model, batch_size=4)
+    assert len(states) == len(targets) == len(weights) == len(positions) == len(td_errors) == 4
+    assert weights.dtype == np.float32
+    assert np.all(memory.tree.priorities[:7] == 1)
+
+    # The priorities are updated from the TD errors of the batch, without predicting them again.
+    memory.update_priorities(positions, td_errors)
+    expected = (np.abs(td_errors) + memory.epsilon) ** memory.alpha
+    assert np.allclose(memory.tree.priorities[positions], expected)
+    assert np.isclose(memory.tree.total, memory.tree.priorities.sum())
+    assert model.num_predictions == 1
+
+
+def test_disk_experience_replay_spills_segments_and_rebuilds_frame_stacks(tmp_path):
+    memory = DiskExperienceReplay((3, 2, 2), num_actions=3, directory=str(tmp_path), ram_budget=7 * 10)
+    assert memory.segment_size == 7
+
+    transitions = play_transitions(memory, [1, 2, 5, 3, 9, 4])
+    assert len(memory) == 24
+    assert len(memory.segments) == 3
+    assert len(list(tmp_path.iterdir())) == 3
+    assert memory.get_valid_positions() == (0, 24)
+    assert_experience_matches(memory, transitions)
+
+    memory.remember(np.zeros((1, 3, 2, 2)), 0, 0.0, np.zeros((1, 3, 2, 2)), False)
+    assert memory.get_valid_positions() == (0, 24)
+
+    memory.reset()
+    assert len(memory) == 0
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_disk_experience_replay_matches_in_memory_replay(tmp_path):
+    memory = ExperienceReplay((3, 2, 2), num_actions=3, memory_size=-1, rng=np.random.default_rng(0))
+    disk_memory = DiskExperienceReplay((3, 2, 2), 3, str(tmp_path), ram_budget=100, rng=np.random.default_rng(0))
+    play_transitions(memory, [7, 30, 2, 11])
+    play_transitions(disk_memory, [7, 30, 2, 11])
+
+    batch = memory.get_batch(FirstPixelModel(), batch_size=32)
+    disk_batch = disk_memory.get_batch(FirstPixelModel(), batch_size=32)
+    assert np.array_equal(batch[0], disk_batch[0])
+    assert np.array_equal(batch[1], disk_batch[1])
+
+
+def test_disk_experience_replay_close_deletes_segment_files(tmp_path):
+    memory = DiskExperienceReplay((3, 2, 2), num_actions=3, directory=str(tmp_path), ram_budget=7 * 10)
+    play_transitions(memory, [10, 10])
+    assert len(list(tmp_path.iterdir())) == 2
+
+    memory.close()
+    assert list(tmp_path.iterdir()) == []
+    assert len(memory) == 0
+    memory.close()
+
+
+def test_disk_experience_replay_too_small_ram_budget_throws(tmp_path):
+    with pytest.raises(ValueError):
+        DiskExperienceReplay((3, 2, 2), num_actions=3, directory=str(tmp_path), ram_budget=7)
+
+
+@pytest.mark.parametrize('memory_class', [ExperienceReplay, PrioritizedExperienceReplay, DiskExperienceReplay])
+def test_experience_replay_save_load_roundtrip(memory_class, tmp_path):
+    def create_memory(name):
+        if memory_class is DiskExperienceReplay:
+            return DiskExperienceReplay((3, 2, 2), 3, str(tmp_path / name), ram_budget=70, rng=np.random.default_rng(0))
+        return memory_class((3, 2, 2), num_actions=3, memory_size=16, rng=np.random.default_rng(0))
+
+    memory = create_memory('memory')
+    transitions = play_transitions(memory, [5, 4, 6, 9])
+    memory.get_batch(FirstPixelModel(), batch_size=4)
+    memory.save(str(tmp_path / 'saved'))
+
+    loaded_memory = create_memory('loaded')
+    loaded_memory.load(str(tmp_path / 'saved'))
+    assert len(loaded_memory) == len(memory)
+    assert_experience_matches(loaded_memory, transitions)
+
+    batch = memory.get_batch(FirstPixelModel(), batch_size=8)
+    loaded_batch = loaded_memory.get_batch(FirstPixelModel(), batch_size=8)
+    for array, loaded_array in zip(batch, loaded_batch):
+        assert np.array_equal(array, loaded_array)
+
+    # The loaded memory owns its buffers and keeps working after the saved files are gone.
+    if memory_class is not DiskExperienceReplay:
+        assert not any(isinstance(getattr(loaded_memory, name), np.memmap) for name in memory_class.COLUMNS)
+    for filename in sorted((tmp_path / 'saved').rglob('*.npy')):
+        filename.unlink()
+    play_transitions(loaded_memory, [20])
+    assert len(loaded_memory) == len(memory) + (20 if memory_class is DiskExperienceReplay else 0)
@@ -0,0 +1,119 @@
+import collections
+import json
+import os
+
+import numpy as np
+
+from snakeai.gameplay import navigation
+from snakeai.gameplay.entities import CellType, LevelTemplate, ALL_SNAKE_DIRECTIONS
+from snakeai.gameplay.environment import Environment
+from snakeai.gameplay.levels import generate_level
+from snakeai.gameplay.navigation import UNREACHABLE, LevelTables, get_level_tables
+
+
+small_level_map = [
+    '#######',
+    '#...#.#',
+    '#.#.#.#',
+    '#.#S#.#',
+    '#.....#',
+    '###.###',
+]
+
+
+def bfs_distances(cells, target):
+    """ Reference breadth-first search over the non-wall cells. """
+    height, width = cells.shape
+    distances = np.full(cells.size, UNREACHABLE, dtype=np.uint16)
+    distances[target] = 0
+    queue = collections.deque([target])
+    while queue:
+        cell = queue.popleft()
+        y, x = divmod(cell, width)
+        for direction in ALL_SNAKE_DIRECTIONS:
+            next_x, next_y = x + direction.x, y + direction.y
+            if 0 <= next_x < width and 0 <= next_y < height:
+                next_cell = next_y * width + next_x
+                if cells[next_y, next_x] != CellType.WALL and distances[next_cell] == UNREACHABLE:
+                    distances[next_cell] = distances[cell] + 1
+                    queue.append(next_cell)
+    return distances
+
+
+def test_level_tables_transitions_match_moves():
+    template = LevelTemplate.from_level_map(small_level_map)
+    tables = LevelTables.compute(template)
+    width = 7
+
+    head = 3 * width + 3
+    assert list(tables.transitions[head]) == [head - width, head + 1, head + width, head - 1]
+    assert list(tables.blocked[head]) == [False, True, False, True]
+
+    # Moving south from the bottom opening leaves the grid.
+    exit_cell = 5 * width + 3
+    assert tables.transitions[exit_cell][2] == -1
+    assert tables.blocked[exit_cell][2]
+
+
+def test_level_tables_distances_match_bfs():
+    rng = np.random.default_rng(4)
+    for cells in [LevelTemplate.from_level_map(small_level_map).cells] + [generate_level(9, 12, rng) for _ in range(5)]:
+        template = LevelTemplate(cells)
+        tables = LevelTables.compute(template)
+        for target in np.flatnonzero(cells.ravel() != CellType.WALL):
+            assert np.array_equal(tables.distance_map(target), bfs_distances(cells, target))
+
+
+def test_level_tables_large_level_computes_distance_maps_on_demand(monkeypatch):
+    monkeypatch.setattr(navigation, 'ALL_PAIRS_MAX_CELLS', 16)
+    template = LevelTemplate.from_level_map(small_level_map)
+    tables = LevelTables.compute(template)
+    assert tables.distances is None
+
+    target = 4 * 7 + 5
+    assert np.array_equal(tables.distance_map(target), bfs_distances(template.cells, target))
+    assert tables.distance_map(target) is tables.distance_map(target)
+    assert tables.distance(3 * 7 + 3, target) == 3
+
+
+def test_level_tables_keep_only_recently_used_distance_maps(monkeypatch):
+    monkeypatch.setattr(navigation, 'ALL_PAIRS_MAX_CELLS', 16)
+    monkeypatch.setattr(navigation, 'DISTANCE_MAP_CACHE_SIZE', 2)
+    template = LevelTemplate.from_level_map(small_level_map)
+    tables = LevelTables.compute(template)
+
+    first_map = tables.distance_map(8)
+    tables.distance_map(9)
+    tables.distance_map(8)
+    tables.distance_map(10)
+    assert list(tables._distance_maps) == [8, 10]
+    assert tables.distance_map(8) is first_map
+
+
+def test_get_level_tables_caches_on_disk(tmp_path):
+    cells = generate_level(10, 10, np.random.default_rng(0))
+    tables = get_level_tables(LevelTemplate(cells), cache_dir=str(tmp_path))
+    assert len(os.listdir(tmp_path)) == 1
+
+    # A fresh template of the same level loads the tables from the file.
+    loaded_tables = get_level_tables(LevelTemplate(cells), cache_dir=str(tmp_path))
+    assert loaded_tables is not tables
+    assert np.array_equal(loaded_tables.transitions, tables.transitions)
+    assert np.array_equal(loaded_tables.blocked, tables.blocked)
+    assert np.array_equal(loaded_tables.distances, tables.distances)
+
+
+def test_env_level_tables_are_shared_by_environments():
+    level_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir, 'levels'))
+    with open(os.path.join(level_dir, '10x10-obstacles.json')) as cfg:
+        env_config = json.load(cfg)
+
+    env_a = Environment(config=env_config, verbose=0)
+    env_b = Environment(config=env_config, verbose=0)
+    tables = env_a.level_tables
+    assert env_b.level_tables is tables
+
+    env_a.new_episode()
+    head = env_a.snake.head_cell
+    assert tables.distance(head, env_a.fruit_cell) < UNREACHABLE
+    assert not tables.blocked[head][ALL_SNAKE_DIRECTIONS.index(env_a.snake.direction)]
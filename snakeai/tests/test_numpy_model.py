@@ -0,0 +1,183 @@
+import os
+
+import numpy as np
+import pytest
+
+from snakeai.agent import DeepQNetworkAgent
+from snakeai.agent.numpy_model import NumpyDQNModel, conv2d_channels_first, export_keras_model
+from snakeai.gameplay.environment import Environment
+from snakeai.gameplay.levels import load_level_config
+
+
+LEVEL_FILENAME = os.path.join(os.path.dirname(__file__), os.pardir, 'levels', '10x10-blank.json')
+
+
+class Conv2D(object):
+    """ Mimics the parts of the Keras `Conv2D` layer that the exporter uses. """
+
+    def __init__(self, kernel, bias, strides=(1, 1), activation='linear', data_format='channels_first',
+                 dilation_rate=(1, 1)):
+        self.kernel, self.bias = kernel, bias
+        self.config = {
+            'strides': strides, 'padding': 'valid', 'activation': activation, 'data_format': data_format,
+            'dilation_rate': dilation_rate, 'use_bias': bias is not None,
+        }
+
+    def get_config(self):
+        return self.config
+
+    def get_weights(self):
+        return [self.kernel] if self.bias is None else [self.kernel, self.bias]
+
+
+class Dense(Conv2D):
+    def __init__(self, kernel, bias, activation='linear'):
+        super().__init__(kernel, bias, activation=activation)
+
+
+class Activation(object):
+    def __init__(self, activation):
+        self.activation = activation
+
+    def get_config(self):
+        return {'activation': self.activation}
+
+
+class Flatten(object):
+    def __init__(self, data_format='channels_last'):
+        self.data_format = data_format
+
+    def get_config(self):
+        return {'data_format': self.data_format}
+
+
+class Sequential(object):
+    def __init__(self, input_shape, layers):
+        self.input_shape = (None, ) + input_shape
+        self.layers = layers
+
+
+def conv2d_reference(x, kernel, bias, strides):
+    """ A straightforward loop implementation of the Keras channels-first convolution. """
+    kernel_height, kernel_width, _, out_channels = kernel.shape
+    out_height = (x.shape[2] - kernel_height) // strides[0] + 1
+    out_width = (x.shape[3] - kernel_width) // strides[1] + 1
+    y = np.zeros((len(x), out_channels, out_height, out_width))
+    for n in range(len(x)):
+        for o in range(out_channels):
+            for i in range(out_height):
+                for j in range(out_width):
+                    patch = x[n, :, i * strides[0]:i * strides[0] + kernel_height, j * strides[1]:j * strides[1] + kernel_width]
+                    y[n, o, i, j] = np.sum(patch * kernel[:, :, :, o].transpose(2, 0, 1)) + (bias[o] if bias is not None else 0)
+    return y
+
+
+def create_dqn_like_model(rng, num_frames=4, grid_size=10, num_actions=3, flatten_data_format='channels_last',
+                          use_bias=True):
+    """ Build a model with the `create_dqn_model` architecture in `train.py`, with random weights. """
+    conv_output_size = grid_size - 4
+
+    def random_bias(size):
+        return rng.normal(size=size) if use_bias else None
+
+    return Sequential((num_frames, grid_size, grid_size), [
+        Conv2D(rng.normal(size=(3, 3, num_frames, 16)), random_bias(16)),
+        Activation('relu'),
+        Conv2D(rng.normal(size=(3, 3, 16, 32)) * 0.1, random_bias(32)),
+        Activation('relu'),
+        Flatten(flatten_data_format),
+        Dense(rng.normal(size=(32 * conv_output_size * conv_output_size, 256)) * 0.01, random_bias(256)),
+        Activation('relu'),
+        Dense(rng.normal(size=(256, num_actions)) * 0.1, random_bias(num_actions)),
+    ])
+
+
+def predict_reference(keras_model, states):
+    x = states.astype(np.float64)
+    for layer in keras_model.layers:
+        if isinstance(layer, Dense):
+            x = x @ layer.kernel + (layer.bias if layer.bias is not None else 0)
+        elif isinstance(layer, Conv2D):
+            x = conv2d_reference(x, layer.kernel, layer.bias, layer.config['strides'])
+        elif isinstance(layer, Activation):
+            x = np.maximum(x, 0)
+        elif isinstance(layer, Flatten):
+            if layer.data_format == 'channels_first':
+                x = x.transpose(0, 2, 3, 1)
+            x = x.reshape(len(x), -1)
+    return x
+
+
+@pytest.mark.parametrize('strides', [(1, 1), (2, 1)])
+def test_conv2d_channels_first_matches_reference(strides):
+    rng = np.random.default_rng(0)
+    x = rng.normal(size=(3, 4, 7, 6)).astype(np.float32)
+    kernel = rng.normal(size=(3, 2, 4, 5)).astype(np.float32)
+    bias = rng.normal(size=5).astype(np.float32)
+
+    y = conv2d_channels_first(x, kernel, bias, strides)
+    assert np.allclose(y, conv2d_reference(x, kernel, bias, strides), atol=1e-4)
+
+
+@pytest.mark.parametrize('flatten_data_format', ['channels_last', 'channels_first'])
+@pytest.mark.parametrize('use_bias', [True, False])
+def test_exported_model_matches_reference_forward_pass(flatten_data_format, use_bias, tmp_path):
+    rng = np.random.default_rng(0)
+    keras_model = create_dqn_like_model(rng, flatten_data_format=flatten_data_format, use_bias=use_bias)
+    export_keras_model(keras_model, str(tmp_path / 'dqn.npz'))
+    model = NumpyDQNModel.load(str(tmp_path / 'dqn.npz'))
+
+    assert model.input_shape == (None, 4, 10, 10)
+    assert model.output_shape == (None, 3)
+
+    states = rng.integers(0, 5, size=(5, 4, 10, 10)).astype(np.uint8)
+    expected = predict_reference(keras_model, states)
+    assert np.allclose(model.predict(states), expected, rtol=1e-4, atol=1e-3)
+    assert np.allclose(model.predict(states[:1]), expected[:1], rtol=1e-4, atol=1e-3)
+
+    agent = DeepQNetworkAgent(model=model, memory_size=-1)
+    agent.begin_episode()
+    assert agent.act(states[0, 0], 0) == np.argmax(predict_reference(keras_model, states[:1, :1].repeat(4, axis=1)))
+
+
+def test_predict_does_not_modify_states():
+    layers = [{'type': 'flatten', 'data_format': 'channels_last'}, {'type': 'activation', 'activation': 'relu'},
+              {'type': 'dense', 'activation': 'linear'}]
+    model = NumpyDQNModel((2, 2, 2), layers, {2: (np.eye(8, dtype=np.float32), np.zeros(8, dtype=np.float32))})
+    states = np.random.default_rng(0).normal(size=(3, 2, 2, 2)).astype(np.float32)
+    original_states = states.copy()
+    assert np.array_equal(model.predict(states), np.maximum(original_states, 0).reshape(3, -1))
+    assert np.array_equal(states, original_states)
+
+
+def test_export_unsupported_layer_throws(tmp_path):
+    model = Sequential((4, 10, 10), [Activation('tanh')])
+    with pytest.raises(ValueError):
+        export_keras_model(model, str(tmp_path / 'dqn.npz'))
+
+    conv = Conv2D(np.zeros((3, 3, 4, 2)), np.zeros(2), data_format='channels_last')
+    with pytest.raises(ValueError):
+        export_keras_model(Sequential((10, 10, 4), [conv]), str(tmp_path / 'dqn.npz'))
+
+    conv = Conv2D(np.zeros((3, 3, 4, 2)), np.zeros(2), dilation_rate=(2, 2))
+    with pytest.raises(ValueError):
+        export_keras_model(Sequential((4, 10, 10), [conv]), str(tmp_path / 'dqn.npz'))
+
+    dense = Dense(np.zeros((4, 2)), np.zeros(2))
+    dense.config['use_bias'] = False
+    with pytest.raises(ValueError):
+        export_keras_model(Sequential((4, ), [dense]), str(tmp_path / 'dqn.npz'))
+
+
+def test_exported_keras_model_matches_keras_predictions(tmp_path):
+    pytest.importorskip('keras')
+    from train import create_dqn_model
+
+    env = Environment(config=load_level_config(LEVEL_FILENAME), verbose=0)
+    keras_model = create_dqn_model(env, num_last_frames=4)
+    export_keras_model(keras_model, str(tmp_path / 'dqn.npz'))
+    model = NumpyDQNModel.load(str(tmp_path / 'dqn.npz'))
+
+    states = np.random.default_rng(0).integers(0, 5, size=(16, 4) + env.observation_shape).astype(np.uint8)
+    expected = keras_model.predict(states.astype(np.float32), verbose=0)
+    assert np.allclose(model.predict(states), expected, rtol=1e-4, atol=1e-4)
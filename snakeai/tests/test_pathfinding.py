@@ -0,0 +1,81 @@
+import json
+import os
+
+import numpy as np
+import pytest
+
+from snakeai.agent import AStarAgent, BreadthFirstSearchAgent, HamiltonianCycleAgent
+from snakeai.agent.pathfinding import build_hamiltonian_cycle
+from snakeai.gameplay.environment import Environment
+
+
+def load_env(name, **kwargs):
+    level_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir, 'levels'))
+    with open(os.path.join(level_dir, name) + '.json') as cfg:
+        return Environment(config=json.load(cfg), verbose=0, **kwargs)
+
+
+def play_episode_tracking_snake(env, agent):
+    """ Play an episode and check that the agent's view of the snake matches the environment at every step. """
+    tsr = env.new_episode()
+    agent.begin_episode()
+    while not tsr.is_episode_end:
+        env.choose_action(agent.act(tsr.observation, tsr.reward))
+        assert list(agent.body) == env.snake.cells
+        tsr = env.timestep()
+    agent.end_episode()
+    return env.stats
+
+
+@pytest.mark.parametrize('agent_class', [BreadthFirstSearchAgent, AStarAgent])
+@pytest.mark.parametrize('level_name', ['10x10-blank', '10x10-obstacles'])
+def test_search_agents_reach_fruits(agent_class, level_name):
+    env = load_env(level_name)
+    env.seed(1)
+    agent = agent_class()
+    fruits_eaten = [play_episode_tracking_snake(env, agent).fruits_eaten for _ in range(5)]
+    assert min(fruits_eaten) >= 5
+
+
+def test_hamiltonian_agent_fills_blank_level_without_dying():
+    env = load_env('10x10-blank')
+    env.seed(2)
+    stats = play_episode_tracking_snake(env, HamiltonianCycleAgent())
+    assert stats.termination_reason == 'timestep_limit_exceeded'
+
+    # The whole 8x8 inner area is covered by the snake, so there is no fruit left.
+    assert env.snake.length == 64
+    assert env.fruit is None
+
+
+def test_hamiltonian_agent_without_cycle_falls_back_to_search():
+    env = load_env('10x10-obstacles')
+    env.seed(3)
+    agent = HamiltonianCycleAgent()
+    stats = play_episode_tracking_snake(env, agent)
+    assert agent.cycle_positions is None
+    assert stats.fruits_eaten > 0
+
+
+@pytest.mark.parametrize('rows, columns', [(4, 5), (5, 4), (2, 2), (6, 6)])
+def test_build_hamiltonian_cycle_visits_every_cell_once(rows, columns):
+    open_mask = np.zeros((rows + 2, columns + 2), dtype=bool)
+    open_mask[1:-1, 1:-1] = True
+    positions = build_hamiltonian_cycle(open_mask)
+
+    cycle = np.argsort(positions)[np.count_nonzero(positions < 0):]
+    assert sorted(cycle) == sorted(np.flatnonzero(open_mask))
+    for cell, next_cell in zip(cycle, np.roll(cycle, -1)):
+        (y, x), (next_y, next_x) = divmod(cell, columns + 2), divmod(next_cell, columns + 2)
+        assert abs(y - next_y) + abs(x - next_x) == 1
+
+
+def test_build_hamiltonian_cycle_odd_sides_or_obstacles_returns_none():
+    open_mask = np.zeros((7, 7), dtype=bool)
+    open_mask[1:-1, 1:-1] = True
+    assert build_hamiltonian_cycle(open_mask) is None
+
+    open_mask = np.zeros((6, 6), dtype=bool)
+    open_mask[1:-1, 1:-1] = True
+    open_mask[2, 2] = False
+    assert build_hamiltonian_cycle(open_mask) is None
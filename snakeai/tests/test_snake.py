@@ -1,3 +1,5 @@
+import pytest
+
 from snakeai.gameplay.entities import Point, Snake, SnakeDirection
 
 
@@ -119,3 +121,64 @@ def test_turn_left_turns_relatively_to_current_direction():
     assert snake.direction == SnakeDirection.EAST
     snake.turn_left()
     assert snake.direction == SnakeDirection.NORTH
+
+
+def test_turns_cycle_through_all_directions():
+    snake = Snake(Point(4, 5))
+
+    snake.turn_right()
+    assert snake.direction == SnakeDirection.EAST
+    snake.turn_right()
+    assert snake.direction == SnakeDirection.SOUTH
+    snake.turn_left()
+    snake.turn_left()
+    snake.turn_left()
+    assert snake.direction == SnakeDirection.WEST
+    snake.turn_right()
+    assert snake.direction == SnakeDirection.NORTH
+
+
+def test_snake_on_field_uses_flat_cell_indices():
+    snake = Snake(Point(3, 2), length=3, field_shape=(7, 6))
+    assert snake.cells == [15, 21, 27]
+    assert snake.head_cell == 15
+    assert snake.tail_cell == 27
+
+    snake.turn_left()
+    assert snake.peek_next_cell() == 14
+    snake.move()
+    assert snake.cells == [14, 15, 21]
+    assert snake.head == (2, 2)
+
+
+def test_grow_beyond_initial_capacity_keeps_body_order():
+    snake = Snake(Point(1, 1), length=2)
+    snake.direction = SnakeDirection.EAST
+    for _ in range(40):
+        snake.grow()
+        snake.move()
+
+    assert snake.length == 42
+    assert snake.head == (81, 1)
+    assert snake.tail == (40, 1)
+    assert list(snake.body) == [(x, 1) for x in range(81, 39, -1)]
+
+
+def test_snake_without_field_keeps_negative_coordinates():
+    snake = Snake(Point(0, 5))
+    snake.direction = SnakeDirection.WEST
+    snake.move()
+    assert snake.head == Point(-1, 5)
+    assert snake.body == [Point(-1, 5), Point(0, 5), Point(0, 6)]
+
+    snake.direction = SnakeDirection.NORTH
+    for _ in range(7):
+        snake.move()
+    assert snake.head == Point(-1, -2)
+    assert snake.tail == Point(-1, 0)
+    assert snake.peek_next_move() == Point(-1, -3)
+
+
+def test_snake_without_field_out_of_range_coordinates_throw():
+    with pytest.raises(ValueError):
+        Snake(Point(1 << 14, 5))
@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+
+from snakeai.gameplay.environment import EpisodeStatistics
+from snakeai.utils.stats import EpisodeStatisticsWriter, read_episode_statistics
+
+
+def make_episode_stats(index):
+    stats = EpisodeStatistics()
+    stats.timesteps_survived = index + 1
+    stats.sum_episode_rewards = index - 1
+    stats.fruits_eaten = index
+    stats.termination_reason = 'hit_wall' if index % 2 else 'hit_own_body'
+    stats.action_counter[0] = index * 2
+    return stats.flatten()
+
+
+@pytest.mark.parametrize('extension', ['csv', 'npz'])
+def test_stats_writer_round_trip_preserves_records(tmp_path, extension):
+    filename = str(tmp_path / f'stats.{extension}')
+    records = [make_episode_stats(i) for i in range(25)]
+
+    with EpisodeStatisticsWriter(filename, EpisodeStatistics.FIELDS, buffer_size=10) as writer:
+        for record in records:
+            writer.write(record)
+
+    columns = read_episode_statistics(filename)
+    assert list(columns) == [name for name, _ in EpisodeStatistics.FIELDS]
+    assert columns['timesteps_survived'].tolist() == [r['timesteps_survived'] for r in records]
+    assert columns['sum_episode_rewards'].tolist() == [r['sum_episode_rewards'] for r in records]
+    assert columns['termination_reason'].tolist() == [r['termination_reason'] for r in records]
+    assert np.allclose(columns['mean_reward'], [r['mean_reward'] for r in records])
+
+
+def test_stats_writer_flushes_in_bulk_only_when_buffer_is_full(tmp_path):
+    filename = str(tmp_path / 'stats.csv')
+    writer = EpisodeStatisticsWriter(filename, EpisodeStatistics.FIELDS, buffer_size=3, flush_interval=3600)
+
+    for i in range(5):
+        writer.write(make_episode_stats(i))
+    with open(filename) as stats_file:
+        assert len(stats_file.readlines()) == 1 + 3
+
+    writer.close()
+    with open(filename) as stats_file:
+        lines = stats_file.readlines()
+    assert len(lines) == 1 + 5
+    assert lines[1] == '1,-1,-1,0,hit_own_body,0,0,0\n'
+
+
+def test_stats_writer_missing_values_are_written_as_blanks(tmp_path):
+    filename = str(tmp_path / 'stats.csv')
+    with EpisodeStatisticsWriter(filename, EpisodeStatistics.FIELDS) as writer:
+        writer.write(EpisodeStatistics().flatten())
+
+    with open(filename) as stats_file:
+        assert stats_file.readlines()[1] == '0,0,,0,,0,0,0\n'
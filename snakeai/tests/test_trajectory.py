@@ -0,0 +1,90 @@
+import json
+import os
+
+import numpy as np
+import pytest
+
+from snakeai.gameplay.environment import Environment
+from snakeai.gameplay.trajectory import TrajectoryRecorder, TrajectoryReader
+
+
+def load_config(name):
+    level_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir, 'levels'))
+    with open(os.path.join(level_dir, name) + '.json') as cfg:
+        return json.load(cfg)
+
+
+def record_random_episodes(env, recorder, num_episodes, seed):
+    """ Play random episodes, recording them, and return the observations of every episode. """
+    rng = np.random.default_rng(seed)
+    all_observations = []
+    for _ in range(num_episodes):
+        observations = [env.new_episode().observation]
+        recorder.begin_episode(env, seed=seed)
+        game_over = False
+        while not game_over:
+            action = rng.choice(3, p=[0.7, 0.15, 0.15])
+            env.choose_action(action)
+            tsr = env.timestep()
+            recorder.record_timestep(env, action, tsr.reward)
+            observations.append(tsr.observation)
+            game_over = tsr.is_episode_end
+        recorder.end_episode()
+        all_observations.append(observations)
+    return all_observations
+
+
+@pytest.mark.parametrize('level_name', ['10x10-blank', '10x10-obstacles'])
+def test_trajectory_reader_reconstructs_every_recorded_state(tmp_path, level_name):
+    config = load_config(level_name)
+    env = Environment(config=config, verbose=0)
+    env.seed(3)
+    filename = str(tmp_path / 'episodes.trj')
+
+    recorder = TrajectoryRecorder(filename, config['field'], keyframe_interval=7)
+    expected = record_random_episodes(env, recorder, num_episodes=10, seed=3)
+    recorder.close()
+
+    reader = TrajectoryReader(filename)
+    assert len(reader) == 10
+    for episode, observations in zip(reader, expected):
+        assert len(episode) == len(observations)
+        assert all(np.array_equal(actual, obs) for actual, obs in zip(episode, observations))
+
+    # Random access should give the same result as sequential replay.
+    episode = max(reader, key=len)
+    assert len(episode) > 7
+    for timestep in [len(episode) - 1, 0, 7, len(episode) // 2, 6]:
+        assert np.array_equal(episode.get_observation(timestep), expected[reader.episodes.index(episode)][timestep])
+
+
+def test_trajectory_recorder_appends_to_existing_file(tmp_path):
+    config = load_config('10x10-blank')
+    env = Environment(config=config, verbose=0)
+    filename = str(tmp_path / 'episodes.trj')
+
+    for seed in [1, 2]:
+        recorder = TrajectoryRecorder(filename, config['field'])
+        record_random_episodes(env, recorder, num_episodes=3, seed=seed)
+        recorder.close()
+
+    reader = TrajectoryReader(filename)
+    assert [episode.seed for episode in reader] == [1, 1, 1, 2, 2, 2]
+
+    with pytest.raises(ValueError):
+        TrajectoryRecorder(filename, load_config('10x10-obstacles')['field'])
+
+
+def test_env_verbose_2_writes_trajectory_file(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    env = Environment(config=load_config('10x10-blank'), verbose=2)
+    for _ in range(3):
+        env.new_episode()
+        while not env.timestep().is_episode_end:
+            pass
+    env.close()
+
+    trajectory_files = [name for name in os.listdir(tmp_path) if name.endswith('.trj')]
+    assert len(trajectory_files) == 1
+    reader = TrajectoryReader(trajectory_files[0])
+    assert [len(episode) for episode in reader] == [5, 5, 5]
@@ -0,0 +1,119 @@
+import json
+import os
+
+import numpy as np
+import pytest
+
+from snakeai.gameplay.batch import BatchEnvironment
+from snakeai.gameplay.entities import CellType, ALL_SNAKE_ACTIONS
+from snakeai.gameplay.wrappers import (
+    SubprocVectorEnv, make_openai_gym_environment, make_openai_gym_vector_environment
+)
+from snakeai.utils.seeding import spawn_seeds
+
+
+def get_env_config_file(name):
+    level_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir, 'levels'))
+    return os.path.join(level_dir, name) + '.json'
+
+
+def load_config(name):
+    with open(get_env_config_file(name)) as cfg:
+        return json.load(cfg)
+
+
+def test_gym_observation_space_matches_level(tmp_path, monkeypatch):
+    # The single-game adapter writes episode statistics to the working directory.
+    monkeypatch.chdir(tmp_path)
+    config = load_config('10x10-blank')
+    config['field'] = ['#' * 7] + ['#.....#'] * 2 + ['#..S..#'] + ['#.....#'] * 2 + ['#' * 7]
+    config_filename = str(tmp_path / '7x7-blank.json')
+    with open(config_filename, 'w') as cfg:
+        json.dump(config, cfg)
+
+    env = make_openai_gym_environment(config_filename)
+    assert env.observation_space.shape == (7, 7)
+    assert env.reset().shape == (7, 7)
+    env.env.close()
+
+    vector_env = make_openai_gym_vector_environment(config_filename, num_envs=5, seed=0)
+    assert vector_env.single_observation_space.shape == (7, 7)
+    assert vector_env.observation_space.shape == (5, 7, 7)
+    observations = vector_env.reset()
+    assert observations.shape == (5, 7, 7)
+    assert observations.dtype == np.uint8
+
+
+def test_gym_vector_env_autoresets_and_reports_episodes():
+    config = load_config('10x10-obstacles')
+    vector_env = make_openai_gym_vector_environment(get_env_config_file('10x10-obstacles'), num_envs=16, seed=5)
+    vector_env.reset()
+
+    rng = np.random.default_rng(0)
+    num_dones = 0
+    for _ in range(100):
+        actions = rng.choice(ALL_SNAKE_ACTIONS, size=vector_env.num_envs)
+        observations, rewards, dones, info = vector_env.step(actions)
+        for i in np.flatnonzero(dones):
+            num_dones += 1
+            # The returned observation already belongs to the next episode.
+            assert np.count_nonzero(observations[i] == CellType.SNAKE_HEAD) == 1
+            assert np.count_nonzero(observations[i] == CellType.SNAKE_BODY) == config['initial_snake_length'] - 1
+            assert info['episode_timesteps'][i] > 0
+            assert info['episode_termination_reason'][i] in ('hit_wall', 'hit_own_body', 'timestep_limit_exceeded')
+            assert not np.array_equal(info['terminal_observation'][i], observations[i])
+    assert num_dones > 0
+
+
+@pytest.mark.parametrize('start_method', ['fork', 'spawn'])
+def test_subproc_vector_env_matches_batch_envs(start_method):
+    config = load_config('10x10-obstacles')
+    config['max_step_limit'] = 50
+    num_workers, envs_per_worker = 2, 3
+
+    vector_env = SubprocVectorEnv(config, num_workers, envs_per_worker, seed=11, start_method=start_method)
+    batch_envs = [
+        BatchEnvironment(config, envs_per_worker, seed=seed)
+        for seed in spawn_seeds(11, num_workers)
+    ]
+    try:
+        observations = vector_env.reset()
+        assert observations.shape == (num_workers * envs_per_worker, ) + vector_env.observation_shape
+        assert np.array_equal(observations, np.concatenate([batch_env.reset() for batch_env in batch_envs]))
+
+        rng = np.random.default_rng(3)
+        num_dones = 0
+        for _ in range(200):
+            actions = rng.choice(ALL_SNAKE_ACTIONS, size=vector_env.num_envs, p=[0.6, 0.2, 0.2])
+            observations, rewards, dones = vector_env.step(actions)
+            expected = [
+                batch_env.step(actions[i * envs_per_worker:(i + 1) * envs_per_worker])
+                for i, batch_env in enumerate(batch_envs)
+            ]
+            assert np.array_equal(observations, np.concatenate([obs for obs, _, _ in expected]))
+            assert np.array_equal(rewards, np.concatenate([r for _, r, _ in expected]))
+            assert np.array_equal(dones, np.concatenate([d for _, _, d in expected]))
+
+            expected_terminal = np.concatenate([batch_env.terminal_observations for batch_env in batch_envs])
+            assert np.array_equal(vector_env.terminal_observations[dones], expected_terminal[dones])
+            num_dones += dones.sum()
+        assert num_dones > 0
+    finally:
+        vector_env.close()
+
+
+def test_subproc_vector_env_reports_worker_errors():
+    config = load_config('10x10-blank')
+    vector_env = SubprocVectorEnv(config, 2, 2, seed=0)
+    try:
+        vector_env.reset()
+        with pytest.raises(RuntimeError, match='worker failed'):
+            vector_env.step([0, 0, 100, 100])
+
+        # The environment is closed after a worker failure instead of returning stale replies.
+        with pytest.raises(RuntimeError, match='closed'):
+            vector_env.step([0, 0, 0, 0])
+        with pytest.raises(RuntimeError, match='closed'):
+            vector_env.reset()
+    finally:
+        vector_env.close()
@@ -1,80 +1,796 @@
-import collections
-import random
+import atexit
+import json
+import os
+import shutil
 
 import numpy as np
 
 
+def link_or_copy_file(source, target):
+    """ Hard-link the file to the target path, or copy it if it is on a different file system. """
+    try:
+        os.link(source, target)
+    except OSError:
+        shutil.copyfile(source, target)
+
+
+def compute_batch_targets(model, experience, discount_factor=0.9):
+    """
+    Compute the learning targets for a batch of experience.
+
+    Args:
+        model: the DQN model that predicts the state-action values.
+        experience: a tuple of arrays (states, actions, rewards, states_next, episode_ends).
+        discount_factor (float): discount factor (gamma) for computing the value function.
+
+    Returns:
+        A tuple (states, targets, td_errors), the TD errors being those of the actions taken.
+    """
+
+    # Extract [S, a, r, S', end] from experience.
+    states, actions, rewards, states_next, episode_ends = experience
+    batch_size = len(states)
+
+    # Predict future state-action values.
+    X = np.concatenate([states, states_next], axis=0)
+    y = model.predict(X)
+    Q_next = np.max(y[batch_size:], axis=1)
+
+    # Only the values of the actions taken are moved towards the new estimates.
+    targets = np.array(y[:batch_size], dtype=np.float32)
+    batch_range = np.arange(batch_size)
+    targets[batch_range, actions] = rewards + discount_factor * ~episode_ends * Q_next
+    td_errors = targets[batch_range, actions] - y[batch_range, actions]
+    return states, targets, td_errors
+
+
 class ExperienceReplay(object):
-    """ Represents the experience replay memory that can be randomly sampled. """
+    """
+    Represents the experience replay memory that can be randomly sampled.
+
+    The agent state is a stack of the last few frames, so consecutive states share all but one frame.
+    Instead of whole stacks, the memory keeps a single frame per transition (the newest frame of the
+    state the action was taken in) and rebuilds the stacks when sampling. Like the agent does, a stack
+    that reaches past the start of an episode repeats the first frame of the episode.
+    The transitions must therefore be remembered in the order they were played.
+
+    The frames and the rest of the experience are kept in preallocated, typed column arrays that are used
+    as a ring buffer: once the memory is full, every new transition overwrites the oldest one.
+    """
+
+    # The initial capacity of an unlimited memory, which doubles every time it fills up.
+    INITIAL_UNLIMITED_CAPACITY = 1024
+
+    # The arrays that hold the experience, saved to a file each.
+    COLUMNS = ('frames', 'actions', 'rewards', 'episode_ends')
 
-    def __init__(self, input_shape, num_actions, memory_size=100):
+    def __init__(self, input_shape, num_actions, memory_size=100, rng=None):
         """
         Create a new instance of experience replay memory.
-        
+
         Args:
-            input_shape: the shape of the agent state.
+            input_shape: the shape of the agent state (num_last_frames, height, width).
             num_actions: the number of actions allowed in the environment.
             memory_size: memory size limit (-1 for unlimited).
+            rng: (optional) a `numpy.random.Generator` for sampling the batches.
         """
-        self.memory = collections.deque()
-        self.input_shape = input_shape
+        self.input_shape = tuple(input_shape)
+        self.num_last_frames = self.input_shape[0]
         self.num_actions = num_actions
         self.memory_size = memory_size
+        self.rng = rng if rng is not None else np.random.default_rng()
+        self.reset()
+
+    def __len__(self):
+        return self.num_items
+
+    @property
+    def capacity(self):
+        """ Get the number of items the memory can hold before it has to grow or overwrite old items. """
+        return len(self.actions)
 
     def reset(self):
         """ Erase the experience replay memory. """
-        self.memory = collections.deque()
+        capacity = self.memory_size if self.memory_size > 0 else self.INITIAL_UNLIMITED_CAPACITY
+        self.frames = np.zeros((capacity, ) + self.input_shape[1:], dtype=np.uint8)
+        self.actions = np.zeros(capacity, dtype=np.int8)
+        self.rewards = np.zeros(capacity, dtype=np.float32)
+        self.episode_ends = np.zeros(capacity, dtype=bool)
+        self.num_items = 0
+        self.next_index = 0
+
+    def _grow(self):
+        """ Double the capacity of an unlimited memory, keeping the stored items. """
+        for name in self.COLUMNS:
+            column = getattr(self, name)
+            grown_column = np.zeros((2 * len(column), ) + column.shape[1:], dtype=column.dtype)
+            grown_column[:len(column)] = column
+            setattr(self, name, grown_column)
+        self.next_index = self.num_items
 
     def remember(self, state, action, reward, state_next, is_episode_end):
         """
         Store a new piece of experience into the replay memory.
-        
+
+        Only the newest frame of `state` is stored: the older frames are already in the memory,
+        and the newest frame of `state_next` comes with the next transition (or is never needed,
+        if the episode has ended).
+
         Args:
             state: state observed at the previous step.
             action: action taken at the previous step.
             reward: reward received at the beginning of the current step.
-            state_next: state observed at the current step. 
+            state_next: state observed at the current step.
+            is_episode_end: whether the episode has ended with the current step.
+        """
+        self.remember_frame(np.reshape(state, self.input_shape)[-1], action, reward, is_episode_end)
+
+    def remember_frame(self, frame, action, reward, is_episode_end):
+        """
+        Store a new piece of experience, given only the newest frame of the state (see `remember`).
+
+        Args:
+            frame: the newest frame of the state observed at the previous step.
+            action: action taken at the previous step.
+            reward: reward received at the beginning of the current step.
             is_episode_end: whether the episode has ended with the current step.
         """
-        memory_item = np.concatenate([
-            state.flatten(),
-            np.array(action).flatten(),
-            np.array(reward).flatten(),
-            state_next.flatten(),
-            1 * np.array(is_episode_end).flatten()
+        if self.memory_size <= 0 and self.num_items == self.capacity:
+            self._grow()
+
+        index = self.next_index
+        self.frames[index] = frame
+        self.actions[index] = action
+        self.rewards[index] = reward
+        self.episode_ends[index] = is_episode_end
+
+        self.next_index = (index + 1) % self.capacity
+        self.num_items = min(self.num_items + 1, self.capacity)
+
+    def get_state(self):
+        """ Get the bookkeeping state of the memory (everything except the arrays), as a JSON-compatible dict. """
+        return {
+            'num_items': self.num_items,
+            'next_index': self.next_index,
+            'rng_state': self.rng.bit_generator.state,
+        }
+
+    def set_state(self, state):
+        """ Restore the bookkeeping state of the memory from `get_state`. """
+        self.num_items = state['num_items']
+        self.next_index = state['next_index']
+        self.rng.bit_generator.state = state['rng_state']
+
+    def save(self, directory):
+        """
+        Save the memory into a directory, one `.npy` file per array and a JSON file for the rest.
+
+        Args:
+            directory: the output directory, created if it does not exist.
+        """
+        os.makedirs(directory, exist_ok=True)
+        for name in self.COLUMNS:
+            np.save(os.path.join(directory, f'{name}.npy'), getattr(self, name))
+        with open(os.path.join(directory, 'replay.json'), 'w') as state_file:
+            json.dump(self.get_state(), state_file)
+
+    def load(self, directory):
+        """
+        Replace the contents of the memory with the ones saved by `save`.
+
+        The arrays are read into memory, since the memory keeps writing to them, so the saved files
+        can be replaced or deleted afterwards.
+        """
+        with open(os.path.join(directory, 'replay.json')) as state_file:
+            state = json.load(state_file)
+
+        columns = {name: np.load(os.path.join(directory, f'{name}.npy')) for name in self.COLUMNS}
+        if columns['frames'].shape[1:] != self.input_shape[1:]:
+            raise ValueError(f'Saved frames of shape {columns["frames"].shape[1:]} do not match the agent state')
+        if self.memory_size > 0 and len(columns['actions']) != self.memory_size:
+            raise ValueError(f'Saved memory size {len(columns["actions"])} does not match {self.memory_size}')
+
+        for name, column in columns.items():
+            setattr(self, name, column)
+        self.set_state(state)
+
+    def get_valid_positions(self):
+        """
+        Get the range of positions (0 for the oldest transition) that can be sampled.
+
+        Once the memory has wrapped around, the oldest transitions have lost the older frames of their state.
+        The newest transition does not have the next state yet, unless the episode has ended with it.
+
+        Returns:
+            A tuple (first position, position after the last one).
+        """
+        first = self.num_last_frames - 1 if self.num_items == self.capacity else 0
+        last = self.num_items
+        if self.num_items > 0 and not self.episode_ends[(self.next_index - 1) % self.capacity]:
+            last -= 1
+        return first, max(first, last)
+
+    def get_experience(self, positions):
+        """
+        Gather the transitions at the given positions (0 for the oldest transition), rebuilding the states.
+
+        Returns:
+            A tuple of arrays (states, actions, rewards, states_next, episode_ends).
+            The next state of a transition that has ended an episode is meaningless.
+        """
+        positions = np.asarray(positions)
+        oldest = self.next_index if self.num_items == self.capacity else 0
+        episode_ends = self.episode_ends[(oldest + positions) % self.capacity]
+
+        # Walk back from the newest frame, repeating the first frame of the episode once it has been reached.
+        stack_positions = np.empty((len(positions), self.num_last_frames + 1), dtype=np.int64)
+        stack_positions[:, -2] = positions
+        stack_positions[:, -1] = np.where(episode_ends, positions, positions + 1)
+        reached_episode_start = np.zeros(len(positions), dtype=bool)
+        for offset in range(1, self.num_last_frames):
+            previous_positions = positions - offset
+            reached_episode_start |= previous_positions < 0
+            reached_episode_start |= self.episode_ends[(oldest + previous_positions) % self.capacity]
+            stack_positions[:, -2 - offset] = np.where(
+                reached_episode_start,
+                stack_positions[:, -1 - offset],
+                previous_positions,
+            )
+
+        stack_indices = (oldest + stack_positions) % self.capacity
+        indices = stack_indices[:, -2]
+        return (
+            self.frames[stack_indices[:, :-1]],
+            self.actions[indices],
+            self.rewards[indices],
+            self.frames[stack_indices[:, 1:]],
+            episode_ends,
+        )
+
+    def sample_positions(self, batch_size):
+        """ Pick the positions of a random batch of experience (with replacement). """
+        first, last = self.get_valid_positions()
+        if first == last:
+            return np.empty(0, dtype=np.int64)
+        return self.rng.integers(first, last, size=batch_size)
+
+    def compute_targets(self, model, positions, discount_factor=0.9):
+        """
+        Compute the learning targets for the transitions at the given positions.
+
+        Returns:
+            A tuple (states, targets, td_errors), the TD errors being those of the actions taken.
+        """
+        return compute_batch_targets(model, self.get_experience(positions), discount_factor)
+
+    def get_batch(self, model, batch_size, discount_factor=0.9):
+        """
+        Sample a batch from experience replay.
+
+        Returns:
+            A tuple (states, targets, sample weights, positions, TD errors), or None if there is nothing
+            to sample yet. The sample weights are None, since all transitions are sampled with equal probability.
+            The positions and the TD errors are meant for `update_priorities`.
+        """
+        positions = self.sample_positions(batch_size)
+        if len(positions) == 0:
+            return None
+
+        states, targets, td_errors = self.compute_targets(model, positions, discount_factor)
+        return states, targets, None, positions, td_errors
+
+    def update_priorities(self, positions, td_errors):
+        """
+        Update the sampling priorities of a batch once the model has learned on it.
+        All transitions have the same priority in a uniform memory, so there is nothing to update.
+        """
+        pass
+
+
+class DiskExperienceReplay(ExperienceReplay):
+    """
+    Represents an unlimited experience replay memory that spills older transitions to disk.
+
+    The newest transitions are kept in a hot segment in RAM, sized to fit the RAM budget. Once the hot segment
+    is full, it is written to a segment file and memory-mapped read-only, so that the operating system
+    can page it in and out as needed. The batches are still sampled uniformly from the whole history,
+    reading each segment with a single sorted-index gather. The frames are stored once per transition,
+    like in `ExperienceReplay`.
+
+    The segment files are deleted by `close`, which is also called at exit if the owner forgets to.
+    """
+
+    def __init__(self, input_shape, num_actions, directory, ram_budget=512 * 2 ** 20, rng=None):
+        """
+        Create a new instance of disk-backed experience replay memory.
+
+        Args:
+            input_shape: the shape of the agent state (num_last_frames, height, width).
+            num_actions: the number of actions allowed in the environment.
+            directory: the directory for the segment files, created if it does not exist.
+            ram_budget (int): the size of the hot segment in bytes.
+            rng: (optional) a `numpy.random.Generator` for sampling the batches.
+        """
+        self.directory = directory
+        self.ram_budget = ram_budget
+        self.segments = []
+        super().__init__(input_shape, num_actions, memory_size=-1, rng=rng)
+
+        # Do not leave the segment files behind if the owner forgets to close the memory.
+        atexit.register(self.close)
+
+    @property
+    def capacity(self):
+        """ Get the number of items the memory can hold before it spills the hot segment to disk. """
+        return (len(self.segments) + 1) * self.segment_size
+
+    def reset(self):
+        """ Erase the experience replay memory, deleting its segment files. """
+        self.record_dtype = np.dtype([
+            ('frame', np.uint8, self.input_shape[1:]),
+            ('action', np.int8),
+            ('reward', np.float32),
+            ('episode_end', bool),
         ])
-        self.memory.append(memory_item)
-        if 0 < self.memory_size < len(self.memory):
-            self.memory.popleft()
+        self.segment_size = self.ram_budget // self.record_dtype.itemsize
+        if self.segment_size < 1:
+            raise ValueError(f'The RAM budget of {self.ram_budget} bytes does not fit a single transition')
+
+        self._remove_segments()
+        self.hot_segment = np.zeros(self.segment_size, dtype=self.record_dtype)
+        self.episode_end_positions = np.empty(1024, dtype=np.int64)
+        self.num_episodes = 0
+        self.num_items = 0
+        os.makedirs(self.directory, exist_ok=True)
+
+    def close(self):
+        """ Erase the memory and delete its segment files. """
+        self._remove_segments()
+        self.num_episodes = 0
+        self.num_items = 0
+        atexit.unregister(self.close)
+
+    def _remove_segments(self):
+        for segment in self.segments:
+            try:
+                os.remove(segment.filename)
+            except FileNotFoundError:
+                # The directory has already been cleaned up by someone else.
+                pass
+        self.segments = []
+
+    def remember_frame(self, frame, action, reward, is_episode_end):
+        """
+        Store a new piece of experience, given only the newest frame of the state
+        (see `ExperienceReplay.remember_frame`).
+        """
+        record = self.hot_segment[self.num_items - len(self.segments) * self.segment_size]
+        record['frame'] = frame
+        record['action'] = action
+        record['reward'] = reward
+        record['episode_end'] = is_episode_end
+
+        if is_episode_end:
+            if self.num_episodes == len(self.episode_end_positions):
+                self.episode_end_positions = np.concatenate([self.episode_end_positions, self.episode_end_positions])
+            self.episode_end_positions[self.num_episodes] = self.num_items
+            self.num_episodes += 1
+
+        self.num_items += 1
+        if self.num_items == self.capacity:
+            self._spill_hot_segment()
+
+    def _get_segment_filename(self, segment_idx):
+        """ Get the name of a segment file, unique to this memory instance. """
+        return os.path.join(self.directory, f'replay-{os.getpid()}-{id(self):x}-{segment_idx:06d}.npy')
+
+    def _spill_hot_segment(self):
+        """ Write the hot segment to a new segment file and start filling it from scratch. """
+        filename = self._get_segment_filename(len(self.segments))
+        np.save(filename, self.hot_segment)
+        self.segments.append(np.load(filename, mmap_mode='r'))
+
+    def get_state(self):
+        """ Get the bookkeeping state of the memory (everything except the arrays), as a JSON-compatible dict. """
+        return {
+            'num_items': self.num_items,
+            'num_episodes': self.num_episodes,
+            'num_segments': len(self.segments),
+            'segment_size': self.segment_size,
+            'rng_state': self.rng.bit_generator.state,
+        }
+
+    def save(self, directory):
+        """
+        Save the memory into a directory.
+
+        The segment files never change once written, so they are hard-linked into the directory when possible,
+        which takes no time and no extra disk space.
+        """
+        os.makedirs(directory, exist_ok=True)
+        for segment_idx, segment in enumerate(self.segments):
+            link_or_copy_file(segment.filename, os.path.join(directory, f'segment-{segment_idx:06d}.npy'))
+        num_hot_items = self.num_items - len(self.segments) * self.segment_size
+        np.save(os.path.join(directory, 'hot_segment.npy'), self.hot_segment[:num_hot_items])
+        np.save(os.path.join(directory, 'episode_end_positions.npy'), self.episode_end_positions[:self.num_episodes])
+        with open(os.path.join(directory, 'replay.json'), 'w') as state_file:
+            json.dump(self.get_state(), state_file)
+
+    def load(self, directory):
+        """ Replace the contents of the memory with the ones saved by `save`. """
+        with open(os.path.join(directory, 'replay.json')) as state_file:
+            state = json.load(state_file)
+        if state['segment_size'] != self.segment_size:
+            raise ValueError(f'Saved segment size {state["segment_size"]} does not match the RAM budget')
+
+        self.reset()
+        for segment_idx in range(state['num_segments']):
+            filename = self._get_segment_filename(segment_idx)
+            link_or_copy_file(os.path.join(directory, f'segment-{segment_idx:06d}.npy'), filename)
+            self.segments.append(np.load(filename, mmap_mode='r'))
+
+        hot_segment = np.load(os.path.join(directory, 'hot_segment.npy'))
+        self.hot_segment[:len(hot_segment)] = hot_segment
+        episode_end_positions = np.load(os.path.join(directory, 'episode_end_positions.npy'))
+        self.episode_end_positions = np.empty(max(1024, 2 * len(episode_end_positions)), dtype=np.int64)
+        self.episode_end_positions[:len(episode_end_positions)] = episode_end_positions
+
+        self.num_items = state['num_items']
+        self.num_episodes = state['num_episodes']
+        self.rng.bit_generator.state = state['rng_state']
+
+    def get_valid_positions(self):
+        """
+        Get the range of positions (0 for the oldest transition) that can be sampled.
+
+        The newest transition does not have the next state yet, unless the episode has ended with it.
+
+        Returns:
+            A tuple (first position, position after the last one).
+        """
+        last = self.num_items
+        if self.num_items > 0 and (self.num_episodes == 0 or self.episode_end_positions[self.num_episodes - 1] != last - 1):
+            last -= 1
+        return 0, last
+
+    def read_records(self, positions):
+        """ Read the records at the given positions, one sorted bulk read per segment. """
+        unique_positions, inverse = np.unique(positions, return_inverse=True)
+        records = np.empty(len(unique_positions), dtype=self.record_dtype)
+
+        segment_bounds = np.searchsorted(unique_positions, np.arange(len(self.segments) + 1) * self.segment_size)
+        for segment_idx, segment in enumerate(self.segments):
+            start, end = segment_bounds[segment_idx], segment_bounds[segment_idx + 1]
+            if start < end:
+                records[start:end] = segment[unique_positions[start:end] - segment_idx * self.segment_size]
+
+        hot_start = segment_bounds[-1]
+        records[hot_start:] = self.hot_segment[unique_positions[hot_start:] - len(self.segments) * self.segment_size]
+        return records[inverse.reshape(np.shape(positions))]
+
+    def get_experience(self, positions):
+        """
+        Gather the transitions at the given positions (0 for the oldest transition), rebuilding the states.
+
+        Returns:
+            A tuple of arrays (states, actions, rewards, states_next, episode_ends).
+            The next state of a transition that has ended an episode is meaningless.
+        """
+        positions = np.asarray(positions)
+
+        # Find where the episode of every transition has started, and repeat the first frame of the episode
+        # in the stacks that reach past it.
+        episode_end_positions = self.episode_end_positions[:self.num_episodes]
+        num_earlier_episodes = np.searchsorted(episode_end_positions, positions)
+        episode_starts = np.where(
+            num_earlier_episodes > 0,
+            episode_end_positions[np.maximum(num_earlier_episodes - 1, 0)] + 1,
+            0,
+        )
+        episode_ends = num_earlier_episodes < self.num_episodes
+        episode_ends[episode_ends] = episode_end_positions[num_earlier_episodes[episode_ends]] == positions[episode_ends]
+
+        stack_positions = np.empty((len(positions), self.num_last_frames + 1), dtype=np.int64)
+        stack_positions[:, :-1] = np.maximum(
+            positions[:, None] - np.arange(self.num_last_frames - 1, -1, -1),
+            episode_starts[:, None],
+        )
+        stack_positions[:, -1] = np.where(episode_ends, positions, positions + 1)
+
+        records = self.read_records(stack_positions)
+        frames = records['frame']
+        return (
+            frames[:, :-1],
+            records['action'][:, -2],
+            records['reward'][:, -2],
+            frames[:, 1:],
+            episode_ends,
+        )
+
+
+class SumTree(object):
+    """
+    Represents a binary tree in which every node holds the sum of its children, over an array of priorities.
+
+    Both updating the priorities and finding the item that covers a point of the cumulative sum
+    take O(log n) time, and are vectorized over batches of items.
+    """
+
+    def __init__(self, capacity):
+        """
+        Create a tree with all priorities set to zero.
+
+        Args:
+            capacity (int): the number of items.
+        """
+        self.num_leaves = 1 << max(0, int(capacity) - 1).bit_length()
+        self.depth = self.num_leaves.bit_length() - 1
+        self.nodes = np.zeros(2 * self.num_leaves, dtype=np.float64)
+
+    @property
+    def total(self):
+        """ Get the sum of all priorities. """
+        return self.nodes[1]
+
+    @property
+    def priorities(self):
+        """ Get a read-only view of the item priorities. """
+        priorities = self.nodes[self.num_leaves:]
+        priorities.flags.writeable = False
+        return priorities
+
+    def update(self, indices, priorities):
+        """ Set the priorities of the items with the given indices. """
+        nodes = np.asarray(indices) + self.num_leaves
+        self.nodes[nodes] = priorities
+
+        # Recompute the sums level by level rather than adding the differences, so that duplicate indices
+        # are handled correctly: every duplicate of a node gets the same sum.
+        for _ in range(self.depth):
+            nodes = nodes // 2
+            self.nodes[nodes] = self.nodes[2 * nodes] + self.nodes[2 * nodes + 1]
+
+    def set(self, index, priority):
+        """ Set the priority of a single item (faster than `update` for one item). """
+        node = index + self.num_leaves
+        self.nodes[node] = priority
+        node //= 2
+        while node:
+            self.nodes[node] = self.nodes[2 * node] + self.nodes[2 * node + 1]
+            node //= 2
+
+    def find(self, values):
+        """
+        Find the items that cover the given points of the cumulative sum of priorities.
+
+        Args:
+            values: points in [0, total).
+
+        Returns:
+            The indices of the items, never one with a zero priority.
+        """
+        values = np.array(values, dtype=np.float64)
+        nodes = np.ones(len(values), dtype=np.int64)
+        for _ in range(self.depth):
+            left_sums = self.nodes[2 * nodes]
+            # Guard against rounding errors that would lead into an empty subtree.
+            go_right = (values >= left_sums) & (self.nodes[2 * nodes + 1] > 0)
+            go_right |= left_sums <= 0
+            values -= left_sums * go_right
+            nodes = 2 * nodes + go_right
+        return nodes - self.num_leaves
+
+
+class PrioritizedExperienceReplay(ExperienceReplay):
+    """
+    Represents the experience replay memory that samples the transitions with larger TD errors more often.
+
+    A transition is sampled with probability proportional to (|TD error| + epsilon) ** alpha, and the bias
+    that this introduces is corrected by importance-sampling weights (Schaul et al., 2015). The correction
+    is only partial at first, and is annealed towards full correction over the training (see `anneal_beta`).
+    New transitions get the highest priority seen so far, so that each of them is replayed at least once.
+    Once the model has learned on a batch, the priorities of its transitions are updated with the TD errors
+    computed for its targets (see `update_priorities`), so no extra forward pass is needed.
+    """
+
+    def __init__(self, input_shape, num_actions, memory_size=100, rng=None, alpha=0.6, beta=0.4, epsilon=1e-3):
+        """
+        Create a new instance of prioritized experience replay memory.
+
+        Args:
+            input_shape: the shape of the agent state (num_last_frames, height, width).
+            num_actions: the number of actions allowed in the environment.
+            memory_size: memory size limit (-1 for unlimited).
+            rng: (optional) a `numpy.random.Generator` for sampling the batches.
+            alpha (float): how much the TD errors affect the sampling (0 for uniform sampling).
+            beta (float): how much of the sampling bias is initially corrected by the weights (1 for full correction).
+            epsilon (float): a small priority added to every transition, so that none of them is starved.
+        """
+        self.alpha = alpha
+        self.initial_beta = beta
+        self.beta = beta
+        self.epsilon = epsilon
+        super().__init__(input_shape, num_actions, memory_size, rng)
+
+    def reset(self):
+        """ Erase the experience replay memory. """
+        super().reset()
+        self.tree = SumTree(self.capacity)
+        self.max_priority = 1.0
+
+    def _grow(self):
+        """ Double the capacity of an unlimited memory, keeping the stored items and their priorities. """
+        super()._grow()
+        priorities = self.tree.priorities[:self.num_items]
+        self.tree = SumTree(self.capacity)
+        self.tree.update(np.arange(self.num_items), priorities)
+
+    def remember_frame(self, frame, action, reward, is_episode_end):
+        """
+        Store a new piece of experience, given only the newest frame of the state
+        (see `ExperienceReplay.remember_frame`).
+        """
+        super().remember_frame(frame, action, reward, is_episode_end)
+
+        # Only the transitions that can be sampled (see `get_valid_positions`) get a non-zero priority.
+        # The previous transition can be sampled now that its next state is known.
+        index = (self.next_index - 1) % self.capacity
+        previous_index = (index - 1) % self.capacity
+        if self.num_items > 1 and not self.episode_ends[previous_index]:
+            self.tree.set(previous_index, self.max_priority)
+        self.tree.set(index, self.max_priority if is_episode_end else 0.0)
+        if self.num_items == self.capacity:
+            for offset in range(self.num_last_frames - 1):
+                self.tree.set((self.next_index + offset) % self.capacity, 0.0)
+
+    def get_state(self):
+        """ Get the bookkeeping state of the memory (everything except the arrays), as a JSON-compatible dict. """
+        state = super().get_state()
+        state['max_priority'] = self.max_priority
+        return state
+
+    def set_state(self, state):
+        """ Restore the bookkeeping state of the memory from `get_state`. """
+        super().set_state(state)
+        self.max_priority = state['max_priority']
+
+    def save(self, directory):
+        """ Save the memory, including the priorities, into a directory (see `ExperienceReplay.save`). """
+        super().save(directory)
+        np.save(os.path.join(directory, 'priority_tree.npy'), self.tree.nodes)
+
+    def load(self, directory):
+        """ Replace the contents of the memory with the ones saved by `save`. """
+        super().load(directory)
+        self.tree = SumTree(self.capacity)
+        self.tree.nodes = np.load(os.path.join(directory, 'priority_tree.npy'))
+
+    def anneal_beta(self, progress):
+        """
+        Move the bias correction linearly from its initial amount to full correction (beta = 1).
+
+        Args:
+            progress (float): the completed fraction of the training, from 0 to 1.
+        """
+        progress = min(max(progress, 0.0), 1.0)
+        self.beta = self.initial_beta + (1.0 - self.initial_beta) * progress
+
+    def get_index_positions(self, indices):
+        """ Convert memory slots into positions (0 for the oldest transition). """
+        oldest = self.next_index if self.num_items == self.capacity else 0
+        return (np.asarray(indices) - oldest) % self.capacity
+
+    def sample_prioritized(self, batch_size):
+        """
+        Pick the positions of a random batch of experience, proportionally to their priorities.
+
+        The cumulative sum of priorities is split into equal segments, one sample per segment.
+
+        Returns:
+            A tuple (positions, importance-sampling weights normalized to at most 1).
+        """
+        total = self.tree.total
+        if total <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+        values = (np.arange(batch_size) + self.rng.random(batch_size)) * (total / batch_size)
+        indices = self.tree.find(np.minimum(values, np.nextafter(total, 0)))
+        probabilities = self.tree.priorities[indices] / total
+
+        first, last = self.get_valid_positions()
+        weights = ((last - first) * probabilities) ** -self.beta
+        weights /= weights.max()
+        return self.get_index_positions(indices), weights.astype(np.float32)
+
+    def update_priorities(self, positions, td_errors):
+        """
+        Update the priorities of the transitions at the given positions.
+
+        Args:
+            positions: the positions of the transitions (0 for the oldest transition).
+            td_errors: the new TD errors of the transitions.
+        """
+        priorities = (np.abs(td_errors) + self.epsilon) ** self.alpha
+        self.max_priority = max(self.max_priority, float(priorities.max()))
+        oldest = self.next_index if self.num_items == self.capacity else 0
+        self.tree.update((oldest + np.asarray(positions)) % self.capacity, priorities)
 
     def get_batch(self, model, batch_size, discount_factor=0.9):
-        """ Sample a batch from experience replay. """
-
-        batch_size = min(len(self.memory), batch_size)
-        experience = np.array(random.sample(self.memory, batch_size))
-        input_dim = np.prod(self.input_shape)
-
-        # Extract [S, a, r, S', end] from experience.
-        states = experience[:, 0:input_dim]
-        actions = experience[:, input_dim]
-        rewards = experience[:, input_dim + 1]
-        states_next = experience[:, input_dim + 2:2 * input_dim + 2]
-        episode_ends = experience[:, 2 * input_dim + 2]
-
-        # Reshape to match the batch structure.
-        states = states.reshape((batch_size, ) + self.input_shape)
-        actions = np.cast['int'](actions)
-        rewards = rewards.repeat(self.num_actions).reshape((batch_size, self.num_actions))
-        states_next = states_next.reshape((batch_size, ) + self.input_shape)
-        episode_ends = episode_ends.repeat(self.num_actions).reshape((batch_size, self.num_actions))
-
-        # Predict future state-action values.
-        X = np.concatenate([states, states_next], axis=0)
-        y = model.predict(X)
-        Q_next = np.max(y[batch_size:], axis=1).repeat(self.num_actions).reshape((batch_size, self.num_actions))
-
-        delta = np.zeros((batch_size, self.num_actions))
-        delta[np.arange(batch_size), actions] = 1
-
-        targets = (1 - delta) * y[:batch_size] + delta * (rewards + discount_factor * (1 - episode_ends) * Q_next)
-        return states, targets
+        """
+        Sample a prioritized batch from experience replay.
+
+        Returns:
+            A tuple (states, targets, sample weights, positions, TD errors), or None if there is nothing
+            to sample yet. The positions and the TD errors are meant for `update_priorities`.
+        """
+        positions, weights = self.sample_prioritized(batch_size)
+        if len(positions) == 0:
+            return None
+
+        states, targets, td_errors = self.compute_targets(model, positions, discount_factor)
+        return states, targets, weights, positions, td_errors
+
+
+class ShardedExperienceReplay(object):
+    """
+    Represents an experience replay memory made of shards that are filled by independent streams of transitions.
+
+    A memory shard rebuilds the states from the transitions in the order they were played,
+    so each stream (e.g. an actor playing its own episodes) gets a shard of its own.
+    The batches are sampled uniformly from the transitions of all shards together.
+    """
+
+    def __init__(self, shards, rng=None):
+        """
+        Create a new sharded experience replay memory.
+
+        Args:
+            shards: a list of `ExperienceReplay` instances, one per stream of transitions.
+            rng: (optional) a `numpy.random.Generator` for sampling the batches.
+        """
+        self.shards = shards
+        self.rng = rng if rng is not None else np.random.default_rng()
+
+    def __len__(self):
+        return sum(len(shard) for shard in self.shards)
+
+    def sample_experience(self, batch_size):
+        """
+        Pick a random batch of experience (with replacement) from all shards.
+
+        Returns:
+            A tuple of arrays (states, actions, rewards, states_next, episode_ends), or None if there is
+            nothing to sample yet.
+        """
+        valid_ranges = [shard.get_valid_positions() for shard in self.shards]
+        num_valid = np.array([last - first for first, last in valid_ranges])
+        if num_valid.sum() == 0:
+            return None
+
+        shard_batch_sizes = self.rng.multinomial(batch_size, num_valid / num_valid.sum())
+        parts = [
+            shard.get_experience(self.rng.integers(first, last, size=shard_batch_size))
+            for shard, (first, last), shard_batch_size in zip(self.shards, valid_ranges, shard_batch_sizes)
+            if shard_batch_size > 0
+        ]
+        return tuple(np.concatenate(arrays) for arrays in zip(*parts))
+
+    def get_batch(self, model, batch_size, discount_factor=0.9):
+        """
+        Sample a batch from experience replay.
+
+        Returns:
+            A tuple (states, targets, sample weights, positions, TD errors), or None if there is nothing
+            to sample yet. The sample weights and the positions are None, since all transitions are sampled
+            with equal probability.
+        """
+        experience = self.sample_experience(batch_size)
+        if experience is None:
+            return None
+
+        states, targets, td_errors = compute_batch_targets(model, experience, discount_factor)
+        return states, targets, None, None, td_errors
+
+    def update_priorities(self, positions, td_errors):
+        """ Update the sampling priorities of a batch (see `ExperienceReplay.update_priorities`). """
+        pass
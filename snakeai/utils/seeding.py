@@ -0,0 +1,24 @@
+import numpy as np
+
+
+def spawn_seeds(root_seed, num_seeds):
+    """
+    Derive statistically independent seeds for multiple environments or workers from a single root seed.
+
+    The same root seed and number of seeds always produce the same seeds, so a set of parallel
+    rollouts can be reproduced exactly regardless of how they get scheduled.
+
+    Args:
+        root_seed: an integer seed, or None to use fresh OS entropy.
+        num_seeds (int): the number of seeds to derive.
+
+    Returns:
+        A list of `numpy.random.SeedSequence` objects, which can be passed to `Environment.seed`,
+        `BatchEnvironment.seed` or `numpy.random.default_rng`, or spawned further.
+    """
+    return np.random.SeedSequence(root_seed).spawn(num_seeds)
+
+
+def spawn_generators(root_seed, num_generators):
+    """ Create independent `numpy.random.Generator` streams derived from a single root seed. """
+    return [np.random.default_rng(seed) for seed in spawn_seeds(root_seed, num_generators)]
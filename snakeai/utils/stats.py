@@ -0,0 +1,167 @@
+import atexit
+import csv
+import math
+import os
+import time
+import zipfile
+
+import numpy as np
+
+
+class EpisodeStatisticsWriter(object):
+    """
+    Accumulates flat episode statistics records in preallocated columnar arrays
+    and writes them to a file in bulk, either as CSV or as a binary columnar `.npz` archive.
+    """
+
+    def __init__(self, filename, fields, buffer_size=1000, flush_interval=5.0):
+        """
+        Create a new statistics writer.
+
+        Args:
+            filename: the output file. The extension (`.csv` or `.npz`) defines the format.
+            fields: a list of (column name, numpy dtype) pairs, in the order of the output columns.
+            buffer_size (int): the number of records to accumulate before flushing.
+            flush_interval (float): the maximum number of seconds between flushes, checked at every write.
+        """
+        self.filename = filename
+        self.format = os.path.splitext(filename)[1].lstrip('.').lower()
+        if self.format not in ('csv', 'npz'):
+            raise ValueError(f'Unsupported statistics file format: "{self.format}"')
+
+        self.fields = [(name, np.dtype(dtype)) for name, dtype in fields]
+        self.buffer_size = buffer_size
+        self.flush_interval = flush_interval
+        self.columns = {
+            name: np.zeros(buffer_size, dtype=dtype)
+            for name, dtype in self.fields
+        }
+        self.num_buffered = 0
+        self.num_chunks = 0
+        self.last_flush_time = time.monotonic()
+        self.file = None
+
+        # Start with an empty file (containing just the CSV header) so that it is visible right away.
+        if self.format == 'csv':
+            self.file = open(filename, 'w')
+            self.file.write(','.join(name for name, _ in self.fields) + '\n')
+            self.file.flush()
+        else:
+            zipfile.ZipFile(filename, 'w').close()
+
+        # Do not lose the buffered records if the owner forgets to close the writer.
+        atexit.register(self.close)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def write(self, record):
+        """
+        Buffer a single flat statistics record and flush the buffer if needed.
+
+        Args:
+            record (dict): column values; missing values (None) are stored as NaN or an empty string.
+        """
+        row = self.num_buffered
+        for name, dtype in self.fields:
+            value = record.get(name)
+            if value is None:
+                value = '' if dtype.kind == 'U' else np.nan
+            self.columns[name][row] = value
+        self.num_buffered += 1
+
+        if self.num_buffered >= self.buffer_size or time.monotonic() - self.last_flush_time >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        """ Write all buffered records to the output file. """
+        self.last_flush_time = time.monotonic()
+        if not self.num_buffered:
+            return
+
+        if self.format == 'csv':
+            self._flush_csv()
+        else:
+            self._flush_npz()
+        self.num_buffered = 0
+
+    def close(self):
+        """ Flush the remaining records and close the output file. """
+        if self.columns is None:
+            return
+        self.flush()
+        if self.file is not None:
+            self.file.close()
+        self.columns = None
+        atexit.unregister(self.close)
+
+    def _flush_csv(self):
+        """ Format the buffered records as CSV lines and write them with a single call. """
+        formatted_columns = [
+            [format_csv_value(value) for value in self.columns[name][:self.num_buffered].tolist()]
+            for name, _ in self.fields
+        ]
+        lines = [','.join(row) for row in zip(*formatted_columns)]
+        self.file.write('\n'.join(lines) + '\n')
+        self.file.flush()
+
+    def _flush_npz(self):
+        """ Append the buffered columns to the archive as a new chunk of `.npy` members. """
+        with zipfile.ZipFile(self.filename, 'a') as archive:
+            for name, _ in self.fields:
+                with archive.open(f'{name}/{self.num_chunks:06d}.npy', 'w', force_zip64=True) as member:
+                    np.lib.format.write_array(member, self.columns[name][:self.num_buffered])
+        self.num_chunks += 1
+
+
+def format_csv_value(value):
+    """ Format a single value the way it appears in the statistics CSV file. """
+    if isinstance(value, float):
+        if math.isnan(value):
+            return ''
+        return f'{value:.10g}'
+    return str(value)
+
+
+def parse_csv_column(values):
+    """ Convert the string values of a CSV column to a numeric array if possible. """
+    try:
+        return np.array([float(value) if value else np.nan for value in values])
+    except ValueError:
+        return np.array(values)
+
+
+def read_episode_statistics(filename, as_dataframe=False):
+    """
+    Read the statistics file written by `EpisodeStatisticsWriter`.
+
+    Args:
+        filename: a `.csv` or `.npz` statistics file.
+        as_dataframe (bool): if True, return a Pandas data frame instead of a dict of arrays.
+
+    Returns:
+        A dict mapping column names to NumPy arrays, or a Pandas data frame.
+    """
+    if filename.lower().endswith('.csv'):
+        with open(filename, newline='') as csv_file:
+            rows = list(csv.reader(csv_file))
+        columns = {
+            name: parse_csv_column(values)
+            for name, *values in zip(*rows)
+        }
+    else:
+        chunks = {}
+        with zipfile.ZipFile(filename) as archive:
+            for member_name in archive.namelist():
+                column_name = member_name.rsplit('/', 1)[0]
+                with archive.open(member_name) as member:
+                    chunks.setdefault(column_name, []).append(np.lib.format.read_array(member))
+        columns = {name: np.concatenate(column_chunks) for name, column_chunks in chunks.items()}
+
+    if as_dataframe:
+        import pandas as pd
+        return pd.DataFrame(columns)
+    return columns
@@ -2,7 +2,6 @@
 
 """ Front-end script for training a Snake agent. """
 
-import json
 import sys
 
 from keras.models import Sequential
@@ -11,6 +10,7 @@ from keras.optimizers import *
 
 from snakeai.agent import DeepQNetworkAgent
 from snakeai.gameplay.environment import Environment
+from snakeai.gameplay.levels import load_level_config
 from snakeai.utils.cli import HelpOnFailArgumentParser
 
 
@@ -35,19 +35,99 @@ def parse_command_line_args(args):
         default=30000,
         help='The number of episodes to run consecutively.',
     )
+    parser.add_argument(
+        '--actors',
+        type=int,
+        default=0,
+        help='The number of actor processes playing the game while the main process learns (0 for a single process).',
+    )
+    parser.add_argument(
+        '--batch-size',
+        type=int,
+        default=64,
+        help='The number of transitions in every batch the model learns on.',
+    )
+    parser.add_argument(
+        '--train-freq',
+        type=int,
+        default=1,
+        help='The number of environment timesteps between model updates.',
+    )
+    parser.add_argument(
+        '--gradient-steps',
+        type=int,
+        default=1,
+        help='The number of batches to learn on in every model update.',
+    )
+    parser.add_argument(
+        '--learning-starts',
+        type=int,
+        default=0,
+        help='The number of environment timesteps to only collect experience for before the first update.',
+    )
+    parser.add_argument(
+        '--resume',
+        type=str,
+        default=None,
+        help='Checkpoint bundle (dqn-*.checkpoint) to resume an interrupted training from.',
+    )
+    parser.add_argument(
+        '--prioritized-replay',
+        action='store_true',
+        help='Replay the experience with larger TD errors more often.',
+    )
+    parser.add_argument(
+        '--prioritized-replay-beta',
+        type=float,
+        default=0.4,
+        help='The initial importance-sampling correction of the prioritized replay, annealed to 1 over the training.',
+    )
+    parser.add_argument(
+        '--replay-dir',
+        type=str,
+        default=None,
+        help='Directory for spilling the experience replay memory to disk (uniform replay only).',
+    )
+    parser.add_argument(
+        '--replay-ram-budget',
+        type=int,
+        default=512 * 2 ** 20,
+        help='The number of bytes of the experience replay memory kept in RAM when spilling it to disk.',
+    )
 
-    return parser.parse_args(args)
+    parsed_args = parser.parse_args(args)
+    if parsed_args.actors > 0:
+        # The actors feed an in-memory uniform replay memory, and the training state is not checkpointed.
+        for flag, value in [('--resume', parsed_args.resume), ('--prioritized-replay', parsed_args.prioritized_replay),
+                            ('--replay-dir', parsed_args.replay_dir)]:
+            if value:
+                parser.error(f'{flag} is not supported with actor processes')
+    return parsed_args
 
 
 def create_snake_environment(level_filename):
     """ Create a new Snake environment from the config file. """
 
-    with open(level_filename) as cfg:
-        env_config = json.load(cfg)
-
+    env_config = load_level_config(level_filename)
     return Environment(config=env_config, verbose=1)
 
 
+def train_with_actors(agent, level_filename, parsed_args):
+    """ Train the agent with actor processes playing the game and the current process learning. """
+
+    from snakeai.agent.actor_learner import ActorLearnerTrainer
+
+    trainer = ActorLearnerTrainer(agent, load_level_config(level_filename), create_dqn_model, parsed_args.actors)
+    trainer.train(
+        num_episodes=parsed_args.num_episodes,
+        batch_size=parsed_args.batch_size,
+        discount_factor=0.95,
+        train_freq=parsed_args.train_freq,
+        gradient_steps=parsed_args.gradient_steps,
+        learning_starts=parsed_args.learning_starts,
+    )
+
+
 def create_dqn_model(env, num_last_frames):
     """
     Build a new DQN model to be used for training.
@@ -100,16 +180,31 @@ def main():
     agent = DeepQNetworkAgent(
         model=model,
         memory_size=-1,
-        num_last_frames=model.input_shape[1]
-    )
-    agent.train(
-        env,
-        batch_size=64,
-        num_episodes=parsed_args.num_episodes,
-        checkpoint_freq=parsed_args.num_episodes // 10,
-        discount_factor=0.95
+        num_last_frames=model.input_shape[1],
+        prioritized_replay=parsed_args.prioritized_replay,
+        prioritized_replay_beta=parsed_args.prioritized_replay_beta,
+        replay_dir=parsed_args.replay_dir,
+        replay_ram_budget=parsed_args.replay_ram_budget,
     )
-
+    try:
+        if parsed_args.actors > 0:
+            train_with_actors(agent, parsed_args.level, parsed_args)
+            return
+
+        agent.train(
+            env,
+            batch_size=parsed_args.batch_size,
+            num_episodes=parsed_args.num_episodes,
+            checkpoint_freq=parsed_args.num_episodes // 10,
+            discount_factor=0.95,
+            train_freq=parsed_args.train_freq,
+            gradient_steps=parsed_args.gradient_steps,
+            learning_starts=parsed_args.learning_starts,
+            resume_from=parsed_args.resume,
+        )
+    finally:
+        # Flush the episode statistics without relying on the exit hooks.
+        env.close()
 
 if __name__ == '__main__':
     main()